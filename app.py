@@ -1,47 +1,185 @@
 # -*- coding: utf-8 -*-
-import csv
+import copy
 import os
 import random
+import uuid
 from datetime import datetime
 
 import pandas as pd
 import streamlit as st
-import subprocess
 
-from config import EXAMPLE_PROMPTS, MODELS_DB
+from budget import TokenBudget
+from config import EXAMPLE_PROMPTS, METRICS_PORT, MODELS_DB
+from executors import create_executor
+from hedging import Hedger
+from matchup_pool import MatchupPool
+from matchmaking import MatchupScheduler
+from metrics import REGISTRY, start_metrics_server
+from prewarm import Prewarmer
+from results_log import RESULTS_FILE, append_vote, generation_metrics, read_results, vote_row
+from serving import generate_pair
+from singleflight import SingleFlight
 
-RESULTS_FILE = "arena_results.csv"
 st.set_page_config(layout="wide", page_title="OELLM Arena")
 
-# --- INITIALIZE SESSION STATE ---
-if "generated" not in st.session_state:
-    st.session_state.generated = False
-if "vote_submitted" not in st.session_state:
-    st.session_state.vote_submitted = False
-if "output_a" not in st.session_state:
-    st.session_state.output_a = ""
-if "output_b" not in st.session_state:
-    st.session_state.output_b = ""
-if "model_a_name" not in st.session_state:
-    st.session_state.model_a_name = ""
-if "model_b_name" not in st.session_state:
-    st.session_state.model_b_name = ""
-if "swap_models" not in st.session_state:
-    st.session_state.swap_models = False
-if "last_winner" not in st.session_state:
-    st.session_state.last_winner = ""
-if "current_language" not in st.session_state:
-    st.session_state.current_language = "Swedish"  # Default
-if "prompt_text" not in st.session_state:
-    st.session_state.prompt_text = ""
 
-# Session Stats Tracking (For anonymized feedback)
-if "vote_count" not in st.session_state:
-    st.session_state.vote_count = 0
-if "session_wins" not in st.session_state:
-    st.session_state.session_wins = {"MultiSynt": 0, "HPLT": 0, "Tie": 0}
-if "session_history" not in st.session_state:
-    st.session_state.session_history = []
+@st.cache_resource
+def get_scheduler():
+    """Process-wide matchup scheduler, seeded with all logged votes and updated on every new vote."""
+    if os.path.exists(RESULTS_FILE):
+        return MatchupScheduler.from_results(pd.read_csv(RESULTS_FILE))
+    return MatchupScheduler()
+
+
+@st.cache_resource
+def get_executor():
+    """Process-wide executor for ARENA_EXECUTION_MODE (e.g. the warm Slurm worker pool)."""
+    return create_executor()
+
+
+@st.cache_resource
+def get_single_flight():
+    """Process-wide single-flight group: identical concurrent generations share one job."""
+    return SingleFlight()
+
+
+@st.cache_resource
+def get_hedger():
+    """Process-wide straggler hedging with per-model latency history."""
+    return Hedger()
+
+
+@st.cache_resource
+def get_token_budget():
+    """Process-wide admission control: lowers max_new_tokens under load to keep rounds within the SLO."""
+    return TokenBudget()
+
+
+@st.cache_resource
+def get_prewarmer():
+    """Process-wide background prewarmer shared by all sessions; warms models the executor's way."""
+    return Prewarmer(warm_fn=get_executor().prewarm)
+
+
+@st.cache_resource
+def get_matchup_pool():
+    """Process-wide pool of pre-generated example-prompt rounds, refilled while no one is generating."""
+    return MatchupPool(get_executor(), get_scheduler().choose_multisynt).start()
+
+
+@st.cache_resource
+def get_metrics_server():
+    """Prometheus endpoint on ARENA_METRICS_PORT, also exporting the serving layers' counters."""
+    if not METRICS_PORT:
+        return None
+    REGISTRY.add_collector("arena_executor", lambda: get_executor().stats())
+    REGISTRY.add_collector("arena_prewarm", lambda: get_prewarmer().stats())
+    REGISTRY.add_collector("arena_single_flight", lambda: get_single_flight().stats())
+    REGISTRY.add_collector("arena_hedge", lambda: get_hedger().stats())
+    REGISTRY.add_collector("arena_matchup_pool", lambda: get_matchup_pool().stats())
+    REGISTRY.add_collector("arena_token_budget", lambda: get_token_budget().stats())
+    return start_metrics_server(METRICS_PORT)
+
+
+@st.cache_resource
+def get_logo(path):
+    """A sidebar logo's bytes (None if the file is missing), read once per process instead of every rerun."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@st.cache_resource(max_entries=1)
+def get_dashboard_data(path, mtime_ns, size):
+    """
+    The results log and every dashboard aggregate, computed once per version of the file (its
+    mtime and size are the cache key), so dashboard reruns neither re-read nor regroup it.
+    Shared by all sessions: treat the returned frames as read-only.
+    """
+    df = read_results(path)
+    valid_votes = df[df["Winner_Source"] != "Tie"]
+    timestamps = pd.to_datetime(df["Timestamp"], errors="coerce")
+    lang_groups = df.groupby(["Language", "Winner_Source"]).size().unstack(fill_value=0)
+    ms_wins = df.loc[df["Winner_Source"] == "MultiSynt", "Model_A_Name"].str.split("/").str[-1]
+    win_counts = ms_wins.value_counts().reset_index()
+    win_counts.columns = ["Model", "Wins"]
+    return {
+        "df": df,
+        "total_votes": len(df),
+        "valid_votes": len(valid_votes),
+        "ms_wins": int(valid_votes["Winner_Source"].eq("MultiSynt").sum()),
+        "hplt_wins": int(valid_votes["Winner_Source"].eq("HPLT").sum()),
+        "lang_groups": lang_groups,
+        "lang_pct": lang_groups.div(lang_groups.sum(axis=1), axis=0) * 100,
+        "win_counts": win_counts,
+        "daily_counts": df.groupby(timestamps.dt.date.rename("Date")).size() if timestamps.notna().any() else None,
+        "generations": generation_metrics(df),
+    }
+
+
+@st.cache_resource(max_entries=4)
+def get_latency_summary(path, mtime_ns, size, group_by):
+    """
+    Latency table and histogram per model or language, for one version of the results log. Pooled
+    generations are left out: no user waited for them.
+    """
+    generations = get_dashboard_data(path, mtime_ns, size)["generations"]
+    generations = generations[~generations["pooled"]].copy()
+    generations["group"] = generations[group_by].astype(str).str.split("/").str[-1]
+    summary = generations.groupby("group").agg(
+        generations=("total_s", "size"),
+        p50_s=("total_s", "median"),
+        p95_s=("total_s", lambda x: x.quantile(0.95)),
+        p99_s=("total_s", lambda x: x.quantile(0.99)),
+        prefill_s=("prefill_s", "median"),
+        ms_per_token=("ms_per_token", "median"),
+        cache_hit_rate=("cached", lambda x: x.astype(str).eq("True").mean()),
+        hit_max_tokens=("stop_reason", lambda x: x.eq("max_new_tokens").mean()),
+    )
+    bins = [0, 2, 5, 10, 20, 30, 60, 120, float("inf")]
+    labels = ["<2", "2-5", "5-10", "10-20", "20-30", "30-60", "60-120", ">120"]
+    generations["bucket"] = pd.cut(generations["total_s"], bins=bins, labels=labels, right=False)
+    histogram = generations.groupby(["bucket", "group"], observed=False).size().unstack(fill_value=0)
+    return summary, histogram
+
+
+get_metrics_server()
+get_matchup_pool()
+
+
+# --- INITIALIZE SESSION STATE ---
+SESSION_DEFAULTS = {
+    "generated": False,
+    "vote_submitted": False,
+    "output_a": "",
+    "output_b": "",
+    "model_a_name": "",
+    "model_b_name": "",
+    "metrics_a": {},
+    "metrics_b": {},
+    "round_params": {},
+    "swap_models": False,
+    "last_winner": "",
+    "current_language": "Swedish",  # Default
+    "prompt_text": "",
+    # Generation settings, kept here so they persist while the sidebar shows the dashboard
+    "min_tokens": 70,
+    "max_tokens": 112,
+    "rep_penalty": 1.2,
+    "temperature": 0.7,
+    # Session Stats Tracking (For anonymized feedback)
+    "vote_count": 0,
+    "session_wins": {"MultiSynt": 0, "HPLT": 0, "Tie": 0},
+    "session_history": [],
+}
+for key, default in SESSION_DEFAULTS.items():
+    if key not in st.session_state:
+        st.session_state[key] = copy.deepcopy(default)
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+    # Warm the default language's models while the user reads the instructions
+    get_prewarmer().request(st.session_state.session_id, st.session_state.current_language)
 
 
 # --- CALLBACKS ---
@@ -50,6 +188,8 @@ def update_language():
     st.session_state.generated = False
     st.session_state.vote_submitted = False
     st.session_state.prompt_text = ""
+    # Non-blocking: start warming the new language's models and cancel the old language's
+    get_prewarmer().request(st.session_state.session_id, st.session_state.current_language)
 
 
 def reset_round():
@@ -65,15 +205,41 @@ def set_prompt_callback(text):
 
 
 def register_vote(winner_source):
-    """Update stats and set state"""
+    """Update stats, save the vote with the round's generation telemetry and set state"""
     st.session_state.last_winner = winner_source
     st.session_state.vote_submitted = True
 
+    # Saved once here rather than on every rerun of the results view
+    vote_position = "Tie"
+    if winner_source == "MultiSynt":
+        vote_position = "Right" if st.session_state.swap_models else "Left"
+    elif winner_source == "HPLT":
+        vote_position = "Left" if st.session_state.swap_models else "Right"
+
+    vote = {
+        "Timestamp": datetime.now(),
+        "Language": st.session_state.current_language,
+        "Prompt": st.session_state.prompt_text,
+        "Model_A_Name": st.session_state.model_a_name,
+        "Model_B_Name": st.session_state.model_b_name,
+        "Output_A": st.session_state.output_a,
+        "Output_B": st.session_state.output_b,
+        "Swapped": st.session_state.swap_models,
+        "Winner_Position": vote_position,
+        "Winner_Source": winner_source,
+    }
+    append_vote(
+        vote_row(vote, st.session_state.round_params, st.session_state.metrics_a, st.session_state.metrics_b)
+    )
+
     # Update Session Stats
     st.session_state.vote_count += 1
     if winner_source in st.session_state.session_wins:
         st.session_state.session_wins[winner_source] += 1
 
+    # Feed the vote back into matchmaking so the next round targets unresolved pairs
+    get_scheduler().update(st.session_state.current_language, st.session_state.model_a_name, winner_source)
+
     # Log detailed session history
     st.session_state.session_history.append(
         {
@@ -98,77 +264,180 @@ def render_statistics_view():
         st.warning("No data available yet.")
         return
 
-    df = pd.read_csv(RESULTS_FILE)
-    if df.empty:
+    stat = os.stat(RESULTS_FILE)
+    data = get_dashboard_data(RESULTS_FILE, stat.st_mtime_ns, stat.st_size)
+    if data["df"].empty:
         st.warning("Dataset is empty.")
         return
 
     # Top Level Metrics
-    total_votes = len(df)
-    valid_votes = df[df["Winner_Source"] != "Tie"]
-
     c1, c2, c3 = st.columns(3)
-    c1.metric("Total Interactions", total_votes)
+    c1.metric("Total Interactions", data["total_votes"])
 
-    if not valid_votes.empty:
-        ms_wins = len(valid_votes[valid_votes["Winner_Source"] == "MultiSynt"])
-        hplt_wins = len(valid_votes[valid_votes["Winner_Source"] == "HPLT"])
-        ms_rate = round((ms_wins / len(valid_votes)) * 100, 1)
-        hplt_rate = round((hplt_wins / len(valid_votes)) * 100, 1)
+    if data["valid_votes"]:
+        ms_wins, hplt_wins = data["ms_wins"], data["hplt_wins"]
+        ms_rate = round((ms_wins / data["valid_votes"]) * 100, 1)
+        hplt_rate = round((hplt_wins / data["valid_votes"]) * 100, 1)
 
         c2.metric("MultiSynt Win Rate", f"{ms_rate}%", f"{ms_wins} wins")
         c3.metric("HPLT Win Rate", f"{hplt_rate}%", f"{hplt_wins} wins")
 
     st.divider()
 
-    tab1, tab2, tab3, tab4 = st.tabs(["🌍 By Language", "🏆 Model Leaderboard", "📈 Trends", "💾 Raw Data"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["🌍 By Language", "🏆 Model Leaderboard", "📈 Trends", "⏱️ Latency", "💾 Raw Data"]
+    )
 
     with tab1:
         st.subheader("Win Rate by Language")
-        # Prepare data for stacked bar chart
-        lang_groups = df.groupby(["Language", "Winner_Source"]).size().unstack(fill_value=0)
-        # Calculate percentages
-        lang_pct = lang_groups.div(lang_groups.sum(axis=1), axis=0) * 100
-
-        st.bar_chart(lang_groups)
+        st.bar_chart(data["lang_groups"])
         st.caption("Vote distribution per language.")
 
         with st.expander("View Percentage Table"):
-            st.dataframe(lang_pct.style.format("{:.1f}%"))
+            st.dataframe(data["lang_pct"].style.format("{:.1f}%"))
 
     with tab2:
         st.subheader("Head-to-Head Performance")
-        # Extract short names
-        df["Model_A_Short"] = df["Model_A_Name"].apply(lambda x: x.split("/")[-1])
-
-        # Filter where MultiSynt won
-        ms_wins = df[df["Winner_Source"] == "MultiSynt"]
-        if not ms_wins.empty:
+        if not data["win_counts"].empty:
             st.markdown("**Top Performing MultiSynt Models**")
-            win_counts = ms_wins["Model_A_Short"].value_counts().reset_index()
-            win_counts.columns = ["Model", "Wins"]
-            st.dataframe(win_counts, use_container_width=True)
+            st.dataframe(data["win_counts"], use_container_width=True)
         else:
             st.info("No MultiSynt wins yet.")
 
+        with st.expander("Matchup Confidence (MultiSynt win rate vs HPLT, 95% interval)"):
+            st.dataframe(get_scheduler().summary(), use_container_width=True)
+
     with tab3:
         st.subheader("Votes Over Time")
-        # Convert timestamp
-        try:
-            df["Timestamp"] = pd.to_datetime(df["Timestamp"])
-            df["Date"] = df["Timestamp"].dt.date
-            daily_counts = df.groupby("Date").size()
-            st.line_chart(daily_counts)
-        except Exception:
+        if data["daily_counts"] is not None:
+            st.line_chart(data["daily_counts"])
+        else:
             st.warning("Could not parse timestamps for trend analysis.")
 
     with tab4:
+        render_latency_tab(RESULTS_FILE, stat.st_mtime_ns, stat.st_size)
+
+    with tab5:
         st.subheader("Raw Data Inspector")
-        st.dataframe(df)
+        st.dataframe(data["df"])
+
+    render_serving_stats()
+
+
+@st.fragment
+def render_latency_tab(path, mtime_ns, size):
+    """
+    Latency distributions per model or language, from the telemetry logged with each vote.
+    A fragment: switching the grouping reruns only this tab.
+    """
+    st.subheader("Generation Latency")
+    generations = get_dashboard_data(path, mtime_ns, size)["generations"]
+    if generations.empty:
+        st.info("No generation telemetry yet. It is logged with every vote from schema version 2 on.")
+        return
+    if generations["pooled"].all():
+        st.info("Every logged generation was served from the matchup pool: none was generated while a user waited.")
+        return
+
+    group_by = st.radio("Group by", ["model", "language"], horizontal=True, key="latency_group_by")
+    summary, histogram = get_latency_summary(path, mtime_ns, size, group_by)
+    st.dataframe(
+        summary.style.format(
+            {
+                "p50_s": "{:.1f}",
+                "p95_s": "{:.1f}",
+                "p99_s": "{:.1f}",
+                "prefill_s": "{:.2f}",
+                "ms_per_token": "{:.0f}",
+                "cache_hit_rate": "{:.0%}",
+                "hit_max_tokens": "{:.0%}",
+            }
+        ),
+        use_container_width=True,
+    )
+
+    st.markdown("**Time until output (s)**: load + queue wait + prefill + decode, per generation")
+    st.bar_chart(histogram)
+    pooled = int(generations["pooled"].sum())
+    if pooled:
+        st.caption(f"Left out: {pooled} generations served from the matchup pool, pre-generated before their round.")
+
+
+def render_serving_stats():
+    """Live counters of this server process's serving layers (reset on restart)."""
+    with st.expander("⚙️ Serving Statistics (this server process)"):
+        executor = get_executor().stats()
+        st.markdown(f"**Executor:** `{executor['executor']}`")
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Generations", executor["requests"])
+        c2.metric(
+            "Served by Warm Model",
+            f"{executor['warm_fraction']:.0%}",
+            f"{executor['warm_hits']} warm / {executor['cold_loads']} cold loads",
+        )
+        c3.metric("Errors", executor["errors"])
+        if "spillovers" in executor:
+            st.caption(
+                f"Pool workers: {len(get_executor().workers)}, spilled over past the load bound: "
+                f"{executor['spillovers']}, rebalancing loads: {executor['rebalance_loads']}, "
+                f"restarts: {executor['worker_restarts']}"
+            )
+
+        st.markdown("**Model Prewarming**")
+        prewarm = get_prewarmer().stats()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Prewarm Hit Rate", f"{prewarm['hit_rate']:.0%}", f"{prewarm['hits']} hits / {prewarm['misses']} misses")
+        c2.metric("Load Time Saved", f"{prewarm['load_time_saved_s']:.0f} s")
+        c3.metric("Warm Models", prewarm["warm_models"])
+        st.caption(
+            f"Requested: {prewarm['requested']}, deduplicated: {prewarm['deduplicated']}, "
+            f"cancelled: {prewarm['cancelled']}, completed: {prewarm['completed']}, failed: {prewarm['failed']}"
+        )
+
+        st.markdown("**Single-Flight Coalescing**")
+        flight = get_single_flight().stats()
+        c1, c2 = st.columns(2)
+        c1.metric("Generation Jobs Run", flight["jobs"])
+        c2.metric("Duplicate Jobs Avoided", flight["coalesced"])
+
+        st.markdown("**Straggler Hedging**")
+        hedger = get_hedger()
+        hedge = hedger.stats()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Hedge Rate", f"{hedge['hedge_rate']:.1%}", f"{hedge['hedged']} of {hedge['requests']} jobs")
+        c2.metric("Backup Wins", hedge["hedge_wins"])
+        c3.metric("Cancelled Attempts", hedge["cancelled"])
+        latency = hedger.latency_summary()
+        if latency:
+            st.dataframe(pd.DataFrame(latency), use_container_width=True)
+
+        st.markdown("**Pre-generated Matchup Pool**")
+        pool = get_matchup_pool().stats()
+        c1, c2, c3 = st.columns(3)
+        c1.metric(
+            "Pool Hit Rate", f"{pool['hit_rate']:.0%}", f"{pool['pool_hit_rate']:.0%} of example-prompt rounds"
+        )
+        c2.metric("Idle Capacity Used", f"{pool['idle_utilization']:.0%}", f"{pool['producing_s']:.0f} s generating")
+        c3.metric("Pairs Ready", pool["ready"])
+        st.caption(
+            f"Produced: {pool['produced']}, served: {pool['hits']}, expired: {pool['expired']}, failed: {pool['failed']}"
+        )
 
+        st.markdown("**Adaptive Token Budget**")
+        budget = get_token_budget()
+        stats = budget.stats()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Round SLO Met", f"{stats['slo_attainment']:.0%}", f"SLO {budget.slo_s:.0f} s")
+        c2.metric("Rounds Limited", f"{stats['limited_rate']:.0%}", f"{stats['limited']} of {stats['rounds']} rounds")
+        c3.metric("Tokens Allowed", f"{stats['token_share']:.0%}", "of requested")
 
+
+@st.fragment
 def render_arena_view():
-    """Renders the main voting arena"""
+    """
+    Renders the main voting arena. A fragment: prompts, generation and votes rerun only the arena,
+    not the sidebar (whose "votes most needed" hint catches up on the next full rerun).
+    """
     st.title("⚔️ OELLM Arena")
     st.markdown(f"**Current Language:** {st.session_state.current_language}")
     if st.session_state.current_language == "Multilingual-Exp":
@@ -217,42 +486,62 @@ def render_arena_view():
 
             with st.spinner("Selecting models and generating..."):
                 st.session_state.swap_models = random.choice([True, False])
-                multisynt_options = MODELS_DB[st.session_state.current_language]["multisynt"]
-                chosen_multisynt = random.choice(multisynt_options)
-                chosen_hplt = MODELS_DB[st.session_state.current_language]["hplt"]
+                params = {
+                    "min_new_tokens": st.session_state.min_tokens,
+                    "max_new_tokens": st.session_state.max_tokens,
+                    "temperature": st.session_state.temperature,
+                    "repetition_penalty": st.session_state.rep_penalty,
+                }
+                # Example prompts with the default settings are usually pre-generated already
+                pooled = get_matchup_pool().take(st.session_state.current_language, user_prompt, params)
+                if pooled:
+                    chosen_multisynt, chosen_hplt = pooled["multisynt"], pooled["hplt"]
+                else:
+                    # The scheduler prefers the checkpoint whose win rate is least certain so far
+                    chosen_multisynt = get_scheduler().choose_multisynt(st.session_state.current_language)
+                    chosen_hplt = MODELS_DB[st.session_state.current_language]["hplt"]
 
                 try:
-                    def build_slurm_cmd(model_name):
-                        return [
-                            "srun", "--gpus=1",
-                            "uv", "run", "python", "backend.py",
-                            "--model_name", model_name,
-                            "--prompt", user_prompt,
-                            "--min_new_tokens", str(st.session_state.min_tokens),
-                            "--max_new_tokens", str(st.session_state.max_tokens),
-                            "--temperature", str(st.session_state.temperature),
-                            "--repetition_penalty", str(st.session_state.rep_penalty)
+                    if pooled:
+                        side_a, side_b = [
+                            (*pooled[side][:3], {**pooled[side][3], "pooled": True}) for side in ("side_a", "side_b")
                         ]
-
-                    # --- MODEL A ---
-                    cmd_a = build_slurm_cmd(chosen_multisynt)
-                    process_a = subprocess.Popen(cmd_a, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-
-                    # --- MODEL B ---
-                    cmd_b = build_slurm_cmd(chosen_hplt)
-                    process_b = subprocess.Popen(cmd_b, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-
-                    # Wait for both processes to finish and capture output
-                    stdout_a, stderr_a = process_a.communicate()
-                    stdout_b, stderr_b = process_b.communicate()
-
-                    if process_a.returncode != 0:
+                    else:
+                        # --- MODEL A & MODEL B (launched concurrently, identical in-flight jobs are shared) ---
+                        # Under load both get the same lowered max_new_tokens, so the comparison stays fair
+                        requested_max_new_tokens = params["max_new_tokens"]
+                        with get_matchup_pool().live():
+                            (side_a, side_b), params = get_token_budget().run(
+                                params,
+                                lambda budgeted: generate_pair(
+                                    get_executor(),
+                                    chosen_multisynt,
+                                    chosen_hplt,
+                                    user_prompt,
+                                    budgeted,
+                                    flight=get_single_flight(),
+                                    hedger=get_hedger(),
+                                ),
+                            )
+                        if params["max_new_tokens"] < requested_max_new_tokens:
+                            st.info(
+                                f"The arena is busy: both models were limited to {params['max_new_tokens']} new tokens "
+                                f"(you asked for {requested_max_new_tokens})."
+                            )
+                            params = {**params, "requested_max_new_tokens": requested_max_new_tokens}
+                    returncode_a, stdout_a, stderr_a, metrics_a = side_a
+                    returncode_b, stdout_b, stderr_b, metrics_b = side_b
+                    if not pooled:
+                        get_prewarmer().record_use(chosen_multisynt, metrics_a.get("load_s"))
+                        get_prewarmer().record_use(chosen_hplt, metrics_b.get("load_s"))
+
+                    if returncode_a != 0:
                         st.error(f"Error generating from {chosen_multisynt}: {stderr_a}")
                         res_a = f"Slurm Error: {stderr_a}"
                     else:
                         res_a = stdout_a.strip()
 
-                    if process_b.returncode != 0:
+                    if returncode_b != 0:
                         st.error(f"Error generating from {chosen_hplt}: {stderr_b}")
                         res_b = f"Slurm Error: {stderr_b}"
                     else:
@@ -262,6 +551,9 @@ def render_arena_view():
                     st.session_state.model_b_name = chosen_hplt
                     st.session_state.output_a = res_a
                     st.session_state.output_b = res_b
+                    st.session_state.metrics_a = metrics_a
+                    st.session_state.metrics_b = metrics_b
+                    st.session_state.round_params = params
                     st.session_state.generated = True
 
                 except Exception as e:
@@ -284,70 +576,31 @@ def render_arena_view():
             left_text = st.session_state.output_a
             right_text = st.session_state.output_b
 
+        # Votes are registered in callbacks, before the rerun that shows the result
         with col1:
             st.info(left_text)
-            if st.button("👈 Better Fluency (Model 1)", key="vote_left", use_container_width=True):
-                winner = "HPLT" if st.session_state.swap_models else "MultiSynt"
-                register_vote(winner)
-                st.rerun()
+            st.button(
+                "👈 Better Fluency (Model 1)",
+                key="vote_left",
+                use_container_width=True,
+                on_click=register_vote,
+                args=("HPLT" if st.session_state.swap_models else "MultiSynt",),
+            )
 
         with col2:
             st.info(right_text)
-            if st.button("Better Fluency (Model 2) 👉", key="vote_right", use_container_width=True):
-                winner = "MultiSynt" if st.session_state.swap_models else "HPLT"
-                register_vote(winner)
-                st.rerun()
+            st.button(
+                "Better Fluency (Model 2) 👉",
+                key="vote_right",
+                use_container_width=True,
+                on_click=register_vote,
+                args=("MultiSynt" if st.session_state.swap_models else "HPLT",),
+            )
 
-        if st.button("🤝 Tie / Equal Fluency", key="vote_tie", use_container_width=True):
-            register_vote("Tie")
-            st.rerun()
+        st.button("🤝 Tie / Equal Fluency", key="vote_tie", use_container_width=True, on_click=register_vote, args=("Tie",))
 
     # --- VOTE SUBMITTED & STATS ---
     if st.session_state.vote_submitted:
-        vote_val = st.session_state.last_winner
-
-        # Save logic
-        vote_position = "Tie"
-        if vote_val != "Tie":
-            if vote_val == "MultiSynt":
-                vote_position = "Right" if st.session_state.swap_models else "Left"
-            else:
-                vote_position = "Left" if st.session_state.swap_models else "Right"
-
-        file_exists = os.path.isfile(RESULTS_FILE)
-        with open(RESULTS_FILE, mode="a", newline="", encoding="utf-8") as file:
-            writer = csv.writer(file)
-            if not file_exists:
-                writer.writerow(
-                    [
-                        "Timestamp",
-                        "Language",
-                        "Prompt",
-                        "Model_A_Name",
-                        "Model_B_Name",
-                        "Output_A",
-                        "Output_B",
-                        "Swapped",
-                        "Winner_Position",
-                        "Winner_Source",
-                    ]
-                )
-
-            writer.writerow(
-                [
-                    datetime.now(),
-                    st.session_state.current_language,
-                    st.session_state.prompt_text,
-                    st.session_state.model_a_name,
-                    st.session_state.model_b_name,
-                    st.session_state.output_a,
-                    st.session_state.output_b,
-                    st.session_state.swap_models,
-                    vote_position,
-                    vote_val,
-                ]
-            )
-
         st.divider()
 
         # --- ANONYMIZED FEEDBACK LOGIC ---
@@ -388,15 +641,31 @@ def render_arena_view():
         st.button("Start New Round", type="primary", on_click=reset_round)
 
 
+@st.fragment
+def render_generation_settings():
+    """Generation settings sliders. A fragment: moving a slider reruns only these sliders."""
+    with st.expander("🛠️ Generation Settings", expanded=False):
+        st.caption("Adjust these to ensure fair comparisons.")
+        # Store in session state so they persist across re-runs
+        st.session_state.min_tokens = st.slider("Min New Tokens", 10, 100, st.session_state.min_tokens)
+        st.session_state.max_tokens = st.slider("Max New Tokens", 50, 512, st.session_state.max_tokens)
+        st.session_state.rep_penalty = st.slider(
+            "Repetition Penalty", 1.0, 2.0, st.session_state.rep_penalty, step=0.05
+        )
+        st.session_state.temperature = st.slider("Temperature", 0.1, 1.5, st.session_state.temperature, step=0.1)
+
+
 # --- MAIN APP ROUTING ---
 
 # Sidebar Header
-if os.path.exists("oellm_logo.png"):
-    st.sidebar.image("oellm_logo.png", width=120)
+oellm_logo = get_logo("oellm_logo.png")
+if oellm_logo:
+    st.sidebar.image(oellm_logo, width=120)
 st.sidebar.markdown("A series of foundation models for transparent AI in Europe (https://openeurollm.eu/)")
 
-if os.path.exists("airon_logo.png"):
-    st.sidebar.image("airon_logo.png", width=200)
+airon_logo = get_logo("airon_logo.png")
+if airon_logo:
+    st.sidebar.image(airon_logo, width=200)
 else:
     st.sidebar.markdown("**[Airon AI]**")
 st.sidebar.markdown("Sponsor of [hardware and GPUs](https://www.airon.ai/).")
@@ -415,27 +684,14 @@ if app_mode == "⚔️ Arena":
     st.sidebar.selectbox(
         "Select Language", sorted(list(MODELS_DB.keys())), key="current_language", on_change=update_language
     )
+    needed = get_scheduler().languages_needing_votes()
+    if needed:
+        st.sidebar.caption(f"Votes most needed for: {', '.join(needed)}")
 
     st.sidebar.divider()
 
-    with st.sidebar.expander("🛠️ Generation Settings", expanded=False):
-        st.caption("Adjust these to ensure fair comparisons.")
-        # Store in session state so they persist across re-runs
-        if "min_tokens" not in st.session_state:
-            st.session_state.min_tokens = 70
-        if "max_tokens" not in st.session_state:
-            st.session_state.max_tokens = 112
-        if "rep_penalty" not in st.session_state:
-            st.session_state.rep_penalty = 1.2
-        if "temperature" not in st.session_state:
-            st.session_state.temperature = 0.7
-
-        st.session_state.min_tokens = st.slider("Min New Tokens", 10, 100, st.session_state.min_tokens)
-        st.session_state.max_tokens = st.slider("Max New Tokens", 50, 512, st.session_state.max_tokens)
-        st.session_state.rep_penalty = st.slider(
-            "Repetition Penalty", 1.0, 2.0, st.session_state.rep_penalty, step=0.05
-        )
-        st.session_state.temperature = st.slider("Temperature", 0.1, 1.5, st.session_state.temperature, step=0.1)
+    with st.sidebar:
+        render_generation_settings()
 
     render_arena_view()
 
@@ -0,0 +1,358 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import torch
+
+from config import AUTOTUNE_MAX_MEMORY_GB, EXAMPLE_PROMPTS, MODELS_DB, TUNING_PROFILES_FILE
+
+# Bump when calibration changes what it measures; profiles of another version are ignored.
+PROFILE_VERSION = 1
+# What get_pipeline uses without a profile. threads=None leaves torch's thread pool as it is.
+DEFAULTS = {"dtype": "float32", "attn_implementation": "sdpa", "threads": None, "batch_size": 1}
+CALIBRATION_PROMPT = "Det var en gång en liten katt som"
+# Teacher-forced text for the fidelity check of lower-precision dtypes
+FIDELITY_TEXT = " ".join(prompt for prompts in EXAMPLE_PROMPTS.values() for prompt in prompts)
+FIDELITY_TOKENS = 256
+# A tuned setting must beat the defaults by this much, so measurement noise does not pick one
+MIN_SPEEDUP = 1.05
+# A larger batch must add this much throughput over the best smaller one to be worth its memory
+MIN_BATCH_GAIN = 1.1
+
+
+def tunable_models():
+    """Every model in MODELS_DB, in order."""
+    models = []
+    for entry in MODELS_DB.values():
+        hplt = entry["hplt"] if isinstance(entry["hplt"], list) else [entry["hplt"]]
+        for model in [*entry["multisynt"], *hplt]:
+            if model not in models:
+                models.append(model)
+    return models
+
+
+def cpu_model():
+    cpu = platform.processor() or platform.machine()
+    if os.path.exists("/proc/cpuinfo"):
+        with open("/proc/cpuinfo") as f:
+            names = [line.split(":", 1)[1].strip() for line in f if line.startswith("model name")]
+        cpu = names[0] if names else cpu
+    return cpu
+
+
+def usable_cores():
+    """Cores this process may run on (its affinity mask, e.g. a CPU worker's partition)."""
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+
+
+def hardware_fingerprint():
+    """
+    Identifies what a profile was tuned on: CPU model, the cores this process may use and the GPUs.
+    Unlike perf_suite.hardware_key it ignores torch's thread count, which a profile itself changes.
+    """
+    key = f"{platform.machine()} {cpu_model()} ({usable_cores()} cores)"
+    if torch.cuda.is_available():
+        gpus = [torch.cuda.get_device_name(i) for i in range(torch.cuda.device_count())]
+        key += f" + {len(gpus)}x {gpus[0]}"
+    return key
+
+
+def load_profile(model_name, path=None, hardware=None):
+    """The tuning profile stored for `model_name` on this machine, or None."""
+    path = path or TUNING_PROFILES_FILE
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        stored = json.load(f)
+    if stored.get("version") != PROFILE_VERSION:
+        return None
+    return stored["profiles"].get(hardware or hardware_fingerprint(), {}).get(model_name)
+
+
+def save_profile(profile, path=None, hardware=None):
+    """Stores `profile` for its model on this machine, keeping every other (model, machine) profile."""
+    path = path or TUNING_PROFILES_FILE
+    stored = {"version": PROFILE_VERSION, "profiles": {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        if previous.get("version") == PROFILE_VERSION:
+            stored = previous
+    stored["profiles"].setdefault(hardware or hardware_fingerprint(), {})[profile["model"]] = profile
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Written whole and renamed, so a worker loading a model never reads a half-written file
+    with open(path + ".tmp", "w") as f:
+        json.dump(stored, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(path + ".tmp", path)
+
+
+def describe(settings):
+    threads = settings.get("threads") or "default"
+    return (
+        f"{settings['dtype']}, {settings['attn_implementation']} attention, {threads} threads, "
+        f"batch size {settings['batch_size']}"
+    )
+
+
+def default_memory_limit_gb():
+    """90% of GPU 0's memory, or 80% of the RAM free right now."""
+    if torch.cuda.is_available():
+        return 0.9 * torch.cuda.get_device_properties(0).total_memory / 2**30
+    with open("/proc/meminfo") as f:
+        fields = dict(line.split(":", 1) for line in f)
+    return 0.8 * int(fields["MemAvailable"].split()[0]) / 2**20
+
+
+def _proc_status_bytes(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _reset_peak_memory():
+    if torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+        return
+    try:
+        # Resets the process's peak RSS (VmHWM) to its current RSS
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _memory_now():
+    return torch.cuda.memory_allocated() if torch.cuda.is_available() else _proc_status_bytes("VmRSS")
+
+
+def _peak_memory():
+    return torch.cuda.max_memory_allocated() if torch.cuda.is_available() else _proc_status_bytes("VmHWM")
+
+
+def _unload(pipe):
+    del pipe
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def measure_tokens_per_s(pipe, batch_size=1, new_tokens=32, repeats=3):
+    """Median greedy decode throughput (new tokens/s over the whole batch), after one warm-up run."""
+    prompts = [CALIBRATION_PROMPT] * batch_size
+
+    def generate():
+        pipe(
+            prompts,
+            batch_size=batch_size,
+            max_new_tokens=new_tokens,
+            min_new_tokens=new_tokens,
+            do_sample=False,
+            pad_token_id=pipe.tokenizer.pad_token_id,
+        )
+
+    generate()
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        generate()
+        runs.append(time.perf_counter() - start)
+    return batch_size * new_tokens / statistics.median(runs)
+
+
+def next_token_predictions(pipe):
+    """The model's top next token at every position of FIDELITY_TEXT."""
+    inputs = pipe.tokenizer(FIDELITY_TEXT, return_tensors="pt", truncation=True, max_length=FIDELITY_TOKENS)
+    with torch.no_grad():
+        logits = pipe.model(**inputs.to(pipe.model.device)).logits
+    return logits[0].argmax(-1).cpu()
+
+
+def _search_space(dtypes, attn_implementations, threads):
+    on_gpu = torch.cuda.is_available()
+    if dtypes is None:
+        dtypes = ["float32", "bfloat16"]
+        if on_gpu:
+            dtypes = dtypes + ["float16"] if torch.cuda.is_bf16_supported() else ["float32", "float16"]
+    if attn_implementations is None:
+        from transformers.utils import is_flash_attn_2_available
+
+        attn_implementations = ["sdpa", "eager"]
+        if on_gpu and is_flash_attn_2_available():
+            attn_implementations.append("flash_attention_2")
+    if threads is None:
+        # Threads only matter on CPU: all usable cores, then halving
+        cores = usable_cores()
+        threads = [None] if on_gpu else sorted({cores, max(1, cores // 2), max(1, cores // 4)}, reverse=True)
+    return dtypes, attn_implementations, threads
+
+
+def autotune(
+    model_name,
+    max_memory_gb=None,
+    dtypes=None,
+    attn_implementations=None,
+    threads=None,
+    batch_sizes=(1, 2, 4, 8),
+    new_tokens=32,
+    repeats=3,
+    min_agreement=0.95,
+):
+    """
+    Calibrates `model_name` on this machine. Every dtype x attention implementation is loaded once and
+    timed at every thread count on single-prompt greedy decoding (what a vote round waits for); the
+    fastest then gets the batch size with the best batched throughput. Candidates are skipped when
+    their peak memory (while loading and generating) exceeds `max_memory_gb`, or when their next-token
+    predictions agree with float32's on less than `min_agreement` of the positions.
+    A setting must beat the defaults by MIN_SPEEDUP to be chosen. Returns the profile (not yet saved):
+    the settings, their tokens/s, the defaults' tokens/s, the speedup and every candidate's result.
+    """
+    from backend import get_pipeline
+
+    max_memory_gb = max_memory_gb or AUTOTUNE_MAX_MEMORY_GB or default_memory_limit_gb()
+    dtypes, attn_implementations, threads = _search_space(dtypes, attn_implementations, threads)
+    default_threads = torch.get_num_threads()
+    candidates, reference, weights_fp32 = [], None, None
+
+    def load(settings):
+        gc.collect()
+        before = _memory_now()
+        _reset_peak_memory()
+        return get_pipeline(model_name, 0, settings=settings), before
+
+    try:
+        # The defaults first: the baseline to beat, the float32 reference predictions and the weights' size
+        pipe, before = load(DEFAULTS)
+        reference = next_token_predictions(pipe)
+        weights_fp32 = pipe.model.get_memory_footprint()
+        default_tokens_per_s = measure_tokens_per_s(pipe, new_tokens=new_tokens, repeats=repeats)
+        _unload(pipe)
+        print(f"Defaults ({describe(DEFAULTS)}): {default_tokens_per_s:.1f} tokens/s", file=sys.stderr)
+
+        for dtype in dtypes:
+            for attn in attn_implementations:
+                settings = {**DEFAULTS, "dtype": dtype, "attn_implementation": attn}
+                results = [{**settings, "threads": n} for n in threads]
+                # Weights alone scale with the dtype's width: skip loads that cannot fit
+                estimate_gb = weights_fp32 * torch.finfo(getattr(torch, dtype)).bits / 32 / 2**30
+                if estimate_gb > max_memory_gb:
+                    candidates += [{**result, "skipped": f"weights need ~{estimate_gb:.1f} GB"} for result in results]
+                    continue
+                try:
+                    pipe, before = load(settings)
+                except Exception as e:
+                    candidates += [{**result, "skipped": f"failed to load: {e}"} for result in results]
+                    continue
+                agreement = float((next_token_predictions(pipe) == reference).float().mean())
+                for result in results:
+                    torch.set_num_threads(result["threads"] or default_threads)
+                    result["agreement"] = round(agreement, 4)
+                    if agreement < min_agreement:
+                        result["skipped"] = f"agrees with float32 on {agreement:.0%} of next tokens"
+                        continue
+                    result["tokens_per_s"] = measure_tokens_per_s(pipe, new_tokens=new_tokens, repeats=repeats)
+                    result["memory_gb"] = (_peak_memory() - before) / 2**30
+                    if result["memory_gb"] > max_memory_gb:
+                        result["skipped"] = f"peak memory {result['memory_gb']:.1f} GB"
+                torch.set_num_threads(default_threads)
+                _unload(pipe)
+                candidates += results
+                for result in results:
+                    outcome = result.get("skipped") or f"{result['tokens_per_s']:.1f} tokens/s"
+                    print(f"  {describe(result)}: {outcome}", file=sys.stderr)
+
+        timed = [c for c in candidates if not c.get("skipped")]
+        best = max(timed, key=lambda c: c["tokens_per_s"], default=None)
+        if best is None or best["tokens_per_s"] < default_tokens_per_s * MIN_SPEEDUP:
+            best = {**DEFAULTS, "tokens_per_s": default_tokens_per_s}
+        settings = {key: best[key] for key in DEFAULTS}
+
+        # Batch size for the winner: grow while throughput keeps paying for the memory
+        pipe, before = load(settings)
+        if settings["threads"]:
+            torch.set_num_threads(settings["threads"])
+        batch_tokens_per_s = best["tokens_per_s"]
+        for batch_size in sorted(b for b in batch_sizes if b > 1):
+            _reset_peak_memory()
+            tokens_per_s = measure_tokens_per_s(pipe, batch_size, new_tokens=new_tokens, repeats=repeats)
+            memory_gb = (_peak_memory() - before) / 2**30
+            result = {**settings, "batch_size": batch_size, "tokens_per_s": tokens_per_s, "memory_gb": memory_gb}
+            candidates.append(result)
+            print(f"  {describe(result)}: {tokens_per_s:.1f} tokens/s, {memory_gb:.2f} GB", file=sys.stderr)
+            if memory_gb > max_memory_gb:
+                result["skipped"] = f"peak memory {memory_gb:.1f} GB"
+                break
+            if tokens_per_s < batch_tokens_per_s * MIN_BATCH_GAIN:
+                break
+            settings["batch_size"], batch_tokens_per_s = batch_size, tokens_per_s
+        _unload(pipe)
+    finally:
+        torch.set_num_threads(default_threads)
+
+    return {
+        "model": model_name,
+        "hardware": hardware_fingerprint(),
+        "settings": settings,
+        "tokens_per_s": round(best["tokens_per_s"], 2),
+        "default_tokens_per_s": round(default_tokens_per_s, 2),
+        "speedup": round(best["tokens_per_s"] / default_tokens_per_s, 3),
+        "batch_tokens_per_s": round(batch_tokens_per_s, 2),
+        "max_memory_gb": round(max_memory_gb, 2),
+        "tuned_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "torch": torch.__version__,
+        "candidates": candidates,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Tune dtype, attention implementation, threads and batch size for a model on this machine, "
+        "and store the best profile for get_pipeline to apply."
+    )
+    parser.add_argument("--model", required=True, help="A MODELS_DB model (or, with --allow_any, any model path).")
+    parser.add_argument("--allow_any", action="store_true", help="Accept models outside MODELS_DB.")
+    parser.add_argument(
+        "--max_memory_gb", type=float, help="Default: ARENA_AUTOTUNE_MAX_MEMORY_GB, else from free memory."
+    )
+    parser.add_argument("--dtypes", nargs="+", help="Default: float32 bfloat16 (+ float16 on GPU).")
+    parser.add_argument("--attn", nargs="+", help="Default: sdpa eager (+ flash_attention_2 when installed).")
+    parser.add_argument("--threads", nargs="+", type=int, help="Default (CPU): all usable cores, half, a quarter.")
+    parser.add_argument("--batch_sizes", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--new_tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--min_agreement", type=float, default=0.95)
+    parser.add_argument("--profiles_file", default=TUNING_PROFILES_FILE)
+    parser.add_argument("--dry_run", action="store_true", help="Report the best profile without storing it.")
+    args = parser.parse_args()
+
+    if not args.allow_any and args.model not in tunable_models():
+        parser.error(f"{args.model} is not in MODELS_DB (pass --allow_any to tune it anyway).")
+
+    profile = autotune(
+        args.model,
+        max_memory_gb=args.max_memory_gb,
+        dtypes=args.dtypes,
+        attn_implementations=args.attn,
+        threads=args.threads,
+        batch_sizes=args.batch_sizes,
+        new_tokens=args.new_tokens,
+        repeats=args.repeats,
+        min_agreement=args.min_agreement,
+    )
+    print(f"\nHardware: {profile['hardware']}")
+    print(f"Best: {describe(profile['settings'])}")
+    print(
+        f"  {profile['tokens_per_s']:.1f} tokens/s vs. {profile['default_tokens_per_s']:.1f} with the defaults "
+        f"({profile['speedup']:.2f}x); batched: {profile['batch_tokens_per_s']:.1f} tokens/s"
+    )
+    if not args.dry_run:
+        save_profile(profile, args.profiles_file)
+        print(f"Saved profile to {args.profiles_file}")
@@ -1,40 +1,393 @@
 import argparse
+import gc
+import json
+import os
+import socket
 import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
 import torch
-from transformers import pipeline
+from accelerate import dispatch_model, infer_auto_device_map
+from transformers import (
+    AutoConfig,
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    StaticCache,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    pipeline,
+)
+
+from autotune import DEFAULTS, describe, load_profile, usable_cores
+from config import TUNING_PROFILES
+from fast_load import FastLoadUnsupported, LoadTimer, load_model_fast
+from profiling import profile_generation
+
+# --- FAST DECODE SETTINGS ---
+# Prompts are left-padded up to the next prompt bucket and the static KV cache is sized to
+# (prompt bucket + new-token bucket), so torch.compile only ever sees a bounded set of shapes.
+PROMPT_BUCKETS = (32, 64, 128, 256, 512)
+NEW_TOKEN_BUCKETS = (64, 128, 256, 512)
+# Buckets compiled at load time: short prompts with the app's default token budget (112 -> 128).
+WARMUP_BUCKETS = ((32, 128), (64, 128))
+
+# Pipelines loaded with fast_decode=True, mapped to their preallocated static caches per bucket.
+_FAST_DECODE_CACHES = weakref.WeakKeyDictionary()
+# Load-phase breakdown of every pipeline returned by get_pipeline.
+_LOAD_TIMINGS = weakref.WeakKeyDictionary()
+# Tuning profile (see autotune.py) applied to each pipeline returned by get_pipeline, if any.
+_TUNING_PROFILES = weakref.WeakKeyDictionary()
+# Dynamo's (recompile_limit, accumulated_recompile_limit) before reserve_compiled_models first raised them.
+_DYNAMO_DEFAULT_LIMITS = None
 
 
-def get_pipeline(model_name, device_id):
+def get_bucket(length, buckets):
+    """
+    Returns the smallest bucket that fits `length`.
+    Lengths beyond the largest bucket are rounded up to a multiple of it.
+    """
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+    largest = buckets[-1]
+    return -(-length // largest) * largest
+
+
+def bucket_graphs():
+    """
+    Graphs one compiled model needs for the whole bucket grid: a prefill per (prompt bucket, cache length)
+    and a single-token decode step per cache length.
+    """
+    shapes = {(prompt, prompt + new) for prompt in PROMPT_BUCKETS for new in NEW_TOKEN_BUCKETS}
+    return len(shapes) + len({cache_len for _, cache_len in shapes})
+
+
+def reserve_compiled_models(max_models):
+    """
+    Sizes Dynamo's recompile limits for `max_models` compiled models resident at once. Dynamo keeps at
+    most recompile_limit graphs per function (shared by every compiled model) and runs any further shape
+    eagerly without a word. Sized from the process's defaults, so loading and evicting models never grows it.
+    """
+    global _DYNAMO_DEFAULT_LIMITS
+    dynamo_config = torch._dynamo.config
+    if _DYNAMO_DEFAULT_LIMITS is None:
+        _DYNAMO_DEFAULT_LIMITS = (dynamo_config.recompile_limit, dynamo_config.accumulated_recompile_limit)
+    recompile_limit, accumulated_limit = _DYNAMO_DEFAULT_LIMITS
+    dynamo_config.recompile_limit = max(dynamo_config.recompile_limit, recompile_limit + max_models * bucket_graphs())
+    dynamo_config.accumulated_recompile_limit = max(
+        dynamo_config.accumulated_recompile_limit, accumulated_limit, dynamo_config.recompile_limit
+    )
+
+
+def enable_fast_decode(pipe, warmup_buckets=WARMUP_BUCKETS):
+    """
+    Switches a loaded pipeline to static-cache generation with a compiled model forward.
+    Compilation is triggered immediately for `warmup_buckets` so the first real request is fast.
+    """
+    print("Enabling fast decode (static KV cache + torch.compile)...", file=sys.stderr)
+    # Room for this model's whole bucket grid at least (a PipelineCache reserves room for all its models)
+    reserve_compiled_models(1)
+    pipe.model.forward = torch.compile(pipe.model.forward, dynamic=False)
+    _FAST_DECODE_CACHES[pipe] = {}
+
+    for prompt_bucket, new_bucket in warmup_buckets:
+        print(f"Warming up fast decode bucket ({prompt_bucket}, {new_bucket})...", file=sys.stderr)
+        # Two new tokens are enough to compile both the prefill and the single-token decode graph
+        _generate(pipe, "warmup", prompt_bucket=prompt_bucket, new_bucket=new_bucket,
+                  max_new_tokens=2, min_new_tokens=2, max_length=None, do_sample=False,
+                  pad_token_id=pipe.tokenizer.pad_token_id)
+
+    return pipe
+
+
+def _get_static_cache(pipe, cache_len):
+    """Returns the preallocated static cache for this bucket, reset for a new sequence."""
+    caches = _FAST_DECODE_CACHES[pipe]
+    if cache_len not in caches:
+        cache = StaticCache(config=pipe.model.config, max_cache_len=cache_len)
+        # Allocated up front: traced on a lazily allocated cache, the warm-up's prefill graph would not
+        # match the reset (already allocated) cache of every later request, which would recompile it
+        config = pipe.model.config.get_text_config()
+        num_heads = getattr(config, "num_key_value_heads", None) or config.num_attention_heads
+        head_dim = getattr(config, "head_dim", None) or config.hidden_size // config.num_attention_heads
+        cache.early_initialization(1, num_heads, head_dim, pipe.model.dtype, pipe.model.device)
+        caches[cache_len] = cache
+    cache = caches[cache_len]
+    cache.reset()
+    return cache
+
+
+def _generate(pipe, prompt, prompt_bucket=None, new_bucket=None, **generate_kwargs):
+    """
+    Runs the pipeline, routing through the static cache when fast decode is enabled.
+    """
+    if pipe not in _FAST_DECODE_CACHES:
+        return pipe(prompt, **generate_kwargs)
+
+    if prompt_bucket is None:
+        prompt_len = len(pipe.tokenizer(prompt)["input_ids"])
+        prompt_bucket = get_bucket(prompt_len, PROMPT_BUCKETS)
+    if new_bucket is None:
+        new_bucket = get_bucket(generate_kwargs["max_new_tokens"], NEW_TOKEN_BUCKETS)
+
+    return pipe(
+        prompt,
+        padding="max_length",
+        tokenizer_encode_kwargs={"max_length": prompt_bucket},
+        past_key_values=_get_static_cache(pipe, prompt_bucket + new_bucket),
+        **generate_kwargs,
+    )
+
+
+def _settings_for(model_name, settings):
+    """(settings to load with, the stored profile they come from or None)."""
+    if settings is not None:
+        return {**DEFAULTS, **settings}, None
+    profile = load_profile(model_name) if TUNING_PROFILES else None
+    if profile is None:
+        return dict(DEFAULTS), None
+    return {**DEFAULTS, **profile["settings"]}, profile
+
+
+def _load_model_standard(model_name, dtype, attn_implementation, timer):
+    """
+    The standard loader, timed phase by phase like the fast one (see fast_load.py): the model is
+    allocated and the checkpoint read in its stored dtype on the CPU, then converted to `dtype`, then
+    placed as device_map="auto" would (spread over the GPUs' free memory; the CPU without a GPU).
+    """
+    with timer.phase("config"):
+        model_config = AutoConfig.from_pretrained(model_name, trust_remote_code=True)
+    with timer.phase("weights"):
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            config=model_config,
+            dtype="auto",
+            attn_implementation=attn_implementation,
+            trust_remote_code=True,
+        )
+    with timer.phase("dtype"):
+        model = model.to(dtype)
+    with timer.phase("placement"):
+        if torch.cuda.is_available():
+            device_map = infer_auto_device_map(model, no_split_module_classes=model._no_split_modules)
+            model = dispatch_model(model, device_map=device_map)
+    return model
+
+
+def get_pipeline(
+    model_name, device_id, fast_decode=False, shared_weights=False, fast_load=False, settings=None, apply_threads=False
+):
     """
     Loads a pipeline for a specific model.
     Ignores device_id and uses device_map="auto" to handle resource contention (e.g. vLLM on GPU 1).
+    With fast_decode=True the model is compiled for static-cache generation and warmed up.
+    With shared_weights=True (CPU only) the weights are mapped from the node's shared copy
+    instead of being loaded into this process (see shared_weights.py).
+    With fast_load=True the model is built on the meta device and its safetensors shards are read
+    in parallel straight into the load dtype (see fast_load.py), falling back to the standard loader
+    for checkpoints that do not support it.
+    The dtype, attention implementation, thread count and batch size come from the tuning profile
+    autotune.py stored for this model on this machine (float32, sdpa, torch's threads and batch size 1
+    without one), unless `settings` gives them explicitly. Threads are process-wide, so they are only
+    applied with apply_threads=True, by processes that serve this one model (a backend.py run or a
+    single-model worker); shared weights keep their float32 copy's dtype and attention.
+    The time spent in each load phase is available afterwards from get_load_timings(pipe), the applied
+    profile from get_tuning_profile(pipe).
     """
-    # Write info messages to stderr so they don't corrupt stdout which is used for the generated text
-    print(f"Loading {model_name} with device_map='auto'...", file=sys.stderr)
+    timer = LoadTimer()
+    settings, profile = _settings_for(model_name, settings)
+    dtype = getattr(torch, settings["dtype"])
+    if apply_threads and settings["threads"]:
+        torch.set_num_threads(min(settings["threads"], usable_cores()))
+    if shared_weights and torch.cuda.is_available():
+        print("Shared weights only apply to CPU workers; loading normally.", file=sys.stderr)
+        shared_weights = False
+
+    model = None
+    if shared_weights:
+        from shared_weights import load_shared_model
+
+        with timer.phase("shared_weights"):
+            model = load_shared_model(model_name)
+    elif fast_load:
+        try:
+            model = load_model_fast(
+                model_name, dtype=dtype, timer=timer, attn_implementation=settings["attn_implementation"]
+            )
+        except FastLoadUnsupported as e:
+            print(f"Fast load not possible ({e}); loading normally.", file=sys.stderr)
+
+    if model is None:
+        # Write info messages to stderr so they don't corrupt stdout which is used for the generated text
+        print(f"Loading {model_name} with device_map='auto'...", file=sys.stderr)
+        model = _load_model_standard(model_name, dtype, settings["attn_implementation"], timer)
+
+    with timer.phase("tokenizer"):
+        tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+    with timer.phase("pipeline"):
+        pipe = pipeline("text-generation", model=model, tokenizer=tokenizer, batch_size=settings["batch_size"])
 
-    pipe = pipeline(
-        "text-generation", 
-        model=model_name, 
-        device_map="auto", 
-        torch_dtype=torch.float32, 
-        model_kwargs={"attn_implementation": "sdpa"},
-        trust_remote_code=True
-    )
-    
     # Critical fix for models without pad_token
     if pipe.tokenizer.pad_token_id is None:
         pipe.tokenizer.pad_token_id = pipe.tokenizer.eos_token_id
         
     # FORCE LEFT PADDING for decoder-only generation to avoid shape errors
     pipe.tokenizer.padding_side = "left"
-        
+
+    if fast_decode:
+        with timer.phase("fast_decode"):
+            enable_fast_decode(pipe)
+
+    _LOAD_TIMINGS[pipe] = timer.phases
+    print(f"Loaded {model_name} in {timer.total():.2f}s ({timer.summary()})", file=sys.stderr)
+    if profile is not None:
+        _TUNING_PROFILES[pipe] = profile
+        print(
+            f"Applied tuning profile ({describe(settings)}): {profile['speedup']:.2f}x the defaults' "
+            f"{profile['default_tokens_per_s']:.1f} tokens/s on this machine (tuned {profile['tuned_at']})",
+            file=sys.stderr,
+        )
     return pipe
 
 
-def generate_text(pipe, prompt, **kwargs):
+def get_load_timings(pipe):
+    """Seconds spent in each phase of loading `pipe`, e.g. {"config": 0.1, "pipeline": 4.2}."""
+    return dict(_LOAD_TIMINGS.get(pipe, {}))
+
+
+def get_tuning_profile(pipe):
+    """The tuning profile applied when loading `pipe` (settings, tokens/s, speedup), or None."""
+    return _TUNING_PROFILES.get(pipe)
+
+
+class PipelineCache:
     """
-    Generates text using the provided pipeline with dynamic arguments.
+    Keeps up to `max_models` loaded pipelines, evicting the least recently used one.
+    Used by long-lived workers so repeat requests for a model skip loading.
+    `apply_threads` is passed on to get_pipeline.
+    """
+
+    def __init__(self, max_models=1, fast_decode=False, shared_weights=False, fast_load=False, apply_threads=False):
+        self.max_models = max_models
+        self.fast_decode = fast_decode
+        self.shared_weights = shared_weights
+        self.fast_load = fast_load
+        self.apply_threads = apply_threads
+        self._pipes = OrderedDict()
+        self._loading = {}  # model name -> lock held while it loads
+        self._lock = threading.Lock()
+        if fast_decode:
+            reserve_compiled_models(max_models)
+
+    def _make_room(self, model_name):
+        """Evicts least recently used pipelines until `model_name` fits beside other loads (caller holds the lock)."""
+        while self._pipes and len(self._pipes) + len(self._loading) > self.max_models:
+            evicted, _ = self._pipes.popitem(last=False)
+            print(f"Evicting {evicted} to make room for {model_name}", file=sys.stderr)
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def get(self, model_name, evict=True):
+        """
+        Returns (pipe, was_resident). The model loads outside the cache lock, so lookups of resident
+        models never wait behind a load. With `evict` False, returns (None, False) instead of loading
+        a model that would evict another one.
+        """
+        while True:
+            with self._lock:
+                if model_name in self._pipes:
+                    self._pipes.move_to_end(model_name)
+                    return self._pipes[model_name], True
+                loading = self._loading.get(model_name)
+                if loading is None:
+                    if not evict and len(self._pipes) + len(self._loading) >= self.max_models:
+                        return None, False
+                    loading = self._loading[model_name] = threading.Lock()
+                    loading.acquire()
+                    self._make_room(model_name)
+                    break
+            # Another caller is loading it: wait for that load, then look again
+            with loading:
+                pass
+
+        try:
+            pipe = get_pipeline(
+                model_name,
+                0,
+                fast_decode=self.fast_decode,
+                shared_weights=self.shared_weights,
+                fast_load=self.fast_load,
+                apply_threads=self.apply_threads,
+            )
+            with self._lock:
+                self._pipes[model_name] = pipe
+            return pipe, False
+        finally:
+            with self._lock:
+                del self._loading[model_name]
+                self._make_room(model_name)
+            loading.release()
+
+    def resident(self):
+        with self._lock:
+            return list(self._pipes)
+
+
+class GenerationTimer(StoppingCriteria):
+    """
+    Never stops generation. Called once per generated token, it records when the first token
+    arrived (end of prefill) and the last token, for the per-generation metrics record.
+    """
+
+    def __init__(self):
+        self.first_token_at = None
+        self.new_tokens = 0
+        self.last_token = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.new_tokens += 1
+        self.last_token = int(input_ids[0, -1])
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+
+class CancelCriteria(StoppingCriteria):
+    """Stops generation once `cancel_event` is set."""
+
+    def __init__(self, cancel_event):
+        self.cancel_event = cancel_event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.cancel_event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def _stop_reason(pipe, timer, max_new_tokens):
+    eos = pipe.model.generation_config.eos_token_id
+    if eos is None:
+        eos = pipe.tokenizer.eos_token_id
+    eos_ids = eos if isinstance(eos, (list, tuple)) else [eos]
+    if timer.last_token in eos_ids:
+        return "eos"
+    if timer.new_tokens >= max_new_tokens:
+        return "max_new_tokens"
+    return "stop"
+
+
+def generate_with_metrics(pipe, prompt, cancel_event=None, **kwargs):
     """
+    Generates text like generate_text and also returns a metrics record:
+    prompt/new token counts, prefill time (until the first new token), decode time (the rest)
+    and the stop reason ("eos", "max_new_tokens", "stop", "cancelled" or "error").
+    Setting `cancel_event` stops the generation after the current token.
+    """
+    timer = GenerationTimer()
+    criteria = StoppingCriteriaList([timer] if cancel_event is None else [timer, CancelCriteria(cancel_event)])
+    start = time.perf_counter()
     try:
         # Default fallbacks if not provided in kwargs
         max_new = kwargs.get("max_new_tokens", 256)
@@ -45,21 +398,49 @@ def generate_text(pipe, prompt, **kwargs):
         # Ensure we don't pass 'max_length' if 'max_new_tokens' is present
         # and explicitly disable it to prevent config defaults from causing issues
         
-        output = pipe(
-            prompt,
-            max_new_tokens=max_new,
-            min_new_tokens=min_new,
-            max_length=None, # Explicitly unset max_length default
-            do_sample=True,
-            temperature=temp,
-            top_p=0.9,
-            repetition_penalty=rep_pen,
-            pad_token_id=pipe.tokenizer.pad_token_id, # Explicitly pass pad_token_id
+        with profile_generation(pipe.model.name_or_path):
+            output = _generate(
+                pipe,
+                prompt,
+                max_new_tokens=max_new,
+                min_new_tokens=min_new,
+                max_length=None, # Explicitly unset max_length default
+                do_sample=True,
+                temperature=temp,
+                top_p=0.9,
+                repetition_penalty=rep_pen,
+                pad_token_id=pipe.tokenizer.pad_token_id, # Explicitly pass pad_token_id
+                stopping_criteria=criteria,
+            )
+        text = output[0]["generated_text"]
+        stop_reason = "cancelled" if cancel_event is not None and cancel_event.is_set() else _stop_reason(
+            pipe, timer, max_new
         )
-        return output[0]["generated_text"]
     except Exception as e:
         print(f"Error generating text: {str(e)}", file=sys.stderr)
-        return ""
+        text, stop_reason = "", "error"
+
+    end = time.perf_counter()
+    first_token_at = timer.first_token_at or end
+    return text, {
+        "prompt_tokens": len(pipe.tokenizer(prompt)["input_ids"]) if stop_reason != "error" else None,
+        "new_tokens": timer.new_tokens,
+        "prefill_s": first_token_at - start,
+        "decode_s": end - first_token_at,
+        "stop_reason": stop_reason,
+    }
+
+
+def generate_text(pipe, prompt, **kwargs):
+    """
+    Generates text using the provided pipeline with dynamic arguments.
+    """
+    return generate_with_metrics(pipe, prompt, **kwargs)[0]
+
+
+def node_name():
+    """Name of the node this process runs on, as Slurm knows it when available."""
+    return os.environ.get("SLURMD_NODENAME") or socket.gethostname()
 
 
 if __name__ == "__main__":
@@ -70,12 +451,45 @@ if __name__ == "__main__":
     parser.add_argument("--max_new_tokens", type=int, default=256)
     parser.add_argument("--temperature", type=float, default=0.7)
     parser.add_argument("--repetition_penalty", type=float, default=1.15)
-    
+    parser.add_argument(
+        "--cpu_cores",
+        type=str,
+        help="Pin this worker to a cpulist (e.g. '0-7') and size torch's thread pools to it.",
+    )
+    parser.add_argument("--interop_threads", type=int, default=1)
+    parser.add_argument(
+        "--fast_decode",
+        action="store_true",
+        help="Static KV cache + torch.compile. Pays a compile warm-up at load, so only worth it for long-lived workers.",
+    )
+    parser.add_argument(
+        "--shared_weights",
+        action="store_true",
+        help="Map the node's shared copy of the weights instead of loading a private one (CPU only).",
+    )
+    parser.add_argument(
+        "--fast_load",
+        action="store_true",
+        help="Meta-device init and parallel safetensors streaming straight into the load dtype.",
+    )
+
     args = parser.parse_args()
 
-    pipe = get_pipeline(args.model_name, 0)
+    if args.cpu_cores:
+        from cpu_affinity import apply_cpu_partition, parse_cpulist
+
+        apply_cpu_partition(parse_cpulist(args.cpu_cores), interop_threads=args.interop_threads)
+
+    pipe = get_pipeline(
+        args.model_name,
+        0,
+        fast_decode=args.fast_decode,
+        shared_weights=args.shared_weights,
+        fast_load=args.fast_load,
+        apply_threads=True,
+    )
     
-    result = generate_text(
+    result, metrics = generate_with_metrics(
         pipe,
         args.prompt,
         min_new_tokens=args.min_new_tokens,
@@ -84,5 +498,11 @@ if __name__ == "__main__":
         repetition_penalty=args.repetition_penalty
     )
     
+    # The metrics record goes to stderr as one tagged JSON line (see serving.parse_metrics)
+    from serving import METRICS_PREFIX
+
+    metrics.update(cached=False, load_s=sum(get_load_timings(pipe).values()), worker=node_name())
+    print(METRICS_PREFIX + json.dumps(metrics), file=sys.stderr)
+
     # Print exactly the result to stdout for capture by the orchestrator
     print(result)
@@ -5,14 +5,15 @@ import os
 import pandas as pd
 import torch
 
-from backend import generate_text, get_pipeline
+from backend import generate_text, get_load_timings, get_pipeline
 from config import EXAMPLE_PROMPTS, MODELS_DB
 
 RESULTS_FILE = "backend_benchmark_results.csv"
 
 
-def run_benchmark(limit=None):
+def run_benchmark(limit=None, fast_load=False):
     results = []
+    load_timings = []
 
     languages = list(MODELS_DB.keys())
     if limit:
@@ -34,11 +35,14 @@ def run_benchmark(limit=None):
         try:
             # Load HPLT Model on GPU 1
             print(f"Loading HPLT model: {hplt_model}")
-            pipe_hplt = get_pipeline(hplt_model, 1)
+            pipe_hplt = get_pipeline(hplt_model, 1, fast_load=fast_load)
 
             # Load MultiSynt Model on GPU 0
             print(f"Loading MultiSynt model: {multisynt_model}")
-            pipe_ms = get_pipeline(multisynt_model, 0)
+            pipe_ms = get_pipeline(multisynt_model, 0, fast_load=fast_load)
+
+            for model_name, pipe in ((hplt_model, pipe_hplt), (multisynt_model, pipe_ms)):
+                load_timings.append({"Model": model_name, **get_load_timings(pipe)})
 
             for prompt in prompts:
                 print(f"Generating for prompt: {prompt[:50]}...")
@@ -79,10 +83,15 @@ def run_benchmark(limit=None):
 
     print(f"\nBenchmark complete. Results saved to {RESULTS_FILE}")
 
+    if load_timings:
+        print("\nLoad time per phase (s):")
+        print(pd.DataFrame(load_timings).set_index("Model").round(2).to_string())
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--limit", type=int, help="Limit number of languages to test")
+    parser.add_argument("--fast_load", action="store_true", help="Load models with meta init + shard streaming")
     args = parser.parse_args()
 
-    run_benchmark(limit=args.limit)
+    run_benchmark(limit=args.limit, fast_load=args.fast_load)
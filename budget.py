@@ -0,0 +1,138 @@
+import math
+import threading
+
+from config import ROUND_SLO_S, TOKEN_BUDGET_ENABLED, TOKEN_BUDGET_MIN_TOKENS
+
+
+def round_timing(results):
+    """
+    (queue wait, load + prefill seconds, seconds per new token) of a finished round, each from the
+    slower side since the round waits for both. None if a side failed or generated nothing.
+    """
+    metrics = [result[3] for result in results if result[0] == 0 and result[3].get("new_tokens")]
+    if len(metrics) < len(results):
+        return None
+    return (
+        max(m.get("queue_wait_s") or 0.0 for m in metrics),
+        max((m.get("load_s") or 0.0) + (m.get("prefill_s") or 0.0) for m in metrics),
+        max(m["decode_s"] / m["new_tokens"] for m in metrics),
+    )
+
+
+class TokenBudget:
+    """
+    Admission-time token budget for a round-latency SLO.
+    A round admitted behind `depth - 1` others in flight is predicted to take
+    wait_per_round_s * (depth - 1) + fixed_s + max_new_tokens * per_token_s,
+    with the three estimates smoothed (EWMA) over finished rounds' metrics. When the requested
+    max_new_tokens would miss `slo_s`, the round gets the largest budget that fits, but never less
+    than `min_tokens`. Both sides of a pair get the same budget, so the comparison stays fair.
+    Until `min_samples` rounds have finished, requests are not limited.
+    """
+
+    def __init__(
+        self,
+        slo_s=ROUND_SLO_S,
+        min_tokens=TOKEN_BUDGET_MIN_TOKENS,
+        enabled=TOKEN_BUDGET_ENABLED,
+        smoothing=0.2,
+        min_samples=5,
+    ):
+        self.slo_s = slo_s
+        self.min_tokens = min_tokens
+        self.enabled = enabled
+        self.smoothing = smoothing
+        self.min_samples = min_samples
+        # Until rounds have queued, a round is assumed to wait a whole round per round ahead
+        self.estimates = {"wait_per_round_s": None, "fixed_s": None, "per_token_s": None}
+        self.samples = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.counters = {"rounds": 0, "limited": 0, "tokens_requested": 0, "tokens_allowed": 0, "met_slo": 0}
+
+    def _smooth(self, key, value):
+        previous = self.estimates[key]
+        self.estimates[key] = value if previous is None else previous + self.smoothing * (value - previous)
+
+    def predict(self, depth, max_new_tokens):
+        """Predicted latency (s) of a round admitted at `depth` with this budget, or None without history."""
+        with self._lock:
+            if self.samples < self.min_samples:
+                return None
+            fixed_s, per_token_s = self.estimates["fixed_s"], self.estimates["per_token_s"]
+            wait_per_round_s = self.estimates["wait_per_round_s"]
+            if wait_per_round_s is None:
+                wait_per_round_s = fixed_s + max_new_tokens * per_token_s
+        return wait_per_round_s * (depth - 1) + fixed_s + max_new_tokens * per_token_s
+
+    def allowed_tokens(self, requested, depth):
+        """The max_new_tokens a round admitted at `depth` (itself included) may use."""
+        if not self.enabled or requested <= self.min_tokens:
+            return requested
+        predicted = self.predict(depth, requested)
+        if predicted is None or predicted <= self.slo_s:
+            return requested
+        # The prediction is linear in the budget: solve it for the SLO
+        per_token_s = self.estimates["per_token_s"]
+        spare_s = self.slo_s - (predicted - requested * per_token_s)
+        fits = math.floor(spare_s / per_token_s) if per_token_s > 0 else requested
+        return max(self.min_tokens, min(requested, fits))
+
+    def observe(self, results, depth):
+        """Updates the estimates from a finished round that was admitted at `depth`."""
+        timing = round_timing(results)
+        if timing is None:
+            return
+        wait_s, fixed_s, per_token_s = timing
+        service_s = fixed_s + max(result[3]["new_tokens"] for result in results) * per_token_s
+        with self._lock:
+            self._smooth("fixed_s", fixed_s)
+            self._smooth("per_token_s", per_token_s)
+            # Rounds that ran alongside the others without queueing say nothing about the cost of a round ahead
+            if depth > 1 and wait_s > 0.1 * service_s:
+                self._smooth("wait_per_round_s", wait_s / (depth - 1))
+            self.samples += 1
+            if wait_s + service_s <= self.slo_s:
+                self.counters["met_slo"] += 1
+
+    def run(self, params, generate_fn):
+        """
+        Admits a round: runs generate_fn(budgeted_params) (returning both sides' results) with
+        max_new_tokens lowered as needed. Returns (results, budgeted_params).
+        """
+        with self._lock:
+            self._in_flight += 1
+            depth = self._in_flight
+        requested = params["max_new_tokens"]
+        allowed = self.allowed_tokens(requested, depth)
+        with self._lock:
+            self.counters["rounds"] += 1
+            self.counters["limited"] += allowed < requested
+            self.counters["tokens_requested"] += requested
+            self.counters["tokens_allowed"] += allowed
+        budgeted = {**params, "max_new_tokens": allowed, "min_new_tokens": min(params["min_new_tokens"], allowed)}
+        try:
+            results = generate_fn(budgeted)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        self.observe(results, depth)
+        return results, budgeted
+
+    def stats(self):
+        """
+        Counters plus limited_rate (share of rounds whose budget was lowered), token_share (tokens
+        allowed / requested), slo_attainment (share of observed rounds within the SLO) and the estimates.
+        """
+        with self._lock:
+            rounds = self.counters["rounds"]
+            return {
+                **self.counters,
+                "in_flight": self._in_flight,
+                "limited_rate": self.counters["limited"] / rounds if rounds else 0.0,
+                "token_share": (
+                    self.counters["tokens_allowed"] / self.counters["tokens_requested"] if rounds else 1.0
+                ),
+                "slo_attainment": self.counters["met_slo"] / self.samples if self.samples else 1.0,
+                **{key: value or 0.0 for key, value in self.estimates.items()},
+            }
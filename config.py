@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import os
 
 # --- MODEL DATABASE ---
 # Verified mapping.
@@ -136,3 +137,71 @@ EXAMPLE_PROMPTS = {
         "Here is a summary of the difference between synthetic and native data: ",
     ],
 }
+
+# --- SERVING SETTINGS ---
+# Where generations run (see executors.py):
+# "srun": every generation is its own `srun --gpus=1` job (no warm workers; default).
+# "slurm": a pool of long-lived GPU workers started once with srun; requests go to warm workers.
+#          Each worker holds its GPU allocation for the life of the app.
+# "cpu": both models run as local processes on disjoint CPU core sets (commodity CPU servers).
+# "local": local backend.py process per generation, unpinned.
+# "inprocess": models are loaded inside the app process itself.
+EXECUTION_MODE = os.environ.get("ARENA_EXECUTION_MODE", "srun")
+# Interpreter prefix for backend.py / worker.py.
+PYTHON_CMD = os.environ.get("ARENA_PYTHON", "uv run python").split()
+# Slurm worker pool: number of workers, srun options per worker, models kept resident per worker.
+SLURM_POOL_WORKERS = int(os.environ.get("ARENA_SLURM_WORKERS", "2"))
+SLURM_SRUN_ARGS = os.environ.get("ARENA_SRUN_ARGS", "--gpus=1").split()
+WORKER_MAX_MODELS = int(os.environ.get("ARENA_WORKER_MAX_MODELS", "1"))
+# Pool workers take at most ROUTER_LOAD_FACTOR times the average load (running plus queued requests)
+# before a model's requests spill over from its preferred workers to the next ones (see routing.py).
+ROUTER_LOAD_FACTOR = float(os.environ.get("ARENA_ROUTER_LOAD_FACTOR", "1.25"))
+# Build models on the meta device and stream safetensors shards straight into the load dtype
+# (see fast_load.py), reading up to FAST_LOAD_THREADS shards in parallel.
+FAST_LOAD = os.environ.get("ARENA_FAST_LOAD", "0") == "1"
+FAST_LOAD_THREADS = int(os.environ.get("ARENA_FAST_LOAD_THREADS", "4"))
+# Workers on one node map a single shared float32 copy of each model's weights instead of loading
+# their own (CPU workers only). The directory should be node-local; /dev/shm keeps it in RAM.
+SHARED_WEIGHTS = os.environ.get("ARENA_SHARED_WEIGHTS", "0") == "1"
+SHARED_WEIGHTS_DIR = os.environ.get("ARENA_SHARED_WEIGHTS_DIR", "/dev/shm/oellm-arena-weights")
+# Least recently used weights files are removed once the directory holds more than this (GB).
+SHARED_WEIGHTS_MAX_GB = float(os.environ.get("ARENA_SHARED_WEIGHTS_MAX_GB", "32"))
+# get_pipeline applies the tuning profile that autotune.py stored for the model on this machine (dtype,
+# attention implementation, threads, batch size) instead of the defaults (float32, sdpa).
+TUNING_PROFILES = os.environ.get("ARENA_TUNING_PROFILES", "1") == "1"
+TUNING_PROFILES_FILE = os.environ.get(
+    "ARENA_TUNING_PROFILES_FILE", os.path.join(os.path.expanduser("~"), ".cache", "oellm-arena", "tuning_profiles.json")
+)
+# autotune.py skips settings needing more memory than this, in GB (0: 80% of free RAM, or 90% of GPU memory).
+AUTOTUNE_MAX_MEMORY_GB = float(os.environ.get("ARENA_AUTOTUNE_MAX_MEMORY_GB", "0"))
+# Bind each CPU worker's memory to the NUMA node of its cores (requires numactl).
+CPU_NUMA_BIND = os.environ.get("ARENA_CPU_NUMA_BIND", "0") == "1"
+# Warm the selected language's model files in the background as soon as it is chosen.
+PREWARM_ENABLED = os.environ.get("ARENA_PREWARM", "1") == "1"
+# Hedge a generation job once it runs past this percentile of its model's recent latencies,
+# with at most HEDGE_MAX_RATE of all jobs hedged.
+HEDGE_ENABLED = os.environ.get("ARENA_HEDGE", "1") == "1"
+HEDGE_PERCENTILE = float(os.environ.get("ARENA_HEDGE_PERCENTILE", "95"))
+HEDGE_MAX_RATE = float(os.environ.get("ARENA_HEDGE_MAX_RATE", "0.1"))
+# Pre-generate output pairs for the example prompts while no live generation has run for
+# MATCHUP_POOL_IDLE_GRACE_S, keeping MATCHUP_POOL_PER_PROMPT pairs per prompt for up to MATCHUP_POOL_MAX_AGE_S
+# and starting at most MATCHUP_POOL_MAX_PER_REFILL generations per MATCHUP_POOL_MAX_AGE_S.
+# On by default only in inprocess mode, which generates pairs with the models it keeps loaded anyway: every
+# other mode would start a cold backend process (or take a Slurm worker shared with live rounds) per pair.
+MATCHUP_POOL_ENABLED = os.environ.get("ARENA_MATCHUP_POOL", "1" if EXECUTION_MODE == "inprocess" else "0") == "1"
+MATCHUP_POOL_PER_PROMPT = int(os.environ.get("ARENA_MATCHUP_POOL_PER_PROMPT", "2"))
+MATCHUP_POOL_MAX_PER_REFILL = int(os.environ.get("ARENA_MATCHUP_POOL_MAX_PER_REFILL", "20"))
+MATCHUP_POOL_MAX_AGE_S = float(os.environ.get("ARENA_MATCHUP_POOL_MAX_AGE_S", "3600"))
+MATCHUP_POOL_IDLE_GRACE_S = float(os.environ.get("ARENA_MATCHUP_POOL_IDLE_GRACE_S", "5"))
+# Lower max_new_tokens (never below TOKEN_BUDGET_MIN_TOKENS) for rounds admitted under load, so that a
+# round's predicted latency (waiting plus generating both sides) stays within ROUND_SLO_S seconds.
+TOKEN_BUDGET_ENABLED = os.environ.get("ARENA_TOKEN_BUDGET", "1") == "1"
+ROUND_SLO_S = float(os.environ.get("ARENA_ROUND_SLO_S", "30"))
+TOKEN_BUDGET_MIN_TOKENS = int(os.environ.get("ARENA_TOKEN_BUDGET_MIN_TOKENS", "50"))
+# Serve Prometheus metrics at http://<host>:METRICS_PORT/metrics from the app (0 disables it).
+METRICS_PORT = int(os.environ.get("ARENA_METRICS_PORT", "0"))
+# Keep collapsed-stack flamegraphs of the PROFILE_SLOWEST slowest generations in PROFILE_DIR,
+# sampling the generating thread every PROFILE_INTERVAL_MS (0 disables profiling).
+PROFILE_SLOWEST = int(os.environ.get("ARENA_PROFILE_SLOWEST", "0"))
+PROFILE_DIR = os.environ.get("ARENA_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("ARENA_PROFILE_INTERVAL_MS", "5"))
@@ -0,0 +1,119 @@
+import glob
+import os
+import re
+import shutil
+import sys
+
+NUMA_SYSFS = "/sys/devices/system/node"
+
+
+def parse_cpulist(cpulist):
+    """Parses a Linux cpulist string such as '0-3,8,10-11' into a sorted list of core ids."""
+    cores = set()
+    for part in cpulist.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cores.update(range(int(start), int(end) + 1))
+        else:
+            cores.add(int(part))
+    return sorted(cores)
+
+
+def format_cpulist(cores):
+    """Formats core ids as a compact cpulist string (inverse of parse_cpulist)."""
+    cores = sorted(set(cores))
+    ranges = []
+    for core in cores:
+        if ranges and core == ranges[-1][1] + 1:
+            ranges[-1][1] = core
+        else:
+            ranges.append([core, core])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+def get_available_cores():
+    """Cores this process may run on (respects cgroups/Slurm/taskset restrictions)."""
+    return sorted(os.sched_getaffinity(0))
+
+
+def get_numa_nodes(sysfs_root=NUMA_SYSFS):
+    """Maps NUMA node id -> list of cores. Returns an empty dict if the topology is not exposed."""
+    nodes = {}
+    for path in glob.glob(os.path.join(sysfs_root, "node[0-9]*")):
+        node_id = int(re.search(r"node(\d+)$", path).group(1))
+        with open(os.path.join(path, "cpulist")) as f:
+            cores = parse_cpulist(f.read())
+        if cores:
+            nodes[node_id] = cores
+    return dict(sorted(nodes.items()))
+
+
+def partition_cores(num_workers, cores=None, numa_nodes=None):
+    """
+    Splits the available cores into `num_workers` disjoint, equally sized sets.
+    If there are at least as many NUMA nodes as workers, each worker stays inside its own node(s)
+    so its memory traffic is local; otherwise cores are split into contiguous blocks.
+    Raises ValueError if there are fewer cores than workers.
+    """
+    cores = sorted(cores if cores is not None else get_available_cores())
+    if len(cores) < num_workers:
+        raise ValueError(f"Cannot partition {len(cores)} core(s) between {num_workers} workers.")
+
+    if numa_nodes is None:
+        numa_nodes = get_numa_nodes()
+    available = set(cores)
+    node_cores = [[c for c in node if c in available] for node in numa_nodes.values()]
+    node_cores = [node for node in node_cores if node]
+
+    if len(node_cores) >= num_workers:
+        # Deal whole nodes out round-robin, then trim to the smallest share so workers are balanced
+        groups = [[] for _ in range(num_workers)]
+        for i, node in enumerate(node_cores):
+            groups[i % num_workers].extend(node)
+        size = min(len(group) for group in groups)
+        return [sorted(group)[:size] for group in groups]
+
+    size = len(cores) // num_workers
+    return [cores[i * size:(i + 1) * size] for i in range(num_workers)]
+
+
+def numa_node_of(cores, numa_nodes=None):
+    """Returns the NUMA node holding the majority of `cores`, or None if the topology is unknown."""
+    if numa_nodes is None:
+        numa_nodes = get_numa_nodes()
+    if not numa_nodes:
+        return None
+    overlap = {node: len(set(cores) & set(node_cores)) for node, node_cores in numa_nodes.items()}
+    return max(overlap, key=overlap.get)
+
+
+def numa_bind_prefix(cores, numa_node=None):
+    """
+    Command prefix binding memory allocations to the NUMA node of `cores` via numactl.
+    Returns an empty list when numactl or the NUMA topology is unavailable.
+    """
+    if numa_node is None:
+        numa_node = numa_node_of(cores)
+    if numa_node is None or shutil.which("numactl") is None:
+        print("NUMA binding requested but numactl/topology unavailable; skipping.", file=sys.stderr)
+        return []
+    return ["numactl", f"--membind={numa_node}", f"--physcpubind={format_cpulist(cores)}"]
+
+
+def apply_cpu_partition(cores, interop_threads=1):
+    """
+    Pins the current process to `cores` and sizes torch's thread pools to match.
+    Must run before torch does any parallel work (inter-op threads can only be set once).
+    """
+    import torch
+
+    os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+    torch.set_num_interop_threads(interop_threads)
+    print(
+        f"Pinned to cores {format_cpulist(cores)} "
+        f"(intra-op threads: {len(cores)}, inter-op threads: {interop_threads})",
+        file=sys.stderr,
+    )
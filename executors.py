@@ -0,0 +1,503 @@
+import json
+import subprocess
+import sys
+import threading
+import time
+
+from config import (
+    CPU_NUMA_BIND,
+    EXECUTION_MODE,
+    FAST_LOAD,
+    PYTHON_CMD,
+    SHARED_WEIGHTS,
+    SLURM_POOL_WORKERS,
+    SLURM_SRUN_ARGS,
+    WORKER_MAX_MODELS,
+)
+from cpu_affinity import partition_cores
+from prewarm import warm_model_files
+from routing import AffinityRouter
+from serving import build_cpu_cmd, build_slurm_cmd, parse_metrics, run_cmd
+
+
+class Executor:
+    """
+    Runs single generations. Every executor returns (returncode, text, error, metrics) like a backend
+    process plus its metrics record, so callers handle all execution modes the same way.
+    `slot` is 0 for Model A and 1 for Model B.
+    metrics: cached, load_s, queue_wait_s, prefill_s, decode_s, prompt_tokens, new_tokens,
+    stop_reason and worker ({} when the generation failed before producing a record).
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "warm_hits": 0, "cold_loads": 0, "errors": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def generate(self, model_name, prompt, params, slot=0, cancel_event=None):
+        raise NotImplementedError
+
+    def prewarm(self, model_name, cancel_event):
+        """Default prewarming: get the model files into the local disk and page cache."""
+        warm_model_files(model_name, cancel_event)
+
+    def hedge_slot(self, slot):
+        """
+        The slot a hedge of a job running in `slot` is sent to, or None when this executor cannot run a
+        duplicate beside the job and cancel the loser (see hedging.py). By default every job is its own
+        process, which cancelling terminates, and slots share nothing, so the same slot.
+        """
+        return slot
+
+    def fits_without_eviction(self, model_names):
+        """
+        Whether generating with `model_names` now would leave every loaded model loaded, for background
+        work. By default every generation loads its model in a process of its own, so it always fits.
+        """
+        return True
+
+    def stats(self):
+        """Counters plus warm_fraction: the share of successful generations that found their model loaded."""
+        with self._lock:
+            served = self.counters["warm_hits"] + self.counters["cold_loads"]
+            warm_fraction = self.counters["warm_hits"] / served if served else 0.0
+            return {"executor": self.name, **self.counters, "warm_fraction": warm_fraction}
+
+    def _run_backend(self, cmd, cancel_event):
+        """Runs one backend.py process and picks up the metrics record it printed."""
+        start = time.monotonic()
+        returncode, stdout, stderr = run_cmd(cmd, cancel_event)
+        metrics = parse_metrics(stderr)
+        if metrics:
+            busy = metrics["load_s"] + metrics["prefill_s"] + metrics["decode_s"]
+            # Everything before the model started loading: Slurm scheduling and interpreter start-up
+            metrics["queue_wait_s"] = max(0.0, time.monotonic() - start - busy)
+        if returncode != 0:
+            self._count("errors")
+        return returncode, stdout, stderr, metrics
+
+    def shutdown(self):
+        pass
+
+
+class SrunExecutor(Executor):
+    """One `srun` job per generation: pays Slurm scheduling and a cold model load every time."""
+
+    name = "srun"
+
+    def generate(self, model_name, prompt, params, slot=0, cancel_event=None):
+        self._count("requests")
+        self._count("cold_loads")
+        return self._run_backend(build_slurm_cmd(model_name, prompt, params), cancel_event)
+
+
+class LocalSubprocessExecutor(Executor):
+    """
+    One local backend.py process per generation, no Slurm needed.
+    With pin_cores=True each slot gets its own disjoint core set (CPU-only serving).
+    With shared_weights=True the processes map one shared copy of each model's weights.
+    """
+
+    name = "local"
+
+    def __init__(self, pin_cores=False, numa_bind=CPU_NUMA_BIND, shared_weights=SHARED_WEIGHTS):
+        super().__init__()
+        self.numa_bind = numa_bind
+        self.shared_weights = shared_weights
+        self.partitions = [None, None]
+        if pin_cores:
+            try:
+                self.partitions = partition_cores(2)
+            except ValueError as e:
+                print(f"{e} Running both workers unpinned.", file=sys.stderr)
+
+    def hedge_slot(self, slot):
+        """With pinned cores, the other slot's cores: a hedge on the straggler's own cores would only slow both."""
+        return slot if self.partitions[slot] is None else 1 - slot
+
+    def generate(self, model_name, prompt, params, slot=0, cancel_event=None):
+        self._count("requests")
+        self._count("cold_loads")
+        cmd = build_cpu_cmd(model_name, prompt, params, self.partitions[slot], self.numa_bind, self.shared_weights)
+        return self._run_backend(cmd, cancel_event)
+
+
+class InProcessExecutor(Executor):
+    """Loads models inside the calling process and keeps them resident (development / single-node)."""
+
+    name = "inprocess"
+
+    def __init__(self, max_models=2, fast_decode=False, fast_load=FAST_LOAD):
+        super().__init__()
+        from backend import PipelineCache
+
+        self.cache = PipelineCache(max_models=max_models, fast_decode=fast_decode, fast_load=fast_load)
+        self._model_locks = {}
+        self.counters.update(prewarm_skips=0)
+
+    def _model_lock(self, model_name):
+        with self._lock:
+            return self._model_locks.setdefault(model_name, threading.Lock())
+
+    def generate(self, model_name, prompt, params, slot=0, cancel_event=None):
+        from backend import generate_with_metrics, get_load_timings
+
+        self._count("requests")
+        try:
+            pipe, cached = self.cache.get(model_name)
+        except Exception as e:
+            self._count("errors")
+            return 1, "", f"Failed to load {model_name}: {e}", {}
+        self._count("warm_hits" if cached else "cold_loads")
+        load_s = 0.0 if cached else sum(get_load_timings(pipe).values())
+        # A pipeline is not safe to call from two threads at once
+        wait_start = time.monotonic()
+        with self._model_lock(model_name):
+            queue_wait_s = time.monotonic() - wait_start
+            text, metrics = generate_with_metrics(pipe, prompt, cancel_event=cancel_event, **params)
+        if metrics["stop_reason"] == "cancelled":
+            return 1, "", "Cancelled", {}
+        metrics.update(cached=cached, load_s=load_s, queue_wait_s=queue_wait_s, worker="inprocess")
+        return 0, text, "", metrics
+
+    def prewarm(self, model_name, cancel_event):
+        """Loads the model if it fits beside the resident ones: never evicts a model a round is using."""
+        if cancel_event.is_set():
+            return
+        if self.cache.get(model_name, evict=False)[0] is None:
+            self._count("prewarm_skips")
+
+    def hedge_slot(self, slot):
+        """None: a hedge would wait for the straggler's model lock, so it could never win."""
+        return None
+
+    def fits_without_eviction(self, model_names):
+        resident = self.cache.resident()
+        return len(set(model_names) - set(resident)) <= self.cache.max_models - len(resident)
+
+
+class WorkerDied(Exception):
+    pass
+
+
+class WorkerUnavailable(WorkerDied):
+    """The worker process could not even be started (e.g. no srun): restarting it would not help."""
+
+
+class PoolWorker:
+    """
+    A long-lived worker.py process speaking JSON lines over its stdin/stdout. The process is started on
+    the first request, so creating a pool never fails, even on a host without srun.
+    """
+
+    def __init__(self, index, cmd):
+        self.index = index
+        self.cmd = cmd
+        self.resident = []
+        self.busy = False
+        self.queued = 0  # requests routed here and waiting for it
+        self.job = None  # the request running now
+        self._next_id = 0
+        self.process = None
+
+    def start(self):
+        """Starts the process unless it is running already."""
+        if self.process is None:
+            try:
+                self.process = subprocess.Popen(
+                    self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1
+                )
+            except OSError as e:
+                raise WorkerUnavailable(f"worker {self.index} could not be started: {e}")
+        return self
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def call(self, request):
+        self.start()
+        self._next_id += 1
+        request = {"id": self._next_id, **request}
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerDied(str(e))
+        if not line:
+            raise WorkerDied(f"worker {self.index} exited with code {self.process.poll()}")
+        response = json.loads(line)
+        self.resident = response.get("resident", self.resident)
+        return response
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            # Closing stdin is the shutdown signal; on a dead worker it may fail flushing leftovers
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.terminate()
+            self.process.wait()
+        self.process.stdout.close()
+
+
+class SlurmExecutor(Executor):
+    """
+    Pool of long-lived workers, each started once as its own srun job step (or job), holding its
+    GPU allocation for the life of the pool. Requests are routed by model (see routing.py): to a worker
+    that already has the model loaded, else to the model's preferred worker, and wait for it there, so
+    most generations skip both scheduling and loading. Workers can join and leave a running pool.
+    A request cancelled while it waits for its worker is dropped without running. Cancellation cannot
+    interrupt a worker mid-generation: that generation runs to completion, is discarded and is counted
+    as cancelled_too_late.
+    """
+
+    name = "slurm"
+
+    def __init__(
+        self,
+        num_workers=SLURM_POOL_WORKERS,
+        srun_args=SLURM_SRUN_ARGS,
+        python_cmd=PYTHON_CMD,
+        max_models=WORKER_MAX_MODELS,
+        worker_args=(),
+        router=None,
+    ):
+        super().__init__()
+        self.max_models = max_models
+        self.worker_cmd = (
+            ["srun", *srun_args, *python_cmd, "worker.py", "--max_models", str(max_models), *worker_args]
+        )
+        self._available = threading.Condition(self._lock)
+        self.counters.update(
+            worker_restarts=0, spillovers=0, rebalance_loads=0, cancelled=0, cancelled_too_late=0, prewarm_skips=0
+        )
+        self.workers = [PoolWorker(i, self.worker_cmd) for i in range(num_workers)]
+        self.router = router or AffinityRouter()
+        for worker in self.workers:
+            self.router.add(worker.index)
+
+    def _route(self, request):
+        """
+        The worker the router picks for the request's model (caller holds the lock). A worker already
+        running the identical request is avoided: that is a hedge, which must not queue behind its straggler.
+        """
+        workers = {w.index: w for w in self.workers}
+        index, spilled = self.router.choose(
+            request["model_name"],
+            loads={i: w.queued + w.busy for i, w in workers.items()},
+            resident={i: w.resident for i, w in workers.items()},
+            full=[i for i, w in workers.items() if len(w.resident) >= self.max_models],
+            avoid=[i for i, w in workers.items() if w.job == request],
+        )
+        if spilled:
+            self.counters["spillovers"] += 1
+        return workers[index]
+
+    def _acquire(self, request, target=None, cancel_event=None):
+        """
+        Waits until the worker routed to (or the worker with index `target`) is idle and claims it.
+        If that worker leaves the pool or is restarted in the meantime, the request is routed again.
+        Returns None, without claiming a worker, once `cancel_event` is set.
+        """
+        with self._available:
+            while True:
+                worker = next((w for w in self.workers if w.index == target), None) or self._route(request)
+                worker.queued += 1
+                while worker.busy and worker in self.workers and not (cancel_event and cancel_event.is_set()):
+                    # Cancelling does not notify the condition, so look at the event now and then
+                    self._available.wait(timeout=0.2)
+                worker.queued -= 1
+                if cancel_event is not None and cancel_event.is_set():
+                    self.counters["cancelled"] += 1
+                    return None
+                if worker in self.workers:
+                    worker.busy = True
+                    worker.job = request
+                    return worker
+
+    def _release(self, worker):
+        with self._available:
+            worker.busy = False
+            worker.job = None
+            # Requests wait for specific workers, so wake them all
+            self._available.notify_all()
+
+    def _restart(self, worker):
+        """
+        Replaces a dead worker that the caller has claimed. The replacement stays claimed by the caller
+        (_release frees it). Returns the old worker if it was leaving the pool anyway. Stopping the old
+        worker can take seconds, so this runs outside the lock and other workers keep serving meanwhile.
+        """
+        worker.stop()
+        with self._lock:
+            if worker not in self.workers:
+                return worker
+            replacement = PoolWorker(worker.index, self.worker_cmd)
+            replacement.busy = True
+            replacement.job = worker.job
+            self.workers[self.workers.index(worker)] = replacement
+            self.counters["worker_restarts"] += 1
+        print(f"Restarted pool worker {worker.index}", file=sys.stderr)
+        return replacement
+
+    def _dispatch(self, request, target=None, cancel_event=None, worker=None):
+        """
+        Runs `request` on a worker (`worker` if the caller has claimed one already). A request whose
+        worker died is retried once on the worker's replacement.
+        Returns (response, worker index, seconds waited for a worker); a request cancelled before it
+        got a worker gets a response with "cancelled": True and index None.
+        """
+        wait_start = time.monotonic()
+        worker = worker or self._acquire(request, target, cancel_event)
+        queue_wait_s = time.monotonic() - wait_start
+        if worker is None:
+            return {"ok": False, "error": "Cancelled before dispatch.", "cancelled": True}, None, queue_wait_s
+        index = worker.index
+        try:
+            for _ in range(2):
+                try:
+                    return worker.call(request), index, queue_wait_s
+                except WorkerUnavailable as e:
+                    return {"ok": False, "error": str(e)}, index, queue_wait_s
+                except WorkerDied as e:
+                    error = f"Worker died: {e}"
+                    replacement = self._restart(worker)
+                    if replacement is worker:
+                        break
+                    worker = replacement
+            return {"ok": False, "error": error}, index, queue_wait_s
+        finally:
+            self._release(worker)
+
+    def generate(self, model_name, prompt, params, slot=0, cancel_event=None):
+        self._count("requests")
+        response, index, queue_wait_s = self._dispatch(
+            {"op": "generate", "model_name": model_name, "prompt": prompt, "params": params},
+            cancel_event=cancel_event,
+        )
+        if response.get("cancelled"):
+            return 1, "", response["error"], {}
+        if cancel_event is not None and cancel_event.is_set():
+            self._count("cancelled_too_late")
+            return 1, "", f"Cancelled, but worker {index} had already started it: the result was discarded.", {}
+        if not response["ok"]:
+            self._count("errors")
+            return 1, "", response["error"], {}
+        self._count("warm_hits" if response["cached"] else "cold_loads")
+        metrics = response.get("metrics", {})
+        metrics.update(queue_wait_s=queue_wait_s, worker=f"{metrics.get('worker', 'worker')}/{index}")
+        return 0, response["text"], "", metrics
+
+    def prewarm(self, model_name, cancel_event):
+        """
+        Loads the model into an idle worker with a free model slot (the one the model prefers most),
+        unless some worker already has it. Never evicts a model and never delays a request: with no
+        such worker the model is not prewarmed.
+        """
+        request = {"op": "load", "model_name": model_name}
+        with self._lock:
+            if cancel_event.is_set() or any(model_name in w.resident for w in self.workers):
+                return
+            free = {w.index: w for w in self.workers if not (w.busy or w.queued or len(w.resident) >= self.max_models)}
+            index = next((i for i in self.router.preference(model_name) if i in free), None)
+            if index is None:
+                self.counters["prewarm_skips"] += 1
+                return
+            worker = free[index]
+            worker.busy = True
+            worker.job = request
+        self._dispatch(request, worker=worker)
+
+    def hedge_slot(self, slot):
+        """None: a worker cannot be cancelled mid-generation, so every hedge would hold a second worker to the end."""
+        return None
+
+    def fits_without_eviction(self, model_names):
+        """Whether the models not loaded on any worker fit into the free model slots of idle workers."""
+        with self._lock:
+            missing = {m for m in model_names if not any(m in w.resident for w in self.workers)}
+            free = sum(self.max_models - len(w.resident) for w in self.workers if not (w.busy or w.queued))
+            return len(missing) <= free
+
+    def _rebalance(self, moves):
+        """Loads each model in `moves` onto the worker index it maps to."""
+        for model_name, index in moves.items():
+            response, _, _ = self._dispatch({"op": "load", "model_name": model_name}, target=index)
+            if response["ok"]:
+                self._count("rebalance_loads")
+
+    def add_worker(self):
+        """
+        Starts one more worker and preloads it with (at most max_models of) the resident models that
+        now prefer it, so their requests stay warm when they move. Returns the new worker's index.
+        """
+        with self._available:
+            index = max((w.index for w in self.workers), default=-1) + 1
+            self.workers.append(PoolWorker(index, self.worker_cmd))
+            self.router.add(index)
+            resident = sorted({model for w in self.workers for model in w.resident})
+            moved = [model for model in resident if self.router.preference(model)[0] == index]
+            self._available.notify_all()
+        self._rebalance(dict.fromkeys(moved[: self.max_models], index))
+        return index
+
+    def remove_worker(self, index):
+        """
+        Takes a worker out of the pool: requests queued on it are routed again, its running request
+        finishes first, and the models only it had loaded are loaded onto their next preferred worker.
+        """
+        with self._available:
+            worker = next(w for w in self.workers if w.index == index)
+            if len(self.workers) == 1:
+                raise ValueError("Cannot remove the last pool worker.")
+            self.workers.remove(worker)
+            self.router.remove(index)
+            self._available.notify_all()
+            while worker.busy:
+                self._available.wait()
+            moves = {}
+            for model in worker.resident:
+                target = self.router.preference(model)[0]
+                # Skip models still loaded elsewhere, and don't make one worker evict what it just loaded
+                taken = list(moves.values()).count(target)
+                if not any(model in w.resident for w in self.workers) and taken < self.max_models:
+                    moves[model] = target
+        worker.stop()
+        self._rebalance(moves)
+
+    def resident_models(self):
+        with self._lock:
+            return {w.index: list(w.resident) for w in self.workers}
+
+    def shutdown(self):
+        for worker in self.workers:
+            worker.stop()
+
+
+def create_executor(mode=EXECUTION_MODE):
+    if mode == "slurm":
+        # Workers on the same CPU node can share weights; GPU workers ignore the flag
+        worker_args = ["--shared_weights"] if SHARED_WEIGHTS else []
+        if FAST_LOAD:
+            worker_args.append("--fast_load")
+        return SlurmExecutor(worker_args=worker_args)
+    if mode == "srun":
+        return SrunExecutor()
+    if mode == "cpu":
+        return LocalSubprocessExecutor(pin_cores=True)
+    if mode == "local":
+        return LocalSubprocessExecutor()
+    if mode == "inprocess":
+        return InProcessExecutor()
+    raise ValueError(f"Unknown execution mode: {mode}")
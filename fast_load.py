@@ -0,0 +1,125 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import torch
+from accelerate import init_empty_weights
+from safetensors import safe_open
+from transformers import MODEL_FOR_CAUSAL_LM_MAPPING, AutoConfig
+
+from config import FAST_LOAD_THREADS
+from prewarm import resolve_model_dir
+
+
+class FastLoadUnsupported(Exception):
+    """The checkpoint cannot be fast-loaded (no safetensors, renamed keys, ...); use the standard loader."""
+
+
+class LoadTimer:
+    """Accumulates wall time per named load phase, in the order the phases were first entered."""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def total(self):
+        return sum(self.phases.values())
+
+    def summary(self):
+        return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+
+
+def safetensors_shards(model_dir):
+    """The checkpoint's safetensors files, taken from the shard index when there is one."""
+    index_path = os.path.join(model_dir, "model.safetensors.index.json")
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            files = sorted(set(json.load(f)["weight_map"].values()))
+    else:
+        files = sorted(f for f in os.listdir(model_dir) if f.endswith(".safetensors"))
+    return [os.path.join(model_dir, f) for f in files]
+
+
+def _model_class(model_config, model_dir):
+    """Imports the model class: from the checkpoint's own code with trust_remote_code, else from transformers."""
+    auto_map = getattr(model_config, "auto_map", None) or {}
+    if "AutoModelForCausalLM" in auto_map:
+        from transformers.dynamic_module_utils import get_class_from_dynamic_module
+
+        return get_class_from_dynamic_module(auto_map["AutoModelForCausalLM"], model_dir)
+    try:
+        return MODEL_FOR_CAUSAL_LM_MAPPING[type(model_config)]
+    except KeyError:
+        raise FastLoadUnsupported(f"transformers has no causal LM class for {type(model_config).__name__}")
+
+
+def _read_shard(path, dtype, device):
+    """
+    Reads one shard for `device`, with floating point tensors in `dtype`. A tensor stored in `dtype`
+    is used as read; any other is converted while it is copied into a tensor allocated in `dtype`
+    on `device`, so no tensor is copied twice or held on the device in two dtypes.
+    """
+    tensors = {}
+    with safe_open(path, framework="pt", device="cpu") as f:
+        for name in f.keys():
+            tensor = f.get_tensor(name)
+            if tensor.is_floating_point() and tensor.dtype != dtype:
+                tensors[name] = torch.empty(tensor.shape, dtype=dtype, device=device).copy_(tensor)
+            else:
+                tensors[name] = tensor.to(device)
+    return tensors
+
+
+def load_model_fast(
+    model_name, dtype=torch.float32, device=None, timer=None, max_workers=FAST_LOAD_THREADS, attn_implementation="sdpa"
+):
+    """
+    Loads a causal LM without materializing random weights: the model is built on the meta device,
+    then safetensors shards are read in parallel directly onto `device` in their final dtype and
+    assigned to the parameters as each shard completes.
+    Places the whole model on one device (cuda:0 if available), unlike device_map="auto".
+    Raises FastLoadUnsupported when the checkpoint does not map cleanly onto the model.
+    """
+    timer = timer or LoadTimer()
+    device = torch.device(device or ("cuda:0" if torch.cuda.is_available() else "cpu"))
+
+    with timer.phase("resolve"):
+        model_dir = resolve_model_dir(model_name)
+        shards = safetensors_shards(model_dir)
+    if not shards:
+        raise FastLoadUnsupported(f"{model_name} has no safetensors weights")
+
+    with timer.phase("config"):
+        model_config = AutoConfig.from_pretrained(model_dir, trust_remote_code=True)
+    with timer.phase("import"):
+        model_class = _model_class(model_config, model_dir)
+    with timer.phase("init"):
+        # Buffers (e.g. rotary frequencies) are not in checkpoints, so they are still computed normally
+        with init_empty_weights(include_buffers=False):
+            model = model_class._from_config(model_config, dtype=dtype, attn_implementation=attn_implementation)
+
+    with timer.phase("weights"):
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(shards))) as pool:
+            futures = [pool.submit(_read_shard, path, dtype, device) for path in shards]
+            for future in as_completed(futures):
+                model.load_state_dict(future.result(), strict=False, assign=True)
+
+    with timer.phase("finalize"):
+        model.tie_weights()
+        missing = [name for name, param in model.named_parameters() if param.is_meta]
+        if missing:
+            raise FastLoadUnsupported(f"checkpoint keys do not match the model, e.g. {missing[:3]}")
+        model.to(device)
+
+    print(f"Fast-loaded {model_name} from {len(shards)} shard(s) onto {device}", file=sys.stderr)
+    return model.eval()
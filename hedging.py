@@ -0,0 +1,161 @@
+import bisect
+import math
+import queue
+import threading
+import time
+from collections import deque
+
+from config import HEDGE_ENABLED, HEDGE_MAX_RATE, HEDGE_PERCENTILE
+
+# Cumulative histogram bucket bounds in seconds (Prometheus-style "le" buckets)
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120, 300, 600, math.inf)
+
+
+class LatencyTracker:
+    """Per-model latency history: a rolling window for percentiles plus a cumulative histogram."""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._recent = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_name, seconds):
+        with self._lock:
+            self._recent.setdefault(model_name, deque(maxlen=self.window)).append(seconds)
+            counts = self._histograms.setdefault(model_name, [0] * len(LATENCY_BUCKETS))
+            counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def samples(self, model_name):
+        with self._lock:
+            return len(self._recent.get(model_name, ()))
+
+    def percentile(self, model_name, pct):
+        """Nearest-rank percentile of the recent window, or None without data."""
+        with self._lock:
+            recent = sorted(self._recent.get(model_name, ()))
+        if not recent:
+            return None
+        rank = max(1, math.ceil(pct / 100 * len(recent)))
+        return recent[rank - 1]
+
+    def histogram(self, model_name):
+        """Cumulative counts per bucket bound, as (le, count) pairs."""
+        with self._lock:
+            counts = list(self._histograms.get(model_name, [0] * len(LATENCY_BUCKETS)))
+        total, cumulative = 0, []
+        for bound, count in zip(LATENCY_BUCKETS, counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+    def models(self):
+        with self._lock:
+            return sorted(self._recent)
+
+
+class Hedger:
+    """
+    Straggler mitigation for generation jobs.
+    If an attempt runs past the `percentile` of its model's recent latencies, a duplicate attempt is
+    launched and whichever succeeds first wins; the other is cancelled. Whether and where the hedge runs
+    is up to the executor (see Executor.hedge_slot).
+    Hedges are capped at `max_rate` of all requests, so extra load stays bounded.
+    """
+
+    def __init__(self, percentile=HEDGE_PERCENTILE, max_rate=HEDGE_MAX_RATE, min_samples=20, enabled=HEDGE_ENABLED):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.enabled = enabled
+        self.latencies = LatencyTracker()
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "cancelled": 0}
+
+    def hedge_delay(self, model_name):
+        """Seconds to wait before hedging, or None while there is too little history to judge."""
+        if not self.enabled or self.latencies.samples(model_name) < self.min_samples:
+            return None
+        return self.latencies.percentile(model_name, self.percentile)
+
+    def _take_hedge_budget(self):
+        with self._lock:
+            if self.counters["hedged"] + 1 > self.max_rate * self.counters["requests"]:
+                return False
+            self.counters["hedged"] += 1
+            return True
+
+    def run(self, model_name, attempt_fn, is_ok=lambda result: result[0] == 0):
+        """
+        Runs attempt_fn(cancel_event) with hedging and returns the winning attempt's result.
+        Attempts must stop soon after their cancel_event is set.
+        """
+        with self._lock:
+            self.counters["requests"] += 1
+
+        finished = queue.Queue()
+        attempts = []
+
+        def launch():
+            cancel_event = threading.Event()
+            attempts.append(cancel_event)
+
+            def target():
+                try:
+                    result = attempt_fn(cancel_event)
+                except Exception as e:
+                    result = e
+                finished.put((cancel_event, result))
+
+            threading.Thread(target=target, daemon=True).start()
+
+        first_started = time.monotonic()
+        launch()
+        try:
+            winner = finished.get(timeout=self.hedge_delay(model_name))
+        except queue.Empty:
+            if self._take_hedge_budget():
+                launch()
+            winner = finished.get()
+
+        # A failed attempt does not win while another one is still running
+        done = [winner]
+        while len(done) < len(attempts) and (isinstance(winner[1], Exception) or not is_ok(winner[1])):
+            winner = finished.get()
+            done.append(winner)
+
+        cancel_event, result = winner
+        if cancel_event is not attempts[0]:
+            with self._lock:
+                self.counters["hedge_wins"] += 1
+        finished_events = {attempt[0] for attempt in done}
+        for other in attempts:
+            if other not in finished_events:
+                other.set()
+                with self._lock:
+                    self.counters["cancelled"] += 1
+
+        # The request's latency, from the first attempt's start: what the percentile trigger is compared to
+        self.latencies.record(model_name, time.monotonic() - first_started)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        counters["hedge_rate"] = counters["hedged"] / counters["requests"] if counters["requests"] else 0.0
+        return counters
+
+    def latency_summary(self):
+        """Per-model p50/p95/p99 and sample counts of the recent window."""
+        return [
+            {
+                "Model": model.split("/")[-1],
+                "samples": self.latencies.samples(model),
+                "p50_s": self.latencies.percentile(model, 50),
+                "p95_s": self.latencies.percentile(model, 95),
+                "p99_s": self.latencies.percentile(model, 99),
+            }
+            for model in self.latencies.models()
+        ]
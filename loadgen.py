@@ -0,0 +1,268 @@
+import math
+import random
+import statistics
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from executors import Executor
+from serving import generate_pair
+
+ARRIVAL_MODES = ("constant", "poisson", "historical")
+# The app's sidebar defaults, used for logged votes that do not record their generation settings
+DEFAULT_PARAMS = {"min_new_tokens": 70, "max_new_tokens": 112, "temperature": 0.7, "repetition_penalty": 1.2}
+PARAM_COLUMNS = {
+    "min_new_tokens": "Min_New_Tokens",
+    "max_new_tokens": "Max_New_Tokens",
+    "temperature": "Temperature",
+    "repetition_penalty": "Repetition_Penalty",
+}
+
+
+def load_replay_requests(results):
+    """
+    Turns logged votes into replayable rounds: timestamp, language, prompt, both models and the
+    generation settings (taken from the log when it has them, else the app defaults). Rounds replay
+    the max_new_tokens the user asked for, not a budget lowered under load at the time.
+    """
+    requests = []
+    for row in results.sort_values("Timestamp").itertuples(index=False):
+        row = row._asdict()
+        params = dict(DEFAULT_PARAMS)
+        for key, column in PARAM_COLUMNS.items():
+            if column in row and not pd.isna(row[column]):
+                params[key] = type(DEFAULT_PARAMS[key])(row[column])
+        if not pd.isna(row.get("Requested_Max_New_Tokens", float("nan"))):
+            params["max_new_tokens"] = int(row["Requested_Max_New_Tokens"])
+        requests.append(
+            {
+                "timestamp": pd.Timestamp(row["Timestamp"]),
+                "language": row["Language"],
+                "prompt": row["Prompt"],
+                "model_a": row["Model_A_Name"],
+                "model_b": row["Model_B_Name"],
+                "params": params,
+            }
+        )
+    return requests
+
+
+def repeat_requests(requests, rounds):
+    """
+    `rounds` requests, wrapping around `requests` when it holds fewer. Each repetition's timestamps
+    are shifted by the log's span plus one average gap, so replayed time keeps moving forward.
+    """
+    if len(requests) >= rounds:
+        return requests[:rounds]
+    start, end = requests[0]["timestamp"], requests[-1]["timestamp"]
+    period = (end - start) * len(requests) / max(1, len(requests) - 1)
+    repeated = []
+    for i in range(rounds):
+        request = requests[i % len(requests)]
+        repeated.append({**request, "timestamp": request["timestamp"] + period * (i // len(requests))})
+    return repeated
+
+
+def arrival_times(mode, n, rate=1.0, timestamps=None, speedup=1.0, max_gap=None, rng=None):
+    """
+    Offsets in seconds from the start of the run at which each of `n` rounds arrives.
+    constant: every 1/rate s. poisson: exponential gaps with mean 1/rate.
+    historical: the logged timestamps compressed `speedup` times, idle gaps capped at `max_gap` s.
+    """
+    rng = rng or random.Random()
+    if mode == "constant":
+        return [i / rate for i in range(n)]
+    if mode == "poisson":
+        offsets, t = [], 0.0
+        for _ in range(n):
+            offsets.append(t)
+            t += rng.expovariate(rate)
+        return offsets
+    if mode == "historical":
+        offsets, t = [0.0], 0.0
+        for previous, current in zip(timestamps[: n - 1], timestamps[1:n]):
+            gap = (current - previous).total_seconds() / speedup
+            t += min(gap, max_gap) if max_gap is not None else gap
+            offsets.append(t)
+        return offsets
+    raise ValueError(f"Unknown arrival mode: {mode}")
+
+
+class FakeExecutor(Executor):
+    """
+    Stands in for the real backend: each generation sleeps for a modelled latency instead of running
+    a model. Latency = cold load (if the model is not among the `warm_capacity` most recently used)
+    + base latency + new tokens / tokens_per_s, with lognormal jitter. At most `slots` generations
+    run at once (like GPUs or pool workers); the rest wait. `time_scale` > 1 runs faster than real time.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        base_latency_s=0.5,
+        tokens_per_s=25.0,
+        cold_load_s=20.0,
+        warm_capacity=4,
+        slots=2,
+        jitter=0.2,
+        error_rate=0.0,
+        time_scale=1.0,
+        rng=None,
+    ):
+        super().__init__()
+        self.base_latency_s = base_latency_s
+        self.tokens_per_s = tokens_per_s
+        self.cold_load_s = cold_load_s
+        self.warm_capacity = warm_capacity
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.time_scale = time_scale
+        self.rng = rng or random.Random()
+        self._slots = threading.Semaphore(slots)
+        self._warm = OrderedDict()
+
+    def _sample(self, model_name, params):
+        """Draws one generation's metrics record (in unscaled seconds) and whether it fails."""
+        with self._lock:
+            cold = model_name not in self._warm
+            self._warm[model_name] = True
+            self._warm.move_to_end(model_name)
+            if len(self._warm) > self.warm_capacity:
+                self._warm.popitem(last=False)
+            self.counters["cold_loads" if cold else "warm_hits"] += 1
+            new_tokens = self.rng.randint(params["min_new_tokens"], params["max_new_tokens"])
+            noise = self.rng.lognormvariate(0, self.jitter) if self.jitter else 1.0
+            failed = self.rng.random() < self.error_rate
+        metrics = {
+            "cached": not cold,
+            "load_s": self.cold_load_s if cold else 0.0,
+            "prefill_s": self.base_latency_s * noise,
+            "decode_s": new_tokens / self.tokens_per_s * noise,
+            "prompt_tokens": None,
+            "new_tokens": new_tokens,
+            "stop_reason": "max_new_tokens" if new_tokens == params["max_new_tokens"] else "eos",
+            "worker": "fake",
+        }
+        return metrics, failed
+
+    def generate(self, model_name, prompt, params, slot=0, cancel_event=None):
+        self._count("requests")
+        wait_start = time.monotonic()
+        with self._slots:
+            metrics, failed = self._sample(model_name, params)
+            metrics["queue_wait_s"] = (time.monotonic() - wait_start) * self.time_scale
+            latency = metrics["load_s"] + metrics["prefill_s"] + metrics["decode_s"]
+            deadline = time.monotonic() + latency / self.time_scale
+            while time.monotonic() < deadline:
+                if cancel_event is not None and cancel_event.is_set():
+                    return -15, "", "Cancelled", {}
+                time.sleep(min(0.05, max(0.0, deadline - time.monotonic())))
+        if failed:
+            self._count("errors")
+            return 1, "", "Fake backend error", {}
+        return 0, f"{prompt} ...", "", metrics
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def run_load_test(
+    executor,
+    requests,
+    offsets,
+    max_concurrency=64,
+    sample_interval=1.0,
+    time_scale=1.0,
+    flight=None,
+    hedger=None,
+    budget=None,
+    slo_s=None,
+):
+    """
+    Replays `requests`, each arriving at its offset, and runs every round as the app does
+    (both models concurrently via generate_pair, admitted through a TokenBudget if given).
+    Rounds beyond `max_concurrency` wait for a thread. Queue depth is the number of rounds that have
+    arrived but not finished, sampled every `sample_interval` s. With `slo_s`, slo_attainment is the
+    share of rounds that succeeded within it. Times are reported in real-time seconds; `time_scale`
+    must match a FakeExecutor's.
+    """
+    lock = threading.Lock()
+    rounds = []
+    state = {"in_flight": 0}
+    done = threading.Event()
+
+    def run_round(request, arrived):
+        def generate(params):
+            return generate_pair(
+                executor, request["model_a"], request["model_b"], request["prompt"], params,
+                flight=flight, hedger=hedger,
+            )
+
+        params = request["params"]
+        try:
+            if budget is None:
+                pair = generate(params)
+            else:
+                pair, params = budget.run(params, generate)
+            ok = all(result[0] == 0 for result in pair)
+        except Exception:
+            ok = False
+        finished = time.monotonic()
+        with lock:
+            state["in_flight"] -= 1
+            rounds.append(
+                {"arrived": arrived, "finished": finished, "ok": ok, "max_new_tokens": params["max_new_tokens"]}
+            )
+
+    samples = []
+
+    def sample():
+        while not done.wait(sample_interval / time_scale):
+            with lock:
+                samples.append((time.monotonic() - start, state["in_flight"]))
+
+    pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="loadgen")
+    start = time.monotonic()
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    for request, offset in zip(requests, offsets):
+        delay = start + offset / time_scale - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        with lock:
+            state["in_flight"] += 1
+        pool.submit(run_round, request, time.monotonic())
+    pool.shutdown(wait=True)
+    duration = time.monotonic() - start
+    done.set()
+    sampler.join()
+
+    latencies = [(r["finished"] - r["arrived"]) * time_scale for r in rounds if r["ok"]]
+    errors = sum(not r["ok"] for r in rounds)
+    return {
+        "rounds": len(rounds),
+        "duration_s": duration * time_scale,
+        "throughput_rps": len(rounds) / (duration * time_scale) if duration else 0.0,
+        "p50_s": _percentile(latencies, 50),
+        "p95_s": _percentile(latencies, 95),
+        "p99_s": _percentile(latencies, 99),
+        "mean_s": statistics.fmean(latencies) if latencies else None,
+        "error_rate": errors / len(rounds) if rounds else 0.0,
+        "slo_attainment": (
+            sum(latency <= slo_s for latency in latencies) / len(rounds) if slo_s is not None and rounds else None
+        ),
+        "mean_max_new_tokens": statistics.fmean(r["max_new_tokens"] for r in rounds) if rounds else None,
+        "max_queue_depth": max((depth for _, depth in samples), default=0),
+        # (seconds since start, rounds in flight)
+        "queue_depth": [(t * time_scale, depth) for t, depth in samples],
+        "executor": executor.stats(),
+        "budget": budget.stats() if budget is not None else None,
+    }
@@ -0,0 +1,119 @@
+import math
+import random
+import threading
+
+import pandas as pd
+
+from config import MODELS_DB
+
+STRATEGIES = ("uniform", "uncertainty", "thompson")
+# A pair is resolved once its 95% interval excludes 50% or is narrower than this
+TARGET_CI_WIDTH = 0.2
+Z_95 = 1.96
+
+
+def _normal_cdf(x):
+    return 0.5 * (1 + math.erf(x / math.sqrt(2)))
+
+
+class MatchupScheduler:
+    """
+    Chooses which MultiSynt checkpoint to serve against a language's HPLT model.
+    Each (language, MultiSynt model) pair keeps a Beta posterior over the MultiSynt win rate
+    (ties count half a win for each side). Votes are steered towards pairs whose winner is
+    still statistically unclear instead of being spread uniformly.
+    """
+
+    def __init__(self, models_db=MODELS_DB, strategy="uncertainty", target_width=TARGET_CI_WIDTH, rng=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}', expected one of {STRATEGIES}")
+        self.models_db = models_db
+        self.strategy = strategy
+        self.target_width = target_width
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        # (language, multisynt model) -> [alpha, beta], starting from a uniform Beta(1, 1) prior
+        self.posteriors = {
+            (lang, model): [1.0, 1.0] for lang, entry in models_db.items() for model in entry["multisynt"]
+        }
+
+    @classmethod
+    def from_results(cls, results, **kwargs):
+        """Builds a scheduler whose posteriors already include the logged votes."""
+        scheduler = cls(**kwargs)
+        for row in results[["Language", "Model_A_Name", "Winner_Source"]].itertuples(index=False):
+            scheduler.update(row.Language, row.Model_A_Name, row.Winner_Source)
+        return scheduler
+
+    def update(self, language, multisynt_model, winner_source):
+        """Records one vote. Votes for pairs the scheduler does not know about are ignored."""
+        key = (language, multisynt_model)
+        if key not in self.posteriors:
+            return
+        with self._lock:
+            if winner_source == "MultiSynt":
+                self.posteriors[key][0] += 1
+            elif winner_source == "HPLT":
+                self.posteriors[key][1] += 1
+            elif winner_source == "Tie":
+                self.posteriors[key][0] += 0.5
+                self.posteriors[key][1] += 0.5
+
+    def stats(self, language, multisynt_model):
+        """Posterior mean, 95% interval width and P(MultiSynt wins more often) for a pair."""
+        alpha, beta = self.posteriors[(language, multisynt_model)]
+        total = alpha + beta
+        mean = alpha / total
+        sd = math.sqrt(alpha * beta / (total**2 * (total + 1)))
+        p_better = 1 - _normal_cdf((0.5 - mean) / sd)
+        return {"votes": total - 2, "win_rate": mean, "ci_width": 2 * Z_95 * sd, "p_better": p_better}
+
+    def is_resolved(self, language, multisynt_model):
+        s = self.stats(language, multisynt_model)
+        half = s["ci_width"] / 2
+        return s["win_rate"] - half > 0.5 or s["win_rate"] + half < 0.5 or s["ci_width"] < self.target_width
+
+    def choose_multisynt(self, language):
+        """Picks the MultiSynt checkpoint for the next round in `language`."""
+        options = self.models_db[language]["multisynt"]
+        if self.strategy == "uniform" or len(options) == 1:
+            return self.rng.choice(options)
+
+        with self._lock:
+            unresolved = [m for m in options if not self.is_resolved(language, m)]
+            # Once every pair is resolved there is nothing left to learn, so fall back to uniform
+            if not unresolved:
+                return self.rng.choice(options)
+
+            if self.strategy == "uncertainty":
+                # Ambiguity: probability mass on the less likely side of 50%
+                def priority(m):
+                    p = self.stats(language, m)["p_better"]
+                    return min(p, 1 - p)
+            else:
+                # Thompson-style: sample a win rate per pair and serve the one that lands closest to 50%
+                def priority(m):
+                    return -abs(self.rng.betavariate(*self.posteriors[(language, m)]) - 0.5)
+
+            scored = [(priority(m), self.rng.random(), m) for m in unresolved]
+            return max(scored)[2]
+
+    def summary(self):
+        """One row per pair with its vote count, win rate, interval width and resolution status."""
+        rows = []
+        for language, model in self.posteriors:
+            rows.append(
+                {
+                    "Language": language,
+                    "Model": model.split("/")[-1],
+                    **self.stats(language, model),
+                    "resolved": self.is_resolved(language, model),
+                }
+            )
+        return pd.DataFrame(rows)
+
+    def languages_needing_votes(self, limit=3):
+        """Languages that still have unresolved pairs, fewest votes first."""
+        summary = self.summary()
+        pending = summary[~summary["resolved"]].groupby("Language")["votes"].sum().sort_values()
+        return list(pending.index[:limit])
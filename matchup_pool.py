@@ -0,0 +1,231 @@
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from config import (
+    EXAMPLE_PROMPTS,
+    MATCHUP_POOL_ENABLED,
+    MATCHUP_POOL_IDLE_GRACE_S,
+    MATCHUP_POOL_MAX_AGE_S,
+    MATCHUP_POOL_MAX_PER_REFILL,
+    MATCHUP_POOL_PER_PROMPT,
+    MODELS_DB,
+)
+from serving import generate_pair
+
+# Generation settings pairs are pre-generated for: the sidebar defaults. Rounds with other
+# settings (or a prompt that is not an example prompt) are generated live.
+POOL_PARAM_SETS = [{"min_new_tokens": 70, "max_new_tokens": 112, "temperature": 0.7, "repetition_penalty": 1.2}]
+
+
+def slot_key(language, prompt, params):
+    return language, prompt, tuple(sorted(params.items()))
+
+
+class MatchupPool:
+    """
+    Pre-generated (MultiSynt, HPLT) output pairs for every language's example prompts, produced in
+    the background while no live generation is running (for `idle_grace_s`). Each (language, prompt,
+    settings) slot keeps at most `per_prompt` pairs, so a language holds at most
+    per_prompt * prompts * settings pairs. A pair is served at most once and only while younger than
+    `max_age_s`. The MultiSynt checkpoint is chosen by `choose_multisynt(language)` when the pair
+    is produced; the app still randomizes which side is shown left.
+    Production never evicts a loaded model (see Executor.fits_without_eviction), is cancelled as soon
+    as a live generation starts, and stops once no live round has run for `max_age_s`: expired pairs
+    of an unused app are not replaced. It starts at most `max_per_refill` generations per `max_age_s`
+    (the time in which every pair is replaced), so background compute stays bounded.
+    """
+
+    def __init__(
+        self,
+        executor,
+        choose_multisynt,
+        models_db=MODELS_DB,
+        prompts=EXAMPLE_PROMPTS,
+        param_sets=POOL_PARAM_SETS,
+        per_prompt=MATCHUP_POOL_PER_PROMPT,
+        max_age_s=MATCHUP_POOL_MAX_AGE_S,
+        max_per_refill=MATCHUP_POOL_MAX_PER_REFILL,
+        idle_grace_s=MATCHUP_POOL_IDLE_GRACE_S,
+        poll_s=1.0,
+        enabled=MATCHUP_POOL_ENABLED,
+        clock=time.monotonic,
+    ):
+        self.executor = executor
+        self.choose_multisynt = choose_multisynt
+        self.models_db = models_db
+        self.per_prompt = per_prompt
+        self.max_age_s = max_age_s
+        self.max_per_refill = max_per_refill
+        self.idle_grace_s = idle_grace_s
+        self.poll_s = poll_s
+        self.enabled = enabled
+        self.clock = clock
+        self.slots = {
+            slot_key(language, prompt, params): (language, prompt, params)
+            for language in models_db
+            for prompt in prompts.get(language, [])
+            for params in param_sets
+        }
+        self._pairs = {key: deque() for key in self.slots}  # oldest first
+        self._last_produced = dict.fromkeys(self.slots, 0.0)
+        self._started = deque()  # start times of the generations of the last max_age_s
+        self._lock = threading.Lock()
+        self._live = 0
+        self._last_live = clock()
+        self._stop = threading.Event()
+        self._cancel = threading.Event()  # of the pair in production
+        self._thread = None
+        self.counters = {
+            "lookups": 0,
+            "eligible": 0,
+            "hits": 0,
+            "produced": 0,
+            "failed": 0,
+            "expired": 0,
+            "cancelled": 0,
+            "skipped_cold": 0,
+            "skipped_budget": 0,
+        }
+        self.timing = {"idle_s": 0.0, "producing_s": 0.0}
+
+    @contextmanager
+    def live(self):
+        """Wrap live generations: the producer pauses while any is running and cancels its pair in production."""
+        with self._lock:
+            self._live += 1
+            self._cancel.set()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._live -= 1
+                self._last_live = self.clock()
+
+    def is_idle(self):
+        """No live generation for idle_grace_s, but one within max_age_s (or since start)."""
+        with self._lock:
+            since_live = self.clock() - self._last_live
+            return self._live == 0 and self.idle_grace_s <= since_live <= self.max_age_s
+
+    def _drop_expired(self, key):
+        """Drops the slot's stale pairs (caller holds the lock); returns how many fresh pairs remain."""
+        pairs = self._pairs[key]
+        while pairs and self.clock() - pairs[0]["created_at"] > self.max_age_s:
+            pairs.popleft()
+            self.counters["expired"] += 1
+        return len(pairs)
+
+    def take(self, language, prompt, params):
+        """Removes and returns the oldest fresh pair for this round, or None (generate live)."""
+        key = slot_key(language, prompt, params)
+        with self._lock:
+            self.counters["lookups"] += 1
+            if key not in self.slots:
+                return None
+            self.counters["eligible"] += 1
+            if not self._drop_expired(key):
+                return None
+            self.counters["hits"] += 1
+            return self._pairs[key].popleft()
+
+    def _next_slot(self):
+        """The slot with the fewest fresh pairs (least recently filled first), or None if all are full."""
+        with self._lock:
+            open_slots = [(self._drop_expired(key), self._last_produced[key], key) for key in self.slots]
+        open_slots = [slot for slot in open_slots if slot[0] < self.per_prompt]
+        return min(open_slots)[2] if open_slots else None
+
+    def produce_once(self):
+        """
+        Generates one pair for the emptiest slot. Returns False if nothing was generated: every slot is
+        full, the slot's models would evict a loaded one (the slot goes last in line), this refill's
+        generations are used up or a live generation runs.
+        """
+        key = self._next_slot()
+        if key is None:
+            return False
+        language, prompt, params = self.slots[key]
+        multisynt = self.choose_multisynt(language)
+        hplt = self.models_db[language]["hplt"]
+        fits = self.executor.fits_without_eviction([multisynt, hplt])
+        with self._lock:
+            if not fits:
+                self._last_produced[key] = self.clock()
+                self.counters["skipped_cold"] += 1
+                return False
+            if self._live:
+                return False
+            while self._started and self.clock() - self._started[0] > self.max_age_s:
+                self._started.popleft()
+            if len(self._started) >= self.max_per_refill:
+                self.counters["skipped_budget"] += 1
+                return False
+            self._started.append(self.clock())
+            self._cancel = cancel_event = threading.Event()
+        side_a, side_b = generate_pair(self.executor, multisynt, hplt, prompt, params, cancel_event=cancel_event)
+        with self._lock:
+            self._last_produced[key] = self.clock()
+            if cancel_event.is_set():
+                self.counters["cancelled"] += 1
+                return True
+            if side_a[0] != 0 or side_b[0] != 0:
+                self.counters["failed"] += 1
+                print(f"Matchup pool: generation for {language} failed: {side_a[2] or side_b[2]}", file=sys.stderr)
+                return True
+            pair = {"multisynt": multisynt, "hplt": hplt, "side_a": side_a, "side_b": side_b, "created_at": self.clock()}
+            self._pairs[key].append(pair)
+            self.counters["produced"] += 1
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.is_idle():
+                self._stop.wait(self.poll_s)
+                continue
+            start = self.clock()
+            try:
+                produced = self.produce_once()
+            except Exception as e:
+                print(f"Matchup pool: {e}", file=sys.stderr)
+                produced = False
+            if not produced:
+                self._stop.wait(self.poll_s)
+            elapsed = self.clock() - start
+            with self._lock:
+                self.timing["idle_s"] += elapsed
+                if produced:
+                    self.timing["producing_s"] += elapsed
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="matchup-pool")
+            self._thread.start()
+        return self
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        """
+        Counters plus hit_rate (rounds served from the pool / all rounds looked up), pool_hit_rate
+        (the same among rounds the pool could serve: an example prompt with pooled settings),
+        idle_utilization (share of idle time spent pre-generating) and the fresh pairs ready.
+        """
+        with self._lock:
+            ready = {}
+            for key, (language, _, _) in self.slots.items():
+                ready[language] = ready.get(language, 0) + self._drop_expired(key)
+            return {
+                **self.counters,
+                **self.timing,
+                "hit_rate": self.counters["hits"] / self.counters["lookups"] if self.counters["lookups"] else 0.0,
+                "pool_hit_rate": self.counters["hits"] / self.counters["eligible"] if self.counters["eligible"] else 0.0,
+                "idle_utilization": self.timing["producing_s"] / self.timing["idle_s"] if self.timing["idle_s"] else 0.0,
+                "ready": sum(ready.values()),
+                "ready_by_language": ready,
+            }
@@ -0,0 +1,225 @@
+import bisect
+import math
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal Prometheus-style instrumentation (text exposition format 0.0.4), so the arena stack
+# can be scraped without extra dependencies. Metrics are process-wide and thread-safe.
+
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+LOAD_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+            return sum(counts)
+
+    def _render_sample(self, key, value):
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            labels = _format_labels(self.label_names, key, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Holds metrics and collectors. A collector is a function returning a dict of numbers
+    (e.g. an executor's stats()), exported as gauges named <prefix>_<key> at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def add_collector(self, prefix, collect_fn):
+        self._collectors.append((prefix, collect_fn))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, collect_fn in self._collectors:
+            try:
+                stats = collect_fn()
+            except Exception as e:
+                print(f"Metrics collector {prefix} failed: {e}", file=sys.stderr)
+                continue
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+GENERATION_REQUESTS = REGISTRY.counter("arena_generation_requests_total", "Generation attempts started.", ["model"])
+GENERATION_ERRORS = REGISTRY.counter("arena_generation_errors_total", "Generation attempts that failed.", ["model"])
+GENERATIONS_IN_FLIGHT = REGISTRY.gauge("arena_generations_in_flight", "Generations currently running.", ["model"])
+CACHE_HITS = REGISTRY.counter("arena_cache_hits_total", "Generations served by an already loaded model.", ["model"])
+COLD_LOADS = REGISTRY.counter("arena_cold_loads_total", "Generations that had to load their model.", ["model"])
+GENERATION_SECONDS = REGISTRY.histogram(
+    "arena_generation_seconds", "Wall time of a generation as seen by the caller.", ["model"]
+)
+LOAD_SECONDS = REGISTRY.histogram("arena_model_load_seconds", "Model load time.", ["model"], LOAD_BUCKETS)
+TOKENS_PER_SECOND = REGISTRY.histogram(
+    "arena_decode_tokens_per_second", "Decode throughput of a generation.", ["model"], RATE_BUCKETS
+)
+
+
+def observe_generation(model_name, generate_fn):
+    """
+    Runs `generate_fn` (returning (returncode, text, error, metrics) like an executor) and records
+    it: requests, in-flight, errors, wall time, cache hit or cold load time and decode tokens/s.
+    """
+    GENERATION_REQUESTS.inc(model=model_name)
+    GENERATIONS_IN_FLIGHT.inc(model=model_name)
+    start = time.perf_counter()
+    try:
+        result = generate_fn()
+    except Exception:
+        GENERATION_ERRORS.inc(model=model_name)
+        raise
+    finally:
+        GENERATIONS_IN_FLIGHT.dec(model=model_name)
+
+    returncode, _, _, metrics = result
+    if returncode != 0:
+        GENERATION_ERRORS.inc(model=model_name)
+        return result
+    GENERATION_SECONDS.observe(time.perf_counter() - start, model=model_name)
+    if "cached" in metrics:
+        if metrics["cached"]:
+            CACHE_HITS.inc(model=model_name)
+        else:
+            COLD_LOADS.inc(model=model_name)
+            LOAD_SECONDS.observe(metrics.get("load_s") or 0.0, model=model_name)
+    if metrics.get("new_tokens") and metrics.get("decode_s"):
+        TOKENS_PER_SECOND.observe(metrics["new_tokens"] / metrics["decode_s"], model=model_name)
+    return result
+
+
+def start_metrics_server(port, registry=REGISTRY, host="0.0.0.0"):
+    """Serves `registry` at http://host:port/metrics from a daemon thread. Returns the server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    print(f"Serving metrics on http://{host}:{server.server_port}/metrics", file=sys.stderr)
+    return server
@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+import torch
+import transformers
+
+from autotune import cpu_model
+from backend import generate_with_metrics, get_pipeline
+from results_log import SCHEMA_VERSION, SCHEMAS, generation_metrics, read_results
+from tiny_model import build_tiny_model
+
+# Versioned with the code, one baseline per machine (see hardware_key): a machine is gated once its
+# baseline is committed
+BASELINES_FILE = os.environ.get(
+    "ARENA_PERF_BASELINES_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "perf_baselines.json"),
+)
+# Bump when a benchmark below changes what it measures; baselines of another version are ignored.
+BASELINE_VERSION = 1
+
+# metric -> (higher is better, allowed relative regression). Run-to-run noise on shared CPU machines
+# is up to ~1.5x, so the gate catches gross regressions (e.g. a lost cache or an accidental O(n^2)).
+METRICS = {
+    "load_s": (False, 1.0),
+    "tokens_per_s": (True, 0.5),
+    "batch_tokens_per_s": (True, 0.5),
+    "results_parse_s": (False, 1.0),
+}
+
+PROMPT = "Det var en gång en liten katt som"
+NEW_TOKENS = 32
+BATCH_SIZE = 8
+RESULTS_ROWS = 5000
+
+
+def hardware_key():
+    """Identifies the machine a baseline was recorded on; numbers are only compared on the same key."""
+    return f"{platform.machine()} {cpu_model()} ({torch.get_num_threads()} threads)"
+
+
+def _median_time(fn, repeats):
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs)
+
+
+def _synthetic_results(path, rows):
+    """A vote log of `rows` schema-current votes with telemetry, like a busy production log."""
+    columns = SCHEMAS[SCHEMA_VERSION]
+    df = pd.DataFrame({column: [""] * rows for column in columns})
+    df["Timestamp"] = pd.date_range("2025-01-01", periods=rows, freq="min").astype(str)
+    df["Language"] = ["Swedish", "Finnish", "Danish", "Norwegian"] * (rows // 4) + ["Swedish"] * (rows % 4)
+    df["Prompt"] = PROMPT
+    df["Schema_Version"] = SCHEMA_VERSION
+    for side in ("A", "B"):
+        df[f"Model_{side}_Name"] = f"model-{side.lower()}"
+        df[f"Output_{side}"] = PROMPT + " satt på en matta." * 20
+        df[f"Cached_{side}"] = True
+        df[f"Load_s_{side}"] = 0.0
+        df[f"Prefill_s_{side}"] = 0.25
+        df[f"Decode_s_{side}"] = 4.5
+        df[f"New_Tokens_{side}"] = 112
+    df.to_csv(path, index=False)
+
+
+def run_suite(model_dir=None, repeats=5):
+    """
+    Measures the serving hot paths on CPU with a tiny randomly initialized model (built locally,
+    no downloads): pipeline load time, single-prompt and batched generation throughput,
+    and parsing a large vote log. Returns {metric: value}.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = model_dir or build_tiny_model(os.path.join(tmp, "tiny"))
+        # Always the default settings: a tuning profile stored on this machine must not move the baseline
+        get_pipeline(model_dir, 0, settings={})  # imports and file cache warm-up
+        load_s = _median_time(lambda: get_pipeline(model_dir, 0, settings={}), repeats)
+
+        pipe = get_pipeline(model_dir, 0, settings={})
+        params = {"min_new_tokens": NEW_TOKENS, "max_new_tokens": NEW_TOKENS}
+        generate_with_metrics(pipe, PROMPT, **params)
+        generate_s = _median_time(lambda: generate_with_metrics(pipe, PROMPT, **params), repeats)
+
+        def generate_batch():
+            pipe(
+                [PROMPT] * BATCH_SIZE,
+                batch_size=BATCH_SIZE,
+                max_new_tokens=NEW_TOKENS,
+                min_new_tokens=NEW_TOKENS,
+                do_sample=False,
+                pad_token_id=pipe.tokenizer.pad_token_id,
+            )
+
+        generate_batch()
+        batch_s = _median_time(generate_batch, repeats)
+
+        results_path = os.path.join(tmp, "arena_results.csv")
+        _synthetic_results(results_path, RESULTS_ROWS)
+        parse_s = _median_time(lambda: generation_metrics(read_results(results_path)), repeats)
+
+    return {
+        "load_s": load_s,
+        "tokens_per_s": NEW_TOKENS / generate_s,
+        "batch_tokens_per_s": BATCH_SIZE * NEW_TOKENS / batch_s,
+        "results_parse_s": parse_s,
+    }
+
+
+def load_baseline(path=BASELINES_FILE, hardware=None):
+    """This machine's baseline record, or None if none was recorded (for the current BASELINE_VERSION)."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        stored = json.load(f)
+    if stored.get("version") != BASELINE_VERSION:
+        return None
+    return stored["baselines"].get(hardware or hardware_key())
+
+
+def save_baseline(results, path=BASELINES_FILE, hardware=None):
+    """Records `results` as this machine's baseline, keeping other machines' baselines."""
+    stored = {"version": BASELINE_VERSION, "baselines": {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        if previous.get("version") == BASELINE_VERSION:
+            stored = previous
+    stored["baselines"][hardware or hardware_key()] = {
+        "recorded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "metrics": {name: round(value, 4) for name, value in results.items()},
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(stored, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results, baseline_metrics, tolerance_scale=1.0):
+    """
+    Regressions of `results` against a baseline's metrics, as human-readable strings.
+    A metric regresses when it is worse than the baseline by more than its tolerance (times `tolerance_scale`).
+    """
+    regressions = []
+    for name, (higher_is_better, tolerance) in METRICS.items():
+        if name not in results or name not in baseline_metrics:
+            continue
+        value, baseline = results[name], baseline_metrics[name]
+        tolerance *= tolerance_scale
+        if higher_is_better:
+            regressed = value < baseline * (1 - tolerance)
+        else:
+            regressed = value > baseline * (1 + tolerance)
+        if regressed:
+            change = value / baseline - 1
+            regressions.append(f"{name}: {value:.4g} vs. baseline {baseline:.4g} ({change:+.0%}, tolerance {tolerance:.0%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU performance regression suite with tiny random models.")
+    parser.add_argument("--update", action="store_true", help="Record the results as this machine's baseline.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--tolerance_scale", type=float, default=1.0)
+    parser.add_argument(
+        "--require_baseline", action="store_true", help="Fail on a machine without a baseline (CI), instead of passing."
+    )
+    args = parser.parse_args()
+
+    results = run_suite(repeats=args.repeats)
+    baseline = load_baseline()
+    print(f"\nHardware: {hardware_key()}")
+    for name, value in results.items():
+        reference = f"(baseline {baseline['metrics'][name]:.4g})" if baseline and name in baseline["metrics"] else ""
+        print(f"  {name:<20} {value:>10.4g} {reference}")
+
+    if args.update:
+        save_baseline(results)
+        print(f"Saved baseline to {BASELINES_FILE}")
+        sys.exit(0)
+    if baseline is None:
+        print(f"No baseline for this machine in {BASELINES_FILE}; record one with --update and commit it.")
+        sys.exit(1 if args.require_baseline else 0)
+    regressions = compare(results, baseline["metrics"], args.tolerance_scale)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,211 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import MODELS_DB, PREWARM_ENABLED
+
+# Only files needed to load a model are fetched; weights are read through to warm the page cache
+WARM_PATTERNS = ["*.json", "*.safetensors", "*.py", "*.model", "*.txt", "*.tiktoken"]
+WEIGHT_SUFFIXES = (".safetensors", ".bin")
+READ_CHUNK = 16 * 1024 * 1024
+# Page cache entries get evicted eventually, so a warm model is only trusted for this long
+WARM_TTL_S = 15 * 60
+# A session that has not selected a language for this long is assumed gone (Streamlit never says so)
+SESSION_TTL_S = 60 * 60
+
+
+class PrewarmCancelled(Exception):
+    pass
+
+
+def resolve_model_dir(model_name, cancel_event=None):
+    """
+    Local directory of a model: the path itself, or its (downloaded if needed) Hub snapshot.
+    With `cancel_event`, the snapshot is downloaded one file at a time, checking the event in between.
+    """
+    if os.path.isdir(model_name):
+        return model_name
+    from huggingface_hub import HfApi, constants, hf_hub_download, snapshot_download
+    from huggingface_hub.utils import filter_repo_objects
+
+    if cancel_event is None or constants.HF_HUB_OFFLINE:
+        return snapshot_download(model_name, allow_patterns=WARM_PATTERNS)
+    info = HfApi().model_info(model_name)
+    filenames = list(filter_repo_objects([f.rfilename for f in info.siblings], allow_patterns=WARM_PATTERNS))
+    for filename in filenames:
+        if cancel_event.is_set():
+            raise PrewarmCancelled(model_name)
+        path = hf_hub_download(model_name, filename, revision=info.sha)
+    # Files sit at their repo path under the snapshot directory
+    return path[: -len(filename)].rstrip("/") if filenames else snapshot_download(model_name, revision=info.sha)
+
+
+def warm_model_files(model_name, cancel_event):
+    """
+    Makes sure a model's files are on local disk and its weights are in the OS page cache,
+    so the next get_pipeline skips the download and cold reads. Checks `cancel_event` between files
+    and chunks.
+    """
+    model_dir = resolve_model_dir(model_name, cancel_event)
+    for root, _, files in os.walk(model_dir):
+        for name in files:
+            if not name.endswith(WEIGHT_SUFFIXES):
+                continue
+            with open(os.path.join(root, name), "rb") as f:
+                while f.read(READ_CHUNK):
+                    if cancel_event.is_set():
+                        raise PrewarmCancelled(model_name)
+
+
+def models_for_language(language, models_db=MODELS_DB):
+    """The HPLT checkpoint plus every MultiSynt candidate that could be served for `language`."""
+    entry = models_db[language]
+    hplt = entry["hplt"] if isinstance(entry["hplt"], list) else [entry["hplt"]]
+    return hplt + list(entry["multisynt"])
+
+
+class _WarmJob:
+    def __init__(self):
+        self.cancel_event = threading.Event()
+        self.sessions = set()
+        self.done_at = None
+
+
+class Prewarmer:
+    """
+    Warms the models of a newly selected language in the background.
+    Jobs are shared between sessions (one job per model); a job is cancelled when every session
+    that wanted it has switched to another language, or has been gone for `session_ttl`.
+    Generations report which models they used and the load time they observed, so hit rate and the
+    load time saved can be tracked.
+    """
+
+    def __init__(
+        self,
+        warm_fn=warm_model_files,
+        max_workers=2,
+        ttl=WARM_TTL_S,
+        models_db=MODELS_DB,
+        enabled=PREWARM_ENABLED,
+        session_ttl=SESSION_TTL_S,
+    ):
+        self.warm_fn = warm_fn
+        self.enabled = enabled
+        self.ttl = ttl
+        self.session_ttl = session_ttl
+        self.models_db = models_db
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prewarm")
+        self._lock = threading.Lock()
+        self._jobs = {}  # model -> _WarmJob (pending, running or done)
+        self._session_models = OrderedDict()  # session -> (models it asked for, when), least recent first
+        self._cold_load_s = {}  # model -> load time of its last generation that missed
+        self.counters = {
+            "requested": 0,
+            "deduplicated": 0,
+            "cancelled": 0,
+            "completed": 0,
+            "failed": 0,
+            "sessions_expired": 0,
+        }
+        self.uses = {"hits": 0, "misses": 0, "load_time_saved_s": 0.0}
+
+    def _is_warm(self, job):
+        return job.done_at is not None and time.monotonic() - job.done_at < self.ttl
+
+    def _drop_interest(self, session_id, models):
+        """Removes the session from the models' jobs, cancelling jobs nobody wants any more (caller holds the lock)."""
+        for model in models:
+            job = self._jobs.get(model)
+            if job is None:
+                continue
+            job.sessions.discard(session_id)
+            if not job.sessions and job.done_at is None and not job.cancel_event.is_set():
+                job.cancel_event.set()
+                self.counters["cancelled"] += 1
+
+    def _expire_sessions(self, now):
+        """Forgets sessions not seen for session_ttl (caller holds the lock)."""
+        while self._session_models:
+            session_id, (models, seen_at) = next(iter(self._session_models.items()))
+            if now - seen_at < self.session_ttl:
+                break
+            del self._session_models[session_id]
+            self._drop_interest(session_id, models)
+            self.counters["sessions_expired"] += 1
+
+    def request(self, session_id, language):
+        """Non-blocking: queue warming for `language` and drop this session's interest in older models."""
+        if not self.enabled:
+            return []
+        models = models_for_language(language, self.models_db)
+        with self._lock:
+            now = time.monotonic()
+            previous, _ = self._session_models.pop(session_id, (set(), now))
+            self._expire_sessions(now)
+            self._drop_interest(session_id, previous - set(models))
+            self._session_models[session_id] = (set(models), now)
+
+            for model in models:
+                self.counters["requested"] += 1
+                job = self._jobs.get(model)
+                if job is not None and (self._is_warm(job) or (job.done_at is None and not job.cancel_event.is_set())):
+                    job.sessions.add(session_id)
+                    self.counters["deduplicated"] += 1
+                    continue
+                job = _WarmJob()
+                job.sessions.add(session_id)
+                self._jobs[model] = job
+                self._pool.submit(self._run, model, job)
+        return models
+
+    def _run(self, model, job):
+        if job.cancel_event.is_set():
+            return
+        try:
+            self.warm_fn(model, job.cancel_event)
+        except PrewarmCancelled:
+            return
+        except Exception as e:
+            print(f"Prewarm of {model} failed: {e}", file=sys.stderr)
+            with self._lock:
+                self.counters["failed"] += 1
+            return
+        with self._lock:
+            job.done_at = time.monotonic()
+            self.counters["completed"] += 1
+
+    def record_use(self, model, load_s=None):
+        """
+        Called for each generation with `model` and the model load time it observed (None if unknown).
+        Returns True if it found the model warm. The load time saved by a hit is measured against the
+        model's load time on its last miss; hits before any miss was measured count as saving nothing.
+        """
+        with self._lock:
+            job = self._jobs.get(model)
+            hit = job is not None and self._is_warm(job)
+            self.uses["hits" if hit else "misses"] += 1
+            if load_s is not None:
+                if hit and model in self._cold_load_s:
+                    self.uses["load_time_saved_s"] += max(0.0, self._cold_load_s[model] - load_s)
+                elif not hit and load_s > 0:
+                    self._cold_load_s[model] = load_s
+            return hit
+
+    def stats(self):
+        with self._lock:
+            used = self.uses["hits"] + self.uses["misses"]
+            return {
+                **self.counters,
+                **self.uses,
+                "hit_rate": self.uses["hits"] / used if used else 0.0,
+                "warm_models": sum(1 for job in self._jobs.values() if self._is_warm(job)),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel_event.set()
+        self._pool.shutdown(wait=True, cancel_futures=True)
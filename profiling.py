@@ -0,0 +1,117 @@
+import collections
+import fcntl
+import glob
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from config import PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_SLOWEST
+
+# Profiles are written as collapsed stacks ("frame;frame;frame count" per line), the input format of
+# flamegraph.pl, inferno and speedscope. The file name starts with the generation's duration so the
+# directory sorts slowest-last and can be shared by every process on a node.
+_PROFILE_NAME = re.compile(r"^(\d+\.\d+)s-")
+_DISABLED = nullcontext()
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the Python stack of one thread every `interval` s from a background thread."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="stack-sampler")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+class SlowestProfiles:
+    """
+    Keeps flamegraph profiles of the `keep` slowest generations in `directory`.
+    With keep=0 profiling is off and profile() returns a shared no-op context manager.
+    """
+
+    def __init__(self, keep=PROFILE_SLOWEST, directory=PROFILE_DIR, interval_ms=PROFILE_INTERVAL_MS):
+        self.keep = keep
+        self.directory = directory
+        self.interval = interval_ms / 1000
+
+    def profile(self, label):
+        if not self.keep:
+            return _DISABLED
+        return self._profile(label)
+
+    @contextmanager
+    def _profile(self, label):
+        sampler = StackSampler(threading.get_ident(), self.interval).start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.record(label, duration, sampler.stop())
+
+    def profiles(self):
+        """Paths of the kept profiles, slowest first."""
+        paths = [p for p in glob.glob(os.path.join(self.directory, "*.folded")) if self._duration(p) is not None]
+        return sorted(paths, key=self._duration, reverse=True)
+
+    @staticmethod
+    def _duration(path):
+        match = _PROFILE_NAME.match(os.path.basename(path))
+        return float(match.group(1)) if match else None
+
+    def record(self, label, duration, stacks):
+        """Writes the profile if it is among the `keep` slowest seen so far. Returns its path or None."""
+        if not stacks:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            kept = self.profiles()
+            if len(kept) >= self.keep and duration <= self._duration(kept[-1]):
+                return None
+            slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", label)
+            path = os.path.join(self.directory, f"{duration:010.3f}s-{slug}-{os.getpid()}-{time.time_ns()}.folded")
+            with open(path, "w") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            for stale in kept[self.keep - 1 :]:
+                os.remove(stale)
+        print(f"Saved profile of a {duration:.2f}s generation ({label}) to {path}", file=sys.stderr)
+        return path
+
+
+PROFILER = SlowestProfiles()
+
+
+def profile_generation(label):
+    """Context manager profiling one generation with the process-wide profiler (a no-op when disabled)."""
+    return PROFILER.profile(label)
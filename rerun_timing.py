@@ -0,0 +1,310 @@
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import dataclasses
+
+import streamlit
+from streamlit.testing.v1 import AppTest
+
+from results_log import RESULTS_FILE
+
+# AppTest neither times runs nor reruns a single fragment, so the harness builds on Streamlit
+# internals (tested with Streamlit 1.66). A Streamlit that moved them fails here, not with wrong timings.
+try:
+    import streamlit.testing.v1.app_test as app_test
+    from streamlit.runtime.scriptrunner import RerunData, ScriptRunnerEvent
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.scriptrunner_utils.script_requests import ScriptRequests
+    from streamlit.testing.v1.element_tree import parse_tree_from_messages
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner, require_widgets_deltas
+
+    if "fragment_id_queue" not in {field.name for field in dataclasses.fields(RerunData)}:
+        raise ImportError("RerunData has no fragment_id_queue")
+except ImportError as e:
+    raise ImportError(f"rerun_timing does not support Streamlit {streamlit.__version__}: {e}") from e
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(REPO_DIR, "app.py")
+LOGOS = ["oellm_logo.png", "airon_logo.png"]
+# The app reads these at import, so the harness runs in its own process (see __main__): the UI alone,
+# with no workers, matchup pool or models
+HARNESS_ENV = {
+    "ARENA_EXECUTION_MODE": "inprocess",
+    "ARENA_MATCHUP_POOL": "0",
+    "ARENA_PREWARM": "0",
+    "ARENA_METRICS_PORT": "0",
+}
+
+# rerun type -> upper bound (s) on the median script execution time. Generation is stubbed out, so
+# these time the script itself: what a user waits for on top of the models. ~5x headroom for shared CPUs.
+BOUNDS = {
+    "first_load": 0.15,
+    "settings_slider": 0.05,
+    "example_prompt": 0.05,
+    "generate": 0.1,
+    "vote": 0.1,
+    "dashboard_open": 1.5,
+    "dashboard_rerun": 1.0,
+    "latency_group_by": 0.2,
+}
+# Fragment rerun type -> (the full rerun it must stay well below, most it may cost of it). Machine
+# independent: a widget that falls out of its fragment reruns the whole page and costs as much.
+RELATIVE_BOUNDS = {
+    "settings_slider": ("first_load", 0.5),
+    "example_prompt": ("first_load", 0.5),
+    "generate": ("first_load", 0.5),
+    "vote": ("first_load", 0.5),
+    "latency_group_by": ("dashboard_rerun", 0.5),
+}
+
+STUB_METRICS = {
+    "cached": True,
+    "load_s": 0.0,
+    "queue_wait_s": 0.0,
+    "prefill_s": 0.1,
+    "decode_s": 2.0,
+    "prompt_tokens": 8,
+    "new_tokens": 112,
+    "stop_reason": "max_new_tokens",
+}
+
+
+def _stub_generate_pair(executor, model_a, model_b, prompt, params, *args, **kwargs):
+    return [(0, f"{prompt} ...", "", dict(STUB_METRICS)), (0, f"{prompt} ...", "", dict(STUB_METRICS))]
+
+
+class _TimedScriptRunner(LocalScriptRunner):
+    """
+    AppTest's script runner, timing each script run. With `fragment_id` set, the next run reruns only
+    that fragment, as the browser requests for a widget inside one (AppTest always reruns the whole script).
+    Like a server, it compiles the script once rather than on every run.
+    """
+
+    fragment_id = None
+    latest = None
+    script_cache = ScriptCache()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not (hasattr(self, "_script_cache") and hasattr(self, "_requests")):
+            raise RuntimeError(f"rerun_timing does not support Streamlit {streamlit.__version__}: runner state moved")
+        self._script_cache = self.script_cache
+        self.script_s = 0.0
+        self._started = None
+        self.on_event.connect(self._time_event, weak=False)
+        _TimedScriptRunner.latest = self
+
+    def _time_event(self, sender, event, **kwargs):
+        if event == ScriptRunnerEvent.SCRIPT_STARTED:
+            self._started = time.perf_counter()
+        elif event.name.endswith(("_STOPPED_WITH_SUCCESS", "_STOPPED_WITH_COMPILE_ERROR", "_STOPPED_FOR_RERUN")) and (
+            self._started is not None
+        ):
+            # st.rerun() inside a run starts another one: a rerun costs all of them
+            self.script_s += time.perf_counter() - self._started
+            self._started = None
+
+    def run(self, widget_state=None, query_params=None, timeout=3, page_hash=""):
+        if self.fragment_id is None:
+            return super().run(widget_state, query_params, timeout, page_hash)
+        rerun_data = RerunData(
+            widget_states=widget_state, page_script_hash=page_hash, fragment_id_queue=[self.fragment_id]
+        )
+        # Replaces the full run queued at construction, which would absorb the fragment request
+        self._requests = ScriptRequests()
+        self._requests.request_rerun(rerun_data)
+        try:
+            if not self._script_thread:
+                self.start()
+            require_widgets_deltas(self, timeout)
+        finally:
+            self.join()
+        return parse_tree_from_messages(self.forward_msgs())
+
+
+@contextlib.contextmanager
+def _patched():
+    """AppTest on the timed runner, with instant generation."""
+    import serving
+
+    runner, generate_pair = app_test.LocalScriptRunner, serving.generate_pair
+    app_test.LocalScriptRunner, serving.generate_pair = _TimedScriptRunner, _stub_generate_pair
+    try:
+        yield
+    finally:
+        app_test.LocalScriptRunner, serving.generate_pair = runner, generate_pair
+
+
+class Session:
+    """One browser session of the app, timing each rerun an interaction triggers."""
+
+    def __init__(self, app_file=APP_FILE, timeout=120):
+        self.at = AppTest.from_file(app_file, default_timeout=timeout)
+        self.fragments = {}  # widget id -> id of the fragment it was rendered in
+
+    def _run(self, fragment_id=None):
+        _TimedScriptRunner.fragment_id = fragment_id
+        try:
+            self.at.run()
+        finally:
+            _TimedScriptRunner.fragment_id = None
+        if self.at.exception:
+            raise RuntimeError(f"The app raised: {[e.message for e in self.at.exception]}")
+        runner = _TimedScriptRunner.latest
+        for msg in runner.forward_msgs():
+            if msg.WhichOneof("type") != "delta" or not msg.delta.HasField("new_element"):
+                continue
+            element = getattr(msg.delta.new_element, msg.delta.new_element.WhichOneof("type"))
+            if getattr(element, "id", ""):
+                self.fragments[element.id] = msg.delta.fragment_id or None
+        return runner.script_s
+
+    def load(self):
+        return self._run()
+
+    def interact(self, widget):
+        """
+        Reruns after `widget` was clicked or set: only its fragment if it has one. A fragment rerun
+        returns only the fragment's elements, so the whole page is then redrawn (untimed) to keep
+        finding widgets.
+        """
+        fragment_id = self.fragments.get(widget.id)
+        seconds = self._run(fragment_id)
+        if fragment_id:
+            self._run()
+        return seconds
+
+    def button(self, label):
+        return next(b for b in self.at.button if b.label == label)
+
+    def slider(self, label):
+        return next(s for s in self.at.slider if s.label == label)
+
+    def open_dashboard(self):
+        return self.interact(self.at.sidebar.radio[0].set_value("📊 Analytics Dashboard"))
+
+
+def _first_load(session):
+    return session.load()
+
+
+def _settings_slider(session):
+    session.load()
+    return session.interact(session.slider("Max New Tokens").set_value(256))
+
+
+def _example_prompt(session):
+    session.load()
+    return session.interact(session.button("📖 Story Starter").click())
+
+
+def _generate(session):
+    _example_prompt(session)
+    return session.interact(session.button("Generate Response").click())
+
+
+def _vote(session):
+    _generate(session)
+    return session.interact(session.button("🤝 Tie / Equal Fluency").click())
+
+
+def _dashboard_open(session):
+    # Right after a vote, so the dashboard reads the results again
+    _vote(session)
+    return session.open_dashboard()
+
+
+def _dashboard_rerun(session):
+    session.load()
+    session.open_dashboard()
+    return session.interact(session.at.sidebar.radio[0])
+
+
+def _latency_group_by(session):
+    session.load()
+    session.open_dashboard()
+    return session.interact(next(r for r in session.at.radio if r.key == "latency_group_by").set_value("language"))
+
+
+# rerun type -> fn(session) that sets the scenario up and returns the seconds of the timed rerun
+SCENARIOS = {
+    "first_load": _first_load,
+    "settings_slider": _settings_slider,
+    "example_prompt": _example_prompt,
+    "generate": _generate,
+    "vote": _vote,
+    "dashboard_open": _dashboard_open,
+    "dashboard_rerun": _dashboard_rerun,
+    "latency_group_by": _latency_group_by,
+}
+
+
+def run_reruns(results_file=RESULTS_FILE, repeats=5, app_file=APP_FILE):
+    """
+    Median script execution time (s) per rerun type over `repeats` fresh sessions, run in a scratch
+    directory holding a copy of `results_file` (votes cast by the harness never touch the original).
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, _patched():
+        for name in LOGOS:
+            if os.path.exists(os.path.join(REPO_DIR, name)):
+                shutil.copy(os.path.join(REPO_DIR, name), tmp)
+        if os.path.exists(results_file):
+            shutil.copy(results_file, os.path.join(tmp, RESULTS_FILE))
+        os.chdir(tmp)
+        try:
+            Session(app_file).load()  # imports and process-wide caches, shared by every later session
+            timings = {}
+            for rerun_type, scenario in SCENARIOS.items():
+                timings[rerun_type] = statistics.median(scenario(Session(app_file)) for _ in range(repeats))
+        finally:
+            os.chdir(cwd)
+    return timings
+
+
+def check(timings, bounds=BOUNDS, scale=1.0, relative_bounds=RELATIVE_BOUNDS):
+    """Messages for each rerun type over its bound."""
+    failures = [
+        f"{rerun_type}: {seconds:.3f}s over its {bounds[rerun_type] * scale:.3f}s bound"
+        for rerun_type, seconds in timings.items()
+        if seconds > bounds[rerun_type] * scale
+    ]
+    for rerun_type, (full_rerun, share) in relative_bounds.items():
+        if timings[rerun_type] > share * timings[full_rerun]:
+            failures.append(
+                f"{rerun_type}: {timings[rerun_type]:.3f}s, over {share:.0%} of a {full_rerun} rerun "
+                f"({timings[full_rerun]:.3f}s)"
+            )
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time the Streamlit script per rerun type (generation stubbed) and check the upper bounds."
+    )
+    parser.add_argument("--results_file", default=os.path.join(REPO_DIR, RESULTS_FILE))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--bound_scale", type=float, default=1.0, help="Multiply every bound (slow machines).")
+    parser.add_argument("--json", help="Also write the timings to this file.")
+    args = parser.parse_args()
+
+    for key, value in HARNESS_ENV.items():
+        os.environ.setdefault(key, value)
+    timings = run_reruns(args.results_file, args.repeats)
+    print(f"{'Rerun type':<18} {'Median':>8} {'Bound':>8}")
+    for rerun_type, seconds in timings.items():
+        print(f"{rerun_type:<18} {seconds * 1000:>6.0f}ms {BOUNDS[rerun_type] * args.bound_scale * 1000:>6.0f}ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(timings, f, indent=2)
+    failures = check(timings, scale=args.bound_scale)
+    for failure in failures:
+        print(f"OVER BOUND {failure}")
+    sys.exit(1 if failures else 0)
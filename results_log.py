@@ -0,0 +1,182 @@
+import argparse
+import csv
+import fcntl
+import os
+
+import pandas as pd
+
+RESULTS_FILE = "arena_results.csv"
+
+# --- SCHEMA ---
+# Every row of a version >= 2 file records the schema version it was written with. Older files are
+# migrated in place (atomically) the first time a newer row is appended; readers accept any version.
+SCHEMA_VERSION = 4
+
+VOTE_COLUMNS = [
+    "Timestamp",
+    "Language",
+    "Prompt",
+    "Model_A_Name",
+    "Model_B_Name",
+    "Output_A",
+    "Output_B",
+    "Swapped",
+    "Winner_Position",
+    "Winner_Source",
+]
+SETTINGS_COLUMNS = ["Min_New_Tokens", "Max_New_Tokens", "Temperature", "Repetition_Penalty"]
+# Per-generation metrics record field -> column stem; stored once per side as e.g. "Decode_s_A"
+METRIC_COLUMNS = {
+    "cached": "Cached",
+    "load_s": "Load_s",
+    "queue_wait_s": "Queue_Wait_s",
+    "prefill_s": "Prefill_s",
+    "decode_s": "Decode_s",
+    "prompt_tokens": "Prompt_Tokens",
+    "new_tokens": "New_Tokens",
+    "stop_reason": "Stop_Reason",
+    "worker": "Worker",
+    "shared": "Shared",
+    "pooled": "Pooled",
+}
+# Version 2 added the settings and the metrics up to "shared"; version 3 added "pooled"
+# (the output was pre-generated by the matchup pool, so the user did not wait for it)
+_V2_STEMS = list(METRIC_COLUMNS.values())[: list(METRIC_COLUMNS).index("shared") + 1]
+
+SCHEMAS = {
+    1: VOTE_COLUMNS,
+    2: VOTE_COLUMNS
+    + ["Schema_Version"]
+    + SETTINGS_COLUMNS
+    + [f"{stem}_{side}" for side in ("A", "B") for stem in _V2_STEMS],
+}
+SCHEMAS[3] = SCHEMAS[2] + ["Pooled_A", "Pooled_B"]
+# Version 4: the max_new_tokens the user asked for. Max_New_Tokens is the budget the round was
+# generated with, which the token budget (see budget.py) may have lowered under load.
+SCHEMAS[4] = SCHEMAS[3] + ["Requested_Max_New_Tokens"]
+
+
+def _migrate_1_to_2(df):
+    df["Schema_Version"] = 1
+    return df
+
+
+def _migrate_2_to_3(df):
+    # Rows from before the pool existed were all generated live
+    df["Pooled_A"] = df["Pooled_B"] = ""
+    return df
+
+
+def _migrate_3_to_4(df):
+    # Budgets were never lowered before version 4
+    df["Requested_Max_New_Tokens"] = df.get("Max_New_Tokens", "")
+    return df
+
+
+MIGRATIONS = {1: _migrate_1_to_2, 2: _migrate_2_to_3, 3: _migrate_3_to_4}
+
+
+def schema_version(path=RESULTS_FILE):
+    """Schema version of an existing log, detected from its header. None if the file does not exist."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f))
+    for version, columns in SCHEMAS.items():
+        if header == columns:
+            return version
+    raise ValueError(f"{path} has an unknown header: {header}")
+
+
+def migrate(path=RESULTS_FILE):
+    """Upgrades the log to SCHEMA_VERSION. Returns the version it had before."""
+    version = schema_version(path)
+    if version is None or version == SCHEMA_VERSION:
+        return version
+    # Read everything as text so values that are not touched are written back byte for byte
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    for step in range(version, SCHEMA_VERSION):
+        df = MIGRATIONS[step](df)
+    df = df.reindex(columns=SCHEMAS[SCHEMA_VERSION], fill_value="")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # Same row terminator as the csv module, which appends the rows
+    df.to_csv(tmp_path, index=False, lineterminator="\r\n")
+    os.replace(tmp_path, path)
+    print(f"Migrated {path} from schema version {version} to {SCHEMA_VERSION}")
+    return version
+
+
+def vote_row(vote, settings, metrics_a, metrics_b):
+    """
+    Flattens a vote (the VOTE_COLUMNS values), the round's generation settings and both sides'
+    metrics records into one row of the current schema. Missing metrics are left empty.
+    `settings` holds the applied settings, plus "requested_max_new_tokens" if the budget was lowered.
+    """
+    row = dict(vote)
+    row["Schema_Version"] = SCHEMA_VERSION
+    row["Min_New_Tokens"] = settings.get("min_new_tokens")
+    row["Max_New_Tokens"] = settings.get("max_new_tokens")
+    row["Temperature"] = settings.get("temperature")
+    row["Repetition_Penalty"] = settings.get("repetition_penalty")
+    row["Requested_Max_New_Tokens"] = settings.get("requested_max_new_tokens", settings.get("max_new_tokens"))
+    for side, metrics in (("A", metrics_a), ("B", metrics_b)):
+        for field, stem in METRIC_COLUMNS.items():
+            value = (metrics or {}).get(field)
+            row[f"{stem}_{side}"] = round(value, 4) if isinstance(value, float) else value
+    return row
+
+
+def append_vote(row, path=RESULTS_FILE):
+    """
+    Appends one row (see vote_row) to the log, creating or migrating it first.
+    Writers in other threads or processes are serialized with a lock file.
+    """
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        migrate(path)
+        columns = SCHEMAS[SCHEMA_VERSION]
+        file_exists = os.path.exists(path) and os.path.getsize(path) > 0
+        with open(path, mode="a", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            if not file_exists:
+                writer.writerow(columns)
+            writer.writerow(["" if row.get(column) is None else row[column] for column in columns])
+
+
+def read_results(path=RESULTS_FILE):
+    """Reads a log of any schema version, with every current column present (empty where unknown)."""
+    df = pd.read_csv(path)
+    if "Schema_Version" not in df.columns:
+        df["Schema_Version"] = 1
+    return df.reindex(columns=SCHEMAS[SCHEMA_VERSION])
+
+
+def generation_metrics(df):
+    """
+    One row per logged generation (two per vote) with its model, language and metrics,
+    for votes that carry telemetry. total_s is everything the user waited for that side,
+    unless `pooled` is True: the side was pre-generated before the round and nobody waited for it.
+    """
+    sides = []
+    for side in ("A", "B"):
+        columns = {f"{stem}_{side}": field for field, stem in METRIC_COLUMNS.items()}
+        part = df[["Timestamp", "Language", f"Model_{side}_Name", *columns]].rename(
+            columns={f"Model_{side}_Name": "model", "Language": "language", **columns}
+        )
+        sides.append(part.assign(side=side))
+    generations = pd.concat(sides, ignore_index=True).dropna(subset=["decode_s"])
+    generations["pooled"] = generations["pooled"].astype(str).eq("True")
+    generations["total_s"] = generations[["load_s", "queue_wait_s", "prefill_s", "decode_s"]].fillna(0).sum(axis=1)
+    generations["ms_per_token"] = 1000 * generations["decode_s"] / generations["new_tokens"].where(
+        generations["new_tokens"] > 0
+    )
+    return generations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade the vote log to the current schema version.")
+    parser.add_argument("--results_file", type=str, default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    previous = migrate(args.results_file)
+    print(f"{args.results_file}: schema version {previous} -> {SCHEMA_VERSION}")
@@ -0,0 +1,80 @@
+import bisect
+import hashlib
+import math
+
+from config import ROUTER_LOAD_FACTOR
+
+
+def ring_hash(value):
+    """Stable across processes and restarts, unlike hash()."""
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class AffinityRouter:
+    """
+    Consistent hashing with bounded load: every model has a preference order over the workers
+    (walking a hash ring with `vnodes` points per worker), so each model keeps landing on the same
+    worker and each worker only ever holds its own share of the checkpoints. A worker join or leave
+    only moves the models whose ring positions it takes over or gave up.
+    No worker takes more than ceil(load_factor * average load) requests (running plus queued); past
+    that, requests spill over to the next worker in the model's preference order.
+    """
+
+    def __init__(self, workers=(), load_factor=ROUTER_LOAD_FACTOR, vnodes=64):
+        if load_factor <= 1:
+            raise ValueError("load_factor must be above 1.")
+        self.load_factor = load_factor
+        self.vnodes = vnodes
+        self._ring = []  # sorted (point, worker)
+        for worker in workers:
+            self.add(worker)
+
+    @property
+    def workers(self):
+        return sorted({worker for _, worker in self._ring})
+
+    def add(self, worker):
+        for vnode in range(self.vnodes):
+            bisect.insort(self._ring, (ring_hash(f"{worker}#{vnode}"), worker))
+
+    def remove(self, worker):
+        self._ring = [(point, w) for point, w in self._ring if w != worker]
+
+    def preference(self, key):
+        """All workers, in the order `key` prefers them: clockwise from its point on the ring."""
+        start = bisect.bisect(self._ring, (ring_hash(key),))
+        order = []
+        for i in range(len(self._ring)):
+            worker = self._ring[(start + i) % len(self._ring)][1]
+            if worker not in order:
+                order.append(worker)
+        return order
+
+    def capacity(self, total_load):
+        """Most requests one worker may hold once a new request joins `total_load` others."""
+        return math.ceil(self.load_factor * (total_load + 1) / len(self.workers))
+
+    def choose(self, key, loads, resident=None, full=(), avoid=()):
+        """
+        Picks a worker for `key`. `loads` maps each worker to its running plus queued requests,
+        `resident` to the keys it has loaded and `full` lists the workers that would evict one to load
+        another. A worker with the key resident wins, then (for a cold load) an idle one, one with a
+        free slot and finally the preference order. Workers in `avoid` come last of all. Returns
+        (worker, spilled): whether the best choice was over capacity.
+        """
+        if not self._ring:
+            raise ValueError("No workers to route to.")
+        resident = resident or {}
+        order = self.preference(key)
+        rank = {worker: i for i, worker in enumerate(order)}
+
+        def cost(worker):
+            warm = key in resident.get(worker, ())
+            cold_busy = not warm and loads.get(worker, 0) > 0
+            return worker in avoid, not warm, cold_busy, not warm and worker in full, rank[worker]
+
+        candidates = sorted(order, key=cost)
+        cap = self.capacity(sum(loads.get(worker, 0) for worker in order))
+        # Some worker is always under capacity: the least loaded one is at most the average
+        chosen = next(worker for worker in candidates if loads.get(worker, 0) < cap)
+        return chosen, chosen != candidates[0]
@@ -0,0 +1,139 @@
+import math
+
+import numpy as np
+import pandas as pd
+import torch
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+from config import EXAMPLE_PROMPTS
+
+# Outputs starting with these markers are failed generations, not model text
+ERROR_MARKERS = ("Slurm Error:", "Error generating text:")
+
+
+def strip_prompt(prompt, output):
+    """Returns only the model's continuation, or "" for failed or empty generations."""
+    if not isinstance(output, str) or output.startswith(ERROR_MARKERS):
+        return ""
+    if isinstance(prompt, str) and output.startswith(prompt):
+        output = output[len(prompt):]
+    return output.strip()
+
+
+def load_reference_model(model_name, device="cpu"):
+    """Loads a causal LM + tokenizer for perplexity scoring (right padding, eval mode)."""
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+    if tokenizer.pad_token_id is None:
+        tokenizer.pad_token_id = tokenizer.eos_token_id
+    tokenizer.padding_side = "right"
+
+    model = AutoModelForCausalLM.from_pretrained(model_name, dtype=torch.float32, trust_remote_code=True)
+    model.to(device).eval()
+    return model, tokenizer
+
+
+@torch.inference_mode()
+def batch_perplexity(model, tokenizer, texts, batch_size=32, max_length=512):
+    """
+    Per-text perplexity, computed in padded batches.
+    Texts are sorted by length first so each batch pads to a similar length; results come back
+    in input order. Empty texts get NaN.
+    """
+    scores = np.full(len(texts), np.nan)
+    order = sorted((i for i, t in enumerate(texts) if t), key=lambda i: len(texts[i]))
+
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        enc = tokenizer(
+            [texts[i] for i in idx], return_tensors="pt", padding=True, truncation=True, max_length=max_length
+        ).to(model.device)
+        logits = model(**enc).logits[:, :-1].float()
+        targets = enc["input_ids"][:, 1:]
+        mask = enc["attention_mask"][:, 1:].float()
+
+        nll = torch.nn.functional.cross_entropy(logits.transpose(1, 2), targets, reduction="none")
+        token_counts = mask.sum(dim=1)
+        mean_nll = (nll * mask).sum(dim=1) / token_counts.clamp(min=1)
+        for i, value, count in zip(idx, mean_nll.tolist(), token_counts.tolist()):
+            scores[i] = math.exp(value) if count > 0 else np.nan
+
+    return scores
+
+
+class CharNgramLanguageID:
+    """
+    Character n-gram language identifier.
+    Each language is a normalized centroid of hashed char n-gram counts; a batch of texts is
+    scored against all centroids with a single sparse matrix product.
+    """
+
+    def __init__(self, ngram_range=(1, 3), n_features=2**18):
+        self.vectorizer = HashingVectorizer(
+            analyzer="char_wb", ngram_range=ngram_range, n_features=n_features, alternate_sign=False, norm="l2"
+        )
+        self.languages = []
+        self.centroids = None
+
+    def fit(self, texts, languages):
+        """Builds one centroid per language from labelled example texts."""
+        frame = pd.DataFrame({"text": texts, "language": languages}).dropna()
+        frame = frame[frame["text"].str.len() > 0]
+        X = self.vectorizer.transform(frame["text"].str.lower())
+
+        self.languages = sorted(frame["language"].unique())
+        rows = []
+        for lang in self.languages:
+            rows.append(np.asarray(X[(frame["language"] == lang).to_numpy()].mean(axis=0)).ravel())
+        self.centroids = normalize(np.vstack(rows))
+        return self
+
+    def scores(self, texts):
+        """Cosine similarity of each text to each language centroid, shape (n_texts, n_languages)."""
+        X = self.vectorizer.transform([t.lower() if isinstance(t, str) else "" for t in texts])
+        return np.asarray(X @ self.centroids.T)
+
+    def score_expected(self, texts, expected_languages):
+        """
+        Returns (similarity to the expected language, predicted language) for each text.
+        Empty texts score NaN; unknown expected languages score NaN.
+        """
+        sims = self.scores(texts)
+        lang_index = {lang: i for i, lang in enumerate(self.languages)}
+        expected = np.full(len(texts), np.nan)
+        for row, (text, lang) in enumerate(zip(texts, expected_languages)):
+            if text and lang in lang_index:
+                expected[row] = sims[row, lang_index[lang]]
+        predicted = [self.languages[i] if text else "" for i, text in zip(sims.argmax(axis=1), texts)]
+        return expected, predicted
+
+
+def fit_language_id(results):
+    """
+    Fits the language identifier on the human-written prompts in the results log plus EXAMPLE_PROMPTS.
+    Raters type prompts in the language they selected, so they are labelled data for free.
+    """
+    texts = list(results["Prompt"]) + [p for prompts in EXAMPLE_PROMPTS.values() for p in prompts]
+    languages = list(results["Language"]) + [lang for lang, prompts in EXAMPLE_PROMPTS.items() for _ in prompts]
+    return CharNgramLanguageID().fit(texts, languages)
+
+
+def metric_agreement(scores, metric, higher_is_better):
+    """
+    How often a metric prefers the same side as the human vote (ties and missing scores excluded).
+    `scores` needs Winner_Source plus `<metric>_A` (MultiSynt) and `<metric>_B` (HPLT) columns.
+    """
+    decided = scores[scores["Winner_Source"].isin(["MultiSynt", "HPLT"])]
+    decided = decided.dropna(subset=[f"{metric}_A", f"{metric}_B"])
+    decided = decided[decided[f"{metric}_A"] != decided[f"{metric}_B"]]
+    if decided.empty:
+        return {"metric": metric, "votes": 0, "agreement": np.nan}
+
+    a_better = decided[f"{metric}_A"] > decided[f"{metric}_B"]
+    if not higher_is_better:
+        a_better = ~a_better
+    metric_pick = np.where(a_better, "MultiSynt", "HPLT")
+    agreement = float((metric_pick == decided["Winner_Source"].to_numpy()).mean())
+    return {"metric": metric, "votes": len(decided), "agreement": agreement}
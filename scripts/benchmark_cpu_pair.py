@@ -0,0 +1,76 @@
+import argparse
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EXAMPLE_PROMPTS
+from cpu_affinity import apply_cpu_partition, format_cpulist, partition_cores
+from tiny_model import build_tiny_model
+
+
+def worker(model_name, prompts, new_tokens, cores, barrier, results):
+    """Loads one model, then generates each prompt in lock-step with the other worker."""
+    if cores:
+        apply_cpu_partition(cores)
+
+    from backend import generate_text, get_pipeline
+
+    pipe = get_pipeline(model_name, 0)
+    timings = []
+    for prompt in prompts:
+        barrier.wait()
+        start = time.perf_counter()
+        generate_text(pipe, prompt, min_new_tokens=new_tokens, max_new_tokens=new_tokens)
+        timings.append(time.perf_counter() - start)
+    results.put(timings)
+
+
+def run_pair(model_a, model_b, prompts, new_tokens, partitions):
+    """Runs A and B side by side and returns the per-round pair latency (slower of the two)."""
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(2)
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(target=worker, args=(model, prompts, new_tokens, cores, barrier, results))
+        for model, cores in zip((model_a, model_b), partitions)
+    ]
+    for p in workers:
+        p.start()
+    timings_a, timings_b = results.get(), results.get()
+    for p in workers:
+        p.join()
+    return [max(a, b) for a, b in zip(timings_a, timings_b)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pair latency with partitioned vs uncoordinated CPU workers.")
+    parser.add_argument("--model_a", type=str, help="Defaults to a locally built tiny model.")
+    parser.add_argument("--model_b", type=str, help="Defaults to --model_a.")
+    parser.add_argument("--language", type=str, default="Swedish")
+    parser.add_argument("--new_tokens", type=int, default=112)
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the example prompts.")
+    args = parser.parse_args()
+
+    model_a = args.model_a or build_tiny_model()
+    model_b = args.model_b or model_a
+    prompts = EXAMPLE_PROMPTS[args.language] * args.rounds
+
+    try:
+        partitions = partition_cores(2)
+    except ValueError as e:
+        sys.exit(f"{e} The partitioned mode needs at least two cores.")
+
+    print(f"Core partitions: A={format_cpulist(partitions[0])} B={format_cpulist(partitions[1])}")
+
+    results = {
+        "default": run_pair(model_a, model_b, prompts, args.new_tokens, (None, None)),
+        "partitioned": run_pair(model_a, model_b, prompts, args.new_tokens, partitions),
+    }
+
+    print(f"\n{'mode':<12} {'p50 pair (s)':>14} {'max pair (s)':>14}")
+    for label, latencies in results.items():
+        print(f"{label:<12} {statistics.median(latencies):>14.3f} {max(latencies):>14.3f}")
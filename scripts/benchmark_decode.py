@@ -0,0 +1,73 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+
+from backend import generate_text, get_pipeline
+from config import EXAMPLE_PROMPTS
+from tiny_model import build_tiny_model
+
+
+def time_generation(pipe, prompt, new_tokens, repeats):
+    """Median wall time of generating exactly `new_tokens` tokens."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        generate_text(pipe, prompt, min_new_tokens=new_tokens, max_new_tokens=new_tokens)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def benchmark_mode(model_name, fast_decode, prompts, new_tokens, repeats):
+    load_start = time.perf_counter()
+    pipe = get_pipeline(model_name, 0, fast_decode=fast_decode)
+    load_time = time.perf_counter() - load_start
+
+    prefill, per_token = [], []
+    for prompt in prompts:
+        # Decode latency is the marginal cost of the extra tokens on top of prefill + first token
+        first = time_generation(pipe, prompt, 1, repeats)
+        full = time_generation(pipe, prompt, new_tokens, repeats)
+        prefill.append(first)
+        per_token.append((full - first) / (new_tokens - 1))
+
+    del pipe
+    return {
+        "load_s": load_time,
+        "first_token_ms": statistics.median(prefill) * 1000,
+        "per_token_ms": statistics.median(per_token) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-token decode latency with and without fast decode.")
+    parser.add_argument("--model_name", type=str, help="Model to benchmark. Defaults to a locally built tiny model.")
+    parser.add_argument("--language", type=str, default="Swedish", help="Language of the example prompts to use.")
+    parser.add_argument("--new_tokens", type=int, default=112)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, help="torch intra-op threads (defaults to torch's choice).")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    model_name = args.model_name or build_tiny_model()
+    prompts = EXAMPLE_PROMPTS[args.language]
+
+    results = {}
+    for fast_decode in (False, True):
+        label = "fast_decode" if fast_decode else "eager"
+        print(f"\n--- Benchmarking {label} on {model_name} (CPU threads: {torch.get_num_threads()}) ---")
+        results[label] = benchmark_mode(model_name, fast_decode, prompts, args.new_tokens, args.repeats)
+
+    print(f"\n{'mode':<12} {'load (s)':>10} {'first token (ms)':>18} {'per token (ms)':>16}")
+    for label, res in results.items():
+        print(f"{label:<12} {res['load_s']:>10.2f} {res['first_token_ms']:>18.2f} {res['per_token_ms']:>16.3f}")
+
+    speedup = results["eager"]["per_token_ms"] / results["fast_decode"]["per_token_ms"]
+    print(f"\nPer-token speedup with fast decode: {speedup:.2f}x")
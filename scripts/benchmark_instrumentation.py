@@ -0,0 +1,78 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profiling
+from metrics import observe_generation
+from profiling import SlowestProfiles
+
+RESULT = (0, "text", "", {"cached": True, "new_tokens": 64, "decode_s": 1.0})
+
+
+def per_call_us(fn, calls, repeats=5):
+    """Median microseconds per call of `fn` over `repeats` runs of `calls` calls."""
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        runs.append((time.perf_counter() - start) / calls * 1e6)
+    return statistics.median(runs)
+
+
+def generate():
+    return RESULT
+
+
+def instrumented():
+    return observe_generation("benchmark-model", generate)
+
+
+def profiled():
+    with profiling.profile_generation("benchmark-model"):
+        return generate()
+
+
+def generation_seconds(pipe, repeats):
+    from backend import generate_with_metrics
+
+    params = {"max_new_tokens": 32, "min_new_tokens": 32}
+    generate_with_metrics(pipe, "Hej", **params)
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        generate_with_metrics(pipe, "Hej", **params)
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Overhead of the metrics and profiling hooks on the generation path.")
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--generations", type=int, default=10, help="Tiny model generations per profiler setting.")
+    args = parser.parse_args()
+
+    bare = per_call_us(generate, args.calls)
+    metrics_us = per_call_us(instrumented, args.calls) - bare
+    profiling.PROFILER = SlowestProfiles(keep=0)
+    disabled_us = per_call_us(profiled, args.calls) - bare
+    print(f"Bare call:                    {bare:8.3f} us")
+    print(f"Metrics (observe_generation): {metrics_us:+8.3f} us per generation")
+    print(f"Profiler hook, disabled:      {disabled_us:+8.3f} us per generation")
+
+    from backend import get_pipeline
+    from tiny_model import build_tiny_model
+
+    pipe = get_pipeline(build_tiny_model(os.path.join(".cache", "tiny-arena-model")), 0)
+    off = generation_seconds(pipe, args.generations)
+    with tempfile.TemporaryDirectory() as directory:
+        profiling.PROFILER = SlowestProfiles(keep=3, directory=directory)
+        on = generation_seconds(pipe, args.generations)
+    print(f"\nTiny model generation, profiling off: {off * 1000:8.2f} ms")
+    print(f"Tiny model generation, profiling on:  {on * 1000:8.2f} ms ({(on / off - 1):+.1%})")
+    print(f"Hooks with profiling off cost {(metrics_us + disabled_us) / (off * 1e6):.4%} of a generation")
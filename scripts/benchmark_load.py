@@ -0,0 +1,66 @@
+import argparse
+import multiprocessing as mp
+import os
+import statistics
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+
+from tiny_model import build_tiny_model
+
+MODES = ("standard", "fast_load")
+
+
+def load_once(model_name, fast_load, results):
+    """Loads the model in a fresh process, so every run pays the same imports and cold caches."""
+    from backend import get_load_timings, get_pipeline
+
+    pipe = get_pipeline(model_name, 0, fast_load=fast_load)
+    results.put(get_load_timings(pipe))
+
+
+def benchmark_mode(model_name, fast_load, repeats):
+    """Median seconds per load phase over `repeats` fresh-process loads."""
+    ctx = mp.get_context("spawn")
+    runs = []
+    for _ in range(repeats):
+        results = ctx.Queue()
+        process = ctx.Process(target=load_once, args=(model_name, fast_load, results))
+        process.start()
+        runs.append(results.get())
+        process.join()
+
+    phases = list(dict.fromkeys(phase for run in runs for phase in run))
+    summary = {phase: statistics.median(run.get(phase, 0.0) for run in runs) for phase in phases}
+    summary["total"] = statistics.median(sum(run.values()) for run in runs)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Break model load time into phases, standard vs. fast load.")
+    parser.add_argument(
+        "--model_name",
+        type=str,
+        help="Model to benchmark. Defaults to a locally built ~80M parameter bfloat16 model.",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    model_name = args.model_name or build_tiny_model(
+        os.path.join(".cache", "medium-arena-model"), hidden_size=1024, num_layers=8, dtype=torch.bfloat16
+    )
+
+    results = {}
+    for mode in MODES:
+        print(f"\n--- Loading {model_name} ({mode}, {args.repeats} fresh processes) ---")
+        results[mode] = benchmark_mode(model_name, mode == "fast_load", args.repeats)
+
+    for mode, summary in results.items():
+        print(f"\n{mode}:")
+        for phase, seconds in summary.items():
+            print(f"  {phase:<16} {seconds:>8.3f}s")
+
+    speedup = results["standard"]["total"] / results["fast_load"]["total"]
+    print(f"\nLoad speedup with fast load: {speedup:.2f}x")
@@ -1,90 +1,196 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
 
 RESULTS_FILE = "arena_results.csv"
 ASSETS_DIR = "assets"
+# Hash of each plot's input data (and of the results file's size and mtime), to skip unchanged plots
+MANIFEST_FILE = ".plot_inputs.json"
+# Bump a plot's version when its rendering code changes, so it is re-rendered even if its data did not
+PLOT_VERSIONS = {
+    "win_rate_by_language": 1,
+    "votes_over_time": 1,
+    "votes_count_by_language": 1,
+}
 
-def generate_plots():
-    if not os.path.exists(RESULTS_FILE):
-        print(f"Error: {RESULTS_FILE} not found.")
-        return
 
-    df = pd.read_csv(RESULTS_FILE)
-    if df.empty:
-        print("Error: Dataset is empty.")
-        return
+def compute_aggregates(df):
+    """
+    Every plot's input from a single grouping of the votes by language, day and winner:
+    win-rate percentages per language, votes per day and votes per language.
+    """
+    df = df.assign(Date=pd.to_datetime(df["Timestamp"], errors="coerce").dt.date)
+    counts = df.groupby(["Language", "Date", "Winner_Source"], dropna=False).size()
 
-    # Ensure assets directory exists
-    os.makedirs(ASSETS_DIR, exist_ok=True)
-    
-    # Set style
-    sns.set_theme(style="whitegrid")
-    
-    # --- Plot 1: Win Rate by Language ---
-    print("Generating Win Rate by Language plot...")
-    plt.figure(figsize=(10, 6))
-    
-    # Filter for valid wins (excluding ties for win rate, or include them if preferred to match app)
-    # The app code: lang_groups = df.groupby(["Language", "Winner_Source"]).size().unstack(fill_value=0)
-    # It includes Ties. Let's do the same to match the app.
-    
-    lang_groups = df.groupby(["Language", "Winner_Source"]).size().unstack(fill_value=0)
-    # Calculate percentages
+    lang_groups = counts.groupby(level=["Language", "Winner_Source"], dropna=True).sum().unstack(fill_value=0)
     lang_pct = lang_groups.div(lang_groups.sum(axis=1), axis=0) * 100
-    
-    # Plotting
-    ax = lang_pct.plot(kind='bar', stacked=True, figsize=(10, 6), colormap='viridis')
+    daily_counts = counts.groupby(level="Date", dropna=True).sum()
+    vote_counts = counts.groupby(level="Language").sum().sort_values(ascending=True, kind="stable")
+    return {
+        "win_rate_by_language": lang_pct,
+        "votes_over_time": daily_counts,
+        "votes_count_by_language": vote_counts,
+    }
+
+
+def input_hash(name, data):
+    return hashlib.sha256(f"{name}:{PLOT_VERSIONS[name]}\n{data.to_csv()}".encode()).hexdigest()
+
+
+def _save(plt, path):
+    # Write next to the target and rename, so the README never shows a half-written image
+    tmp_path = f"{path}.{os.getpid()}.tmp.png"
+    plt.tight_layout()
+    plt.savefig(tmp_path, dpi=300)
+    plt.close("all")
+    os.replace(tmp_path, path)
+
+
+def plot_win_rate_by_language(plt, lang_pct, path):
+    lang_pct.plot(kind="bar", stacked=True, figsize=(10, 6), colormap="viridis")
     plt.title("Win Rate by Language")
     plt.ylabel("Percentage")
     plt.xlabel("Language")
-    plt.legend(title="Winner", bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(os.path.join(ASSETS_DIR, "win_rate_by_language.png"), dpi=300)
-    plt.close()
-    
-    # --- Plot 2: Votes Over Time ---
-    print("Generating Votes Over Time plot...")
+    plt.legend(title="Winner", bbox_to_anchor=(1.05, 1), loc="upper left")
+    _save(plt, path)
+
+
+def plot_votes_over_time(plt, daily_counts, path):
     plt.figure(figsize=(12, 6))
-    
-    try:
-        df["Timestamp"] = pd.to_datetime(df["Timestamp"])
-        df["Date"] = df["Timestamp"].dt.date
-        daily_counts = df.groupby("Date").size()
-        
-        daily_counts.plot(kind='line', marker='o', linestyle='-', color='b')
-        plt.title("Votes Over Time")
-        plt.ylabel("Number of Votes")
-        plt.xlabel("Date")
-        plt.grid(True)
-        plt.tight_layout()
-        plt.savefig(os.path.join(ASSETS_DIR, "votes_over_time.png"), dpi=300)
-        plt.close()
-    except Exception as e:
-        print(f"Error generating time series plot: {e}")
-
-    # --- Plot 3: Total Votes by Language ---
-    print("Generating Total Votes by Language plot...")
-    plt.figure(figsize=(10, 6))
+    daily_counts.plot(kind="line", marker="o", linestyle="-", color="b")
+    plt.title("Votes Over Time")
+    plt.ylabel("Number of Votes")
+    plt.xlabel("Date")
+    plt.grid(True)
+    _save(plt, path)
+
 
-    vote_counts = df["Language"].value_counts().sort_values(ascending=True)
-    
-    # Plotting
-    ax = vote_counts.plot(kind='barh', color='skyblue')
+def plot_votes_count_by_language(plt, vote_counts, path):
+    plt.figure(figsize=(10, 6))
+    ax = vote_counts.plot(kind="barh", color="skyblue")
     plt.title("Total Votes by Language")
     plt.xlabel("Number of Votes")
     plt.ylabel("Language")
-    
+
     # Add count labels to the end of each bar
     for i, v in enumerate(vote_counts):
-        ax.text(v, i, " " + str(v), color='black', va='center')
+        ax.text(v, i, " " + str(v), color="black", va="center")
+    _save(plt, path)
 
-    plt.tight_layout()
-    plt.savefig(os.path.join(ASSETS_DIR, "votes_count_by_language.png"), dpi=300)
-    plt.close()
 
-    print("Plots generated successfully in 'assets/' directory.")
+PLOTS = {
+    "win_rate_by_language": plot_win_rate_by_language,
+    "votes_over_time": plot_votes_over_time,
+    "votes_count_by_language": plot_votes_count_by_language,
+}
+
+
+def render(name, data, path):
+    """
+    Renders one plot (in a worker process). Plotting libraries are only imported here,
+    so runs that find nothing to render (e.g. from cron) stay cheap.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")  # headless: no display in worker processes
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_theme(style="whitegrid")
+    PLOTS[name](plt, data, path)
+    return name
+
+
+def _load_manifest(assets_dir):
+    path = os.path.join(assets_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(assets_dir, manifest):
+    path = os.path.join(assets_dir, MANIFEST_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def generate_plots(results_file=RESULTS_FILE, assets_dir=ASSETS_DIR, force=False, max_workers=None, quiet=False):
+    """
+    Re-renders the plots whose input data changed since the last run, in parallel worker processes.
+    Returns the names of the rendered plots. With `quiet`, an untouched results file is not reported.
+    """
+    if not os.path.exists(results_file):
+        print(f"Error: {results_file} not found.")
+        return []
+
+    os.makedirs(assets_dir, exist_ok=True)
+    manifest = _load_manifest(assets_dir)
+    stat = os.stat(results_file)
+    source = {"path": os.path.abspath(results_file), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    outputs = {name: os.path.join(assets_dir, f"{name}.png") for name in PLOTS}
+    all_rendered = all(os.path.exists(path) for path in outputs.values())
+    # Cheapest path (cron/watch): the results file was not touched since the last run
+    if not force and all_rendered and manifest.get("source") == source and manifest.get("versions") == PLOT_VERSIONS:
+        if not quiet:
+            print("Results unchanged; plots are up to date.")
+        return []
+
+    df = pd.read_csv(results_file, usecols=["Timestamp", "Language", "Winner_Source"])
+    if df.empty:
+        print("Error: Dataset is empty.")
+        return []
+
+    aggregates = compute_aggregates(df)
+    hashes = {name: input_hash(name, data) for name, data in aggregates.items()}
+    stale = [
+        name
+        for name in PLOTS
+        if force or not os.path.exists(outputs[name]) or manifest.get("inputs", {}).get(name) != hashes[name]
+    ]
+    for name in PLOTS:
+        if name not in stale:
+            print(f"Skipping {name}: inputs unchanged.")
+
+    rendered = []
+    if stale:
+        workers = max_workers or min(len(stale), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+            futures = [pool.submit(render, name, aggregates[name], outputs[name]) for name in stale]
+            for future in futures:
+                rendered.append(future.result())
+                print(f"Rendered {rendered[-1]}.")
+
+    _save_manifest(assets_dir, {"source": source, "inputs": hashes, "versions": PLOT_VERSIONS})
+    print(f"Plots in '{assets_dir}/' are up to date ({len(rendered)} rendered, {len(PLOTS) - len(rendered)} skipped).")
+    return rendered
+
+
+def watch(results_file, assets_dir, interval, max_workers=None):
+    """Refreshes the plots whenever the results file changes, checking every `interval` seconds."""
+    print(f"Watching {results_file} every {interval:.0f}s (Ctrl+C to stop)...")
+    while True:
+        generate_plots(results_file, assets_dir, max_workers=max_workers, quiet=True)
+        time.sleep(interval)
+
 
 if __name__ == "__main__":
-    generate_plots()
+    parser = argparse.ArgumentParser(description="Render the README plots whose input data changed.")
+    parser.add_argument("--results_file", type=str, default=RESULTS_FILE)
+    parser.add_argument("--assets_dir", type=str, default=ASSETS_DIR)
+    parser.add_argument("--force", action="store_true", help="Re-render every plot.")
+    parser.add_argument("--workers", type=int, help="Render processes (default: one per stale plot, up to the CPUs).")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="Keep running, refreshing on changes.")
+    args = parser.parse_args()
+
+    if args.watch:
+        watch(args.results_file, args.assets_dir, args.watch, args.workers)
+    else:
+        generate_plots(args.results_file, args.assets_dir, force=args.force, max_workers=args.workers)
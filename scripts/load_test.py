@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from loadgen import ARRIVAL_MODES, FakeExecutor, arrival_times, load_replay_requests, repeat_requests, run_load_test
+
+RESULTS_FILE = "arena_results.csv"
+
+
+def build_executor(args):
+    if args.backend == "fake":
+        return FakeExecutor(
+            base_latency_s=args.fake_base_latency,
+            tokens_per_s=args.fake_tokens_per_s,
+            cold_load_s=args.fake_cold_load,
+            warm_capacity=args.fake_warm_capacity,
+            slots=args.fake_slots,
+            error_rate=args.fake_error_rate,
+            time_scale=args.time_scale,
+            rng=random.Random(args.seed),
+        )
+    from executors import create_executor
+
+    return create_executor(args.backend)
+
+
+def print_report(report):
+    print(f"\nRounds:           {report['rounds']} in {report['duration_s']:.1f}s")
+    print(f"Throughput:       {report['throughput_rps']:.3f} rounds/s")
+    for key in ("p50_s", "p95_s", "p99_s"):
+        value = report[key]
+        print(f"Latency {key[:-2]:<8}  {value:.2f}s" if value is not None else f"Latency {key[:-2]:<8}  -")
+    print(f"Error rate:       {report['error_rate']:.1%}")
+    print(f"Max queue depth:  {report['max_queue_depth']}")
+    print(f"Executor:         {report['executor']}")
+
+    print("\nQueue depth over time (rounds in flight):")
+    samples = report["queue_depth"]
+    step = max(1, len(samples) // 20)
+    for t, depth in samples[::step]:
+        print(f"  {t:>8.1f}s {depth:>4} {'#' * depth}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay logged arena rounds against the serving path.")
+    parser.add_argument("--results_file", type=str, default=RESULTS_FILE)
+    parser.add_argument("--arrivals", choices=ARRIVAL_MODES, default="poisson")
+    parser.add_argument("--rate", type=float, default=0.5, help="Rounds per second (constant/poisson).")
+    parser.add_argument("--speedup", type=float, default=60.0, help="Historical replay: compress time this much.")
+    parser.add_argument("--max_gap", type=float, default=30.0, help="Historical replay: cap idle gaps (s).")
+    parser.add_argument("--rounds", type=int, default=100, help="Number of rounds to replay.")
+    parser.add_argument(
+        "--backend",
+        default="fake",
+        help="'fake' for the latency model, or an execution mode (slurm, srun, cpu, local, inprocess).",
+    )
+    parser.add_argument("--model", type=str, help="Serve every round with this model (e.g. a tiny local one).")
+    parser.add_argument("--max_concurrency", type=int, default=64, help="Rounds generating at once (app threads).")
+    parser.add_argument("--time_scale", type=float, default=1.0, help="Fake backend only: run N times faster.")
+    parser.add_argument("--fake_base_latency", type=float, default=0.5)
+    parser.add_argument("--fake_tokens_per_s", type=float, default=25.0)
+    parser.add_argument("--fake_cold_load", type=float, default=20.0)
+    parser.add_argument("--fake_warm_capacity", type=int, default=4, help="Models kept warm by the fake backend.")
+    parser.add_argument("--fake_slots", type=int, default=2, help="Generations the fake backend runs at once.")
+    parser.add_argument("--fake_error_rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, help="Also write the full report as JSON.")
+    args = parser.parse_args()
+
+    if args.backend != "fake" and args.time_scale != 1.0:
+        parser.error("--time_scale only applies to the fake backend")
+
+    requests = repeat_requests(load_replay_requests(pd.read_csv(args.results_file)), args.rounds)
+    if args.model:
+        requests = [{**r, "model_a": args.model, "model_b": args.model} for r in requests]
+    offsets = arrival_times(
+        args.arrivals,
+        len(requests),
+        rate=args.rate,
+        timestamps=[r["timestamp"] for r in requests],
+        speedup=args.speedup,
+        max_gap=args.max_gap,
+        rng=random.Random(args.seed),
+    )
+
+    executor = build_executor(args)
+    print(f"Replaying {len(requests)} rounds ({args.arrivals}) against {args.backend} backend...")
+    try:
+        report = run_load_test(executor, requests, offsets, args.max_concurrency, time_scale=args.time_scale)
+    finally:
+        executor.shutdown()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
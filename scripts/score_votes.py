@@ -0,0 +1,110 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import torch
+
+from scoring import batch_perplexity, fit_language_id, load_reference_model, metric_agreement, strip_prompt
+
+RESULTS_FILE = "arena_results.csv"
+SCORES_FILE = "arena_scores.csv"
+# Not a contestant for any single language, so it does not favour either side of a pair
+DEFAULT_REFERENCE_MODEL = "MultiSynt/2B-1TT-native-mixture"
+
+SCORE_COLUMNS = ["Timestamp", "Language", "PPL_A", "PPL_B", "LangID_A", "LangID_B", "LangPred_A", "LangPred_B"]
+
+
+def already_scored(scores_file):
+    """Vote keys (Timestamps) that are already in the scores file, so reruns resume where they stopped."""
+    if not os.path.exists(scores_file):
+        return set()
+    return set(pd.read_csv(scores_file, usecols=["Timestamp"])["Timestamp"])
+
+
+def score_chunk(chunk, model, tokenizer, language_id, batch_size, max_length):
+    continuation_a = [strip_prompt(p, o) for p, o in zip(chunk["Prompt"], chunk["Output_A"])]
+    continuation_b = [strip_prompt(p, o) for p, o in zip(chunk["Prompt"], chunk["Output_B"])]
+
+    # Score both sides in one pass so batches are as full as possible
+    ppl = batch_perplexity(model, tokenizer, continuation_a + continuation_b, batch_size, max_length)
+    languages = list(chunk["Language"])
+    lang_a, pred_a = language_id.score_expected(continuation_a, languages)
+    lang_b, pred_b = language_id.score_expected(continuation_b, languages)
+
+    n = len(chunk)
+    return pd.DataFrame(
+        {
+            "Timestamp": chunk["Timestamp"].to_numpy(),
+            "Language": languages,
+            "PPL_A": ppl[:n],
+            "PPL_B": ppl[n:],
+            "LangID_A": lang_a,
+            "LangID_B": lang_b,
+            "LangPred_A": pred_a,
+            "LangPred_B": pred_b,
+        },
+        columns=SCORE_COLUMNS,
+    )
+
+
+def run_scoring(results_file, scores_file, model_name, chunk_size, batch_size, max_length):
+    done = already_scored(scores_file)
+    print(f"Resuming with {len(done)} vote(s) already scored.")
+
+    language_id = fit_language_id(pd.read_csv(results_file, usecols=["Language", "Prompt"]))
+    model, tokenizer = load_reference_model(model_name)
+
+    start = time.perf_counter()
+    scored = 0
+    for chunk in pd.read_csv(results_file, chunksize=chunk_size):
+        chunk = chunk[~chunk["Timestamp"].isin(done)]
+        if chunk.empty:
+            continue
+
+        scores = score_chunk(chunk, model, tokenizer, language_id, batch_size, max_length)
+        # Append after every chunk so an interrupted run loses at most one chunk of work
+        scores.to_csv(scores_file, mode="a", header=not os.path.exists(scores_file), index=False)
+        scored += len(scores)
+        rate = scored / (time.perf_counter() - start)
+        print(f"Scored {scored} vote(s) ({rate:.1f} votes/s)")
+
+    print(f"Scoring complete. Scores saved to {scores_file}")
+
+
+def report_agreement(results_file, scores_file):
+    votes = pd.read_csv(results_file, usecols=["Timestamp", "Winner_Source"])
+    scores = votes.merge(pd.read_csv(scores_file), on="Timestamp")
+
+    print("\n--- Agreement with human fluency votes (ties excluded) ---")
+    for metric, higher_is_better in (("PPL", False), ("LangID", True)):
+        res = metric_agreement(scores, metric, higher_is_better)
+        print(f"{res['metric']:<8} agrees on {res['agreement']:.1%} of {res['votes']} decided votes")
+
+    wrong = ((scores["LangPred_A"] != scores["Language"]) | (scores["LangPred_B"] != scores["Language"])).mean()
+    print(f"Votes where at least one output looks like another language: {wrong:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score logged arena outputs with perplexity and language ID.")
+    parser.add_argument("--results_file", type=str, default=RESULTS_FILE)
+    parser.add_argument("--scores_file", type=str, default=SCORES_FILE)
+    parser.add_argument("--model_name", type=str, default=DEFAULT_REFERENCE_MODEL, help="Reference model.")
+    parser.add_argument("--chunk_size", type=int, default=256, help="Votes read from the log per chunk.")
+    parser.add_argument("--batch_size", type=int, default=32, help="Texts per forward pass.")
+    parser.add_argument("--max_length", type=int, default=512, help="Tokens scored per text.")
+    parser.add_argument("--threads", type=int, help="torch intra-op threads (defaults to torch's choice).")
+    parser.add_argument("--report_only", action="store_true", help="Skip scoring and only print agreement.")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    if not args.report_only:
+        run_scoring(
+            args.results_file, args.scores_file, args.model_name, args.chunk_size, args.batch_size, args.max_length
+        )
+    report_agreement(args.results_file, args.scores_file)
@@ -0,0 +1,82 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from config import MODELS_DB
+from matchmaking import STRATEGIES, MatchupScheduler
+
+RESULTS_FILE = "arena_results.csv"
+TIE_RATE = 0.18
+
+
+def language_traffic(results_file):
+    """Share of votes per language, from the log if available, otherwise uniform."""
+    if os.path.exists(results_file):
+        counts = pd.read_csv(results_file, usecols=["Language"])["Language"].value_counts()
+        counts = counts[counts.index.isin(MODELS_DB.keys())]
+        if not counts.empty:
+            return counts / counts.sum()
+    return pd.Series(1 / len(MODELS_DB), index=list(MODELS_DB.keys()))
+
+
+def simulate(strategy, traffic, target_width, max_votes, seed):
+    """
+    Replays votes with hidden true win rates until every pair is resolved.
+    Returns the number of votes needed, or None if max_votes ran out first.
+    """
+    rng = random.Random(seed)
+    # Hidden ground truth, drawn once per run and identical across strategies for the same seed. Its own
+    # stream: seeded like `rng`, it would replay the draws that pick languages and outcomes.
+    truth_rng = random.Random(seed + 1)
+    truth = {(lang, m): truth_rng.uniform(0.2, 0.8) for lang, e in MODELS_DB.items() for m in e["multisynt"]}
+
+    scheduler = MatchupScheduler(strategy=strategy, target_width=target_width, rng=rng)
+    languages, weights = list(traffic.index), list(traffic.values)
+
+    for vote in range(1, max_votes + 1):
+        language = rng.choices(languages, weights)[0]
+        model = scheduler.choose_multisynt(language)
+        draw = rng.random()
+        if draw < TIE_RATE:
+            winner = "Tie"
+        elif rng.random() < truth[(language, model)]:
+            winner = "MultiSynt"
+        else:
+            winner = "HPLT"
+        scheduler.update(language, model, winner)
+
+        # Only pairs in languages that receive traffic can ever be resolved
+        if all(scheduler.is_resolved(lang, m) for lang, m in truth if lang in languages):
+            return vote
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Votes needed to resolve every matchup, per scheduling strategy.")
+    parser.add_argument("--results_file", type=str, default=RESULTS_FILE, help="Source of the language mix.")
+    parser.add_argument("--target_width", type=float, default=0.2, help="95%% interval width that counts as resolved.")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--max_votes", type=int, default=200000)
+    args = parser.parse_args()
+
+    traffic = language_traffic(args.results_file)
+    print("Language mix: " + ", ".join(f"{lang} {share:.0%}" for lang, share in traffic.items()))
+
+    print(f"\n{'strategy':<12} {'median votes':>14} {'p90 votes':>12} {'unfinished':>11}")
+    baseline = None
+    for strategy in STRATEGIES:
+        needed = [simulate(strategy, traffic, args.target_width, args.max_votes, seed) for seed in range(args.runs)]
+        finished = sorted(n for n in needed if n is not None)
+        if not finished:
+            print(f"{strategy:<12} {'-':>14} {'-':>12} {len(needed):>11}")
+            continue
+        median = statistics.median(finished)
+        p90 = finished[int(0.9 * (len(finished) - 1))]
+        baseline = baseline or median
+        print(f"{strategy:<12} {median:>14.0f} {p90:>12} {len(needed) - len(finished):>11}   ({median / baseline:.2f}x uniform)")
@@ -0,0 +1,95 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget import TokenBudget
+from config import EXAMPLE_PROMPTS, MODELS_DB, ROUND_SLO_S, TOKEN_BUDGET_MIN_TOKENS
+from loadgen import FakeExecutor, arrival_times, run_load_test
+
+# max_new_tokens chosen by simulated users: mostly the default, some push the slider up
+REQUESTED_BUDGETS = [112] * 6 + [256] * 2 + [512] * 2
+
+
+def build_requests(n, rng):
+    requests = []
+    for _ in range(n):
+        language = rng.choice(list(MODELS_DB))
+        requests.append(
+            {
+                "language": language,
+                "prompt": rng.choice(EXAMPLE_PROMPTS[language]),
+                "model_a": MODELS_DB[language]["multisynt"][0],
+                "model_b": MODELS_DB[language]["hplt"],
+                "params": {
+                    "min_new_tokens": 70,
+                    "max_new_tokens": rng.choice(REQUESTED_BUDGETS),
+                    "temperature": 0.7,
+                    "repetition_penalty": 1.2,
+                },
+            }
+        )
+    return requests
+
+
+def spike_offsets(phases, rng):
+    """Poisson arrivals through consecutive (rounds, rate) phases, e.g. calm, spike, calm."""
+    offsets, start = [], 0.0
+    for rounds, rate in phases:
+        phase = arrival_times("poisson", rounds + 1, rate=rate, rng=rng)
+        offsets += [start + offset for offset in phase[:-1]]
+        start += phase[-1]
+    return offsets
+
+
+def simulate(policy, args):
+    """One run of the same traffic (same seed) with a fixed budget or the adaptive one."""
+    rng = random.Random(args.seed)
+    requests = build_requests(args.calm_rounds * 2 + args.spike_rounds, rng)
+    calm, spike = (args.calm_rounds, args.calm_rate), (args.spike_rounds, args.spike_rate)
+    offsets = spike_offsets([calm, spike, calm], rng)
+    executor = FakeExecutor(
+        tokens_per_s=args.tokens_per_s,
+        cold_load_s=args.cold_load,
+        warm_capacity=args.warm_capacity,
+        slots=args.slots,
+        time_scale=args.time_scale,
+        rng=random.Random(args.seed),
+    )
+    budget = TokenBudget(slo_s=args.slo, min_tokens=args.min_tokens) if policy == "adaptive" else None
+    return run_load_test(
+        executor, requests, offsets, sample_interval=5.0, time_scale=args.time_scale, budget=budget, slo_s=args.slo
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Simulate a traffic spike against the fake backend: round-latency SLO attainment "
+        "with the requested (fixed) token budgets versus the adaptive budget."
+    )
+    parser.add_argument("--slo", type=float, default=ROUND_SLO_S, help="Round-latency SLO in seconds.")
+    parser.add_argument("--min_tokens", type=int, default=TOKEN_BUDGET_MIN_TOKENS)
+    parser.add_argument("--calm_rounds", type=int, default=40, help="Rounds before and after the spike.")
+    parser.add_argument("--calm_rate", type=float, default=0.05, help="Rounds per second outside the spike.")
+    parser.add_argument("--spike_rounds", type=int, default=80)
+    parser.add_argument("--spike_rate", type=float, default=0.35, help="Rounds per second during the spike.")
+    parser.add_argument("--tokens_per_s", type=float, default=25.0)
+    parser.add_argument("--cold_load", type=float, default=0.0, help="Seconds per cold load (0: models stay warm).")
+    parser.add_argument("--warm_capacity", type=int, default=30, help="Models kept warm by the fake backend.")
+    parser.add_argument("--slots", type=int, default=4, help="Generations the fake backend runs at once.")
+    parser.add_argument("--time_scale", type=float, default=200.0, help="Run N times faster than real time.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"SLO {args.slo:.0f}s; {args.calm_rounds} calm / {args.spike_rounds} spike / {args.calm_rounds} calm rounds")
+    print(f"{'Policy':<10} {'SLO met':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'Mean max_new_tokens':>20}")
+    for policy in ("fixed", "adaptive"):
+        report = simulate(policy, args)
+        print(
+            f"{policy:<10} {report['slo_attainment']:>8.1%} {report['p50_s']:>6.1f}s {report['p95_s']:>6.1f}s "
+            f"{report['p99_s']:>6.1f}s {report['mean_max_new_tokens']:>20.0f}"
+        )
+        if report["budget"]:
+            print(f"{'':<10} budget lowered for {report['budget']['limited_rate']:.0%} of rounds")
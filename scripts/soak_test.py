@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from soak import (
+    DEFAULT_PARAMS,
+    DEFAULT_THRESHOLDS,
+    SOAK_MODES,
+    cache_cycle,
+    pool_cycle,
+    reload_cycle,
+    resident_cycle,
+    run_soak,
+)
+from tiny_model import build_tiny_model
+
+PROMPT = "Det var en gång en"
+FAKE_SLURM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_slurm")
+
+
+def build_cycle(args, models):
+    """The cycle function for --mode, plus a function listing worker pids to sample (pool mode)."""
+    if args.mode == "reload":
+        return reload_cycle(models, PROMPT), None, None
+    if args.mode == "cache":
+        return cache_cycle(models, PROMPT, max_models=args.max_models), None, None
+    if args.mode == "resident":
+        return resident_cycle(models[0], PROMPT), None, None
+    from config import SLURM_SRUN_ARGS
+    from executors import SlurmExecutor
+
+    srun_args = SLURM_SRUN_ARGS
+    if args.fake_srun:
+        # scripts/fake_slurm/srun runs each worker as a local process
+        os.environ["PATH"] = FAKE_SLURM_DIR + os.pathsep + os.environ["PATH"]
+        srun_args = []
+    executor = SlurmExecutor(
+        num_workers=args.workers, srun_args=srun_args, python_cmd=[sys.executable], max_models=args.max_models
+    )
+
+    def worker_pids():
+        return [worker.process.pid for worker in executor.workers if worker.alive()]
+
+    return pool_cycle(executor, models, PROMPT), worker_pids, executor
+
+
+def print_report(report):
+    mean = f"{report['mean_cycle_s']:.3f}s mean" if report["mean_cycle_s"] is not None else "no cycles"
+    print(f"\nCycles:       {report['cycles']} in {report['duration_s']:.0f}s ({mean})")
+    print("Trends over the measured cycles (after warm-up):")
+    for metric, trend in report["trends"].items():
+        print(
+            f"  {metric:<15} {trend['start']:>10.3f} -> {trend['end']:>10.3f}  "
+            f"fitted growth {trend['growth']:>+9.3f}  (threshold {report['thresholds'][metric]})"
+        )
+    if report["top_allocators"]:
+        print("\nPython allocations that grew most since warm-up:")
+        for allocation in report["top_allocators"]:
+            print(f"  {allocation['size_diff_kb']:>10.1f} KiB  {allocation['count_diff']:>+7}  {allocation['where']}")
+    print()
+    for failure in report["failures"]:
+        print(f"{'LEAK' if report['samples'] else 'NO DATA'} {failure}")
+    print("PASSED" if report["passed"] else "FAILED")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soak test load/generate/unload cycles and watch for leaks.")
+    parser.add_argument("--mode", choices=SOAK_MODES, default="cache")
+    parser.add_argument(
+        "--models", nargs="+", help="Models to cycle through. Defaults to three locally built tiny models."
+    )
+    parser.add_argument("--cycles", type=int, help="Number of cycles (default 200 unless --hours is given).")
+    parser.add_argument("--hours", type=float, help="Run for this long instead (or stop at --cycles, if first).")
+    parser.add_argument("--sample_every", type=int, default=1, help="Sample memory every N cycles.")
+    parser.add_argument("--warmup", type=float, default=0.2, help="Fraction of samples ignored by the trend fit.")
+    parser.add_argument("--max_models", type=int, default=1, help="Models kept resident by the cache / pool workers.")
+    parser.add_argument("--workers", type=int, default=2, help="Pool mode: number of worker processes.")
+    parser.add_argument("--fake_srun", action="store_true", help="Pool mode: run workers locally (no Slurm).")
+    parser.add_argument("--no_tracemalloc", action="store_true", help="Skip Python heap tracing (it slows cycles).")
+    for metric, threshold in DEFAULT_THRESHOLDS.items():
+        parser.add_argument(f"--max_{metric}", type=float, default=threshold, help=f"Allowed growth of {metric}.")
+    parser.add_argument("--output", type=str, help="Also write the full report as JSON.")
+    args = parser.parse_args()
+
+    models = args.models or [
+        build_tiny_model(os.path.join(".cache", f"soak-model-{seed}"), seed=seed) for seed in range(3)
+    ]
+    cycles = args.cycles if args.cycles or args.hours else 200
+    cycle_fn, worker_pids_fn, executor = build_cycle(args, models)
+    print(f"Soaking {args.mode} cycles over {len(models)} models (params {DEFAULT_PARAMS})...")
+    try:
+        report = run_soak(
+            cycle_fn,
+            cycles=cycles,
+            duration_s=args.hours * 3600 if args.hours else None,
+            sample_every=args.sample_every,
+            warmup_fraction=args.warmup,
+            thresholds={metric: getattr(args, f"max_{metric}") for metric in DEFAULT_THRESHOLDS},
+            trace_heap=not args.no_tracemalloc,
+            worker_pids_fn=worker_pids_fn,
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(0 if report["passed"] else 1)
@@ -0,0 +1,122 @@
+import json
+import itertools
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from config import FAST_LOAD, PYTHON_CMD
+from cpu_affinity import format_cpulist, numa_bind_prefix
+from metrics import observe_generation
+
+# backend.py reports its per-generation metrics record as a stderr line starting with this tag
+METRICS_PREFIX = "ARENA_METRICS "
+
+
+def build_backend_args(model_name, prompt, params):
+    """Command line for a single backend.py generation."""
+    cmd = PYTHON_CMD + [
+        "backend.py",
+        "--model_name", model_name,
+        "--prompt", prompt,
+        "--min_new_tokens", str(params["min_new_tokens"]),
+        "--max_new_tokens", str(params["max_new_tokens"]),
+        "--temperature", str(params["temperature"]),
+        "--repetition_penalty", str(params["repetition_penalty"]),
+    ]
+    if FAST_LOAD:
+        cmd += ["--fast_load"]
+    return cmd
+
+
+def build_slurm_cmd(model_name, prompt, params):
+    """Runs the backend as a single-GPU Slurm job."""
+    return ["srun", "--gpus=1"] + build_backend_args(model_name, prompt, params)
+
+
+def build_cpu_cmd(model_name, prompt, params, cores=None, numa_bind=False, shared_weights=False):
+    """Runs the backend locally, optionally pinned to `cores` and bound to their NUMA node."""
+    cmd = build_backend_args(model_name, prompt, params)
+    if shared_weights:
+        cmd += ["--shared_weights"]
+    if not cores:
+        return cmd
+    cmd += ["--cpu_cores", format_cpulist(cores)]
+    if numa_bind:
+        cmd = numa_bind_prefix(cores) + cmd
+    return cmd
+
+
+def run_cmd(cmd, cancel_event=None):
+    """
+    Runs one backend command to completion. Returns (returncode, stdout, stderr).
+    If `cancel_event` gets set, the process (and with srun, its Slurm step) is terminated.
+    """
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if cancel_event is None:
+        stdout, stderr = process.communicate()
+        return process.returncode, stdout, stderr
+
+    while True:
+        try:
+            stdout, stderr = process.communicate(timeout=0.2)
+            return process.returncode, stdout, stderr
+        except subprocess.TimeoutExpired:
+            if cancel_event.is_set():
+                process.terminate()
+                stdout, stderr = process.communicate()
+                return process.returncode, stdout, stderr
+
+
+def parse_metrics(stderr):
+    """Returns the metrics record a backend.py run printed to stderr, or {} if there is none."""
+    for line in reversed(stderr.splitlines()):
+        if line.startswith(METRICS_PREFIX):
+            try:
+                return json.loads(line[len(METRICS_PREFIX):])
+            except json.JSONDecodeError:
+                return {}
+    return {}
+
+
+def generation_key(model_name, prompt, params):
+    """Requests with the same key would run an identical generation job."""
+    return (model_name, prompt, tuple(sorted(params.items())))
+
+
+def generate_pair(executor, model_a, model_b, prompt, params, flight=None, hedger=None, cancel_event=None):
+    """
+    Generates Model A and Model B concurrently on `executor` (see executors.py).
+    Returns [(returncode, text, error, metrics)] for A and B.
+    With a SingleFlight, a side whose identical job (same model, prompt and params) is already
+    running attaches to it and shares its sampled output instead of launching a duplicate job;
+    its metrics are then the shared job's, marked with "shared": True.
+    With a Hedger, a side that straggles past its model's latency percentile gets a backup job, on
+    executors that can cancel it (see Executor.hedge_slot).
+    Setting `cancel_event` cancels both sides (without a Hedger, which cancels its own attempts).
+    Every job (a hedged one counts once) is recorded in the process-wide metrics (see metrics.py).
+    """
+
+    def run_hedged(model_name, slot):
+        if hedger is None or executor.hedge_slot(slot) is None:
+            return executor.generate(model_name, prompt, params, slot=slot, cancel_event=cancel_event)
+        attempts = itertools.count()
+
+        def attempt(attempt_cancel_event):
+            # The first attempt runs in the side's slot, a hedge wherever the executor sends hedges
+            attempt_slot = slot if next(attempts) == 0 else executor.hedge_slot(slot)
+            return executor.generate(model_name, prompt, params, attempt_slot, attempt_cancel_event)
+
+        return hedger.run(model_name, attempt)
+
+    def run_job(model_name, slot):
+        return observe_generation(model_name, lambda: run_hedged(model_name, slot))
+
+    def run_side(model_name, slot):
+        if flight is None:
+            return run_job(model_name, slot)
+        result, shared = flight.do(generation_key(model_name, prompt, params), lambda: run_job(model_name, slot))
+        returncode, text, error, metrics = result
+        return returncode, text, error, {**metrics, "shared": shared}
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(run_side, model, slot) for slot, model in enumerate((model_a, model_b))]
+        return [f.result() for f in futures]
@@ -0,0 +1,212 @@
+import fcntl
+import hashlib
+import json
+import glob
+import os
+import re
+import sys
+
+import torch
+from accelerate import init_empty_weights
+from safetensors.torch import save_model
+from transformers import AutoConfig, AutoModelForCausalLM
+
+from config import SHARED_WEIGHTS_DIR, SHARED_WEIGHTS_MAX_GB
+
+# Weights are materialized once per node as a float32 safetensors file and every worker maps
+# that file copy-on-write. Untouched pages stay in the page cache (or tmpfs when the directory
+# is on /dev/shm) and are shared by all workers, so a worker's private memory is only its
+# activations and KV cache. Inference never writes to weights, so no page is ever copied.
+# A file's modification time records when it was last mapped, for least-recently-used eviction.
+
+_SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def _hub_revision(model_name):
+    """
+    Commit hash of a Hub model without downloading it: the Hub's metadata, or the commit the local
+    cache last resolved the main branch to when offline (or the Hub is unreachable).
+    """
+    from huggingface_hub import HfApi, constants
+
+    if not constants.HF_HUB_OFFLINE:
+        try:
+            return HfApi().model_info(model_name).sha
+        except Exception as e:
+            print(f"Could not ask the Hub for {model_name}'s revision ({e}); using the cached one.", file=sys.stderr)
+    ref = os.path.join(constants.HF_HUB_CACHE, "models--" + model_name.replace("/", "--"), "refs", "main")
+    with open(ref) as f:
+        return f.read().strip()
+
+
+def _source_version(model_name):
+    """
+    Version of a checkpoint, so a changed checkpoint gets a new file: the newest modification time
+    of a local checkpoint, or the commit hash of a Hub model (nothing is downloaded to find it).
+    """
+    if not os.path.isdir(model_name):
+        return _hub_revision(model_name)
+    return str(max(os.path.getmtime(os.path.join(model_name, f)) for f in os.listdir(model_name)))
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def _model_prefix(model_name, root):
+    """Path prefix shared by the weights files of every version of `model_name`."""
+    source = os.path.abspath(model_name) if os.path.isdir(model_name) else model_name
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", os.path.basename(model_name.rstrip("/")))
+    return os.path.join(root, f"{slug}-{_digest(source)}-")
+
+
+def shared_weights_path(model_name, root=SHARED_WEIGHTS_DIR):
+    """Returns the node-local file holding the materialized weights of `model_name`'s current version."""
+    return f"{_model_prefix(model_name, root)}{_digest(_source_version(model_name))}.safetensors"
+
+
+def _remove(path):
+    """
+    Removes a weights file, and its lock file unless a worker holds it (building or waiting to build
+    this very file): a lock file removed under its holder would let the next worker lock a new one.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    try:
+        with open(path + ".lock") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.remove(path + ".lock")
+    except (FileNotFoundError, BlockingIOError):
+        pass
+
+
+def evict(model_name, keep, root=SHARED_WEIGHTS_DIR, max_bytes=SHARED_WEIGHTS_MAX_GB * 1024**3):
+    """
+    Removes the files of `model_name`'s older versions, then the least recently mapped files of any
+    model until the directory fits in `max_bytes`; `keep` is never removed. Workers still mapping a
+    removed file keep working: its memory is freed once the last of them unmaps it.
+    Returns the removed paths.
+    """
+    versions = glob.glob(glob.escape(_model_prefix(model_name, root)) + "*.safetensors")
+    removed = [path for path in versions if path != keep]
+    for path in removed:
+        _remove(path)
+    files = sorted(
+        (os.path.getmtime(path), os.path.getsize(path), path)
+        for path in glob.glob(os.path.join(glob.escape(root), "*.safetensors"))
+    )
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if total <= max_bytes:
+            break
+        if path != keep:
+            _remove(path)
+            removed.append(path)
+            total -= size
+    for path in removed:
+        print(f"Removed shared weights {path}", file=sys.stderr)
+    return removed
+
+
+def materialize(model_name, path):
+    """
+    Writes the model's float32 weights to `path` unless another worker already did.
+    A lock file serializes concurrent workers; the file is renamed into place only once complete.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(path):
+            return path
+        print(f"Materializing shared weights for {model_name} at {path}...", file=sys.stderr)
+        model = AutoModelForCausalLM.from_pretrained(model_name, dtype=torch.float32, trust_remote_code=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        # save_model drops tied duplicates (e.g. lm_head sharing the embedding), tie_weights restores them
+        save_model(model, tmp_path)
+        os.replace(tmp_path, path)
+        del model
+        evict(model_name, path, os.path.dirname(path))
+    return path
+
+
+def load_state_dict_mmap(path):
+    """
+    Maps a safetensors file copy-on-write and returns tensors that are views into the mapping.
+    Unlike safetensors.load_file nothing is copied, so processes mapping the same file share pages.
+    """
+    with open(path, "rb") as f:
+        header_len = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_len))
+    header.pop("__metadata__", None)
+    data_start = 8 + header_len
+
+    buffer = torch.from_file(path, shared=False, size=os.path.getsize(path), dtype=torch.uint8)
+    state_dict = {}
+    for name, info in header.items():
+        dtype = _SAFETENSORS_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        raw = buffer[data_start + start:data_start + end]
+        if (data_start + start) % dtype.itemsize:
+            # Unaligned tensors cannot be viewed in place; this only happens with mixed dtypes
+            raw = raw.clone()
+        state_dict[name] = raw.view(dtype).view(info["shape"])
+    return state_dict
+
+
+def load_shared_model(model_name, root=SHARED_WEIGHTS_DIR):
+    """
+    Returns a float32 model whose parameters are backed by the node's shared weights file,
+    materializing the file first if this is the first worker to load `model_name`.
+    """
+    path = shared_weights_path(model_name, root)
+    try:
+        os.utime(path)  # most recently used, last to be evicted
+    except FileNotFoundError:
+        materialize(model_name, path)
+    print(f"Mapping shared weights from {path}", file=sys.stderr)
+
+    model_config = AutoConfig.from_pretrained(model_name, trust_remote_code=True)
+    # Parameters start on the meta device (no allocation); buffers such as rotary frequencies are
+    # not in the checkpoint and are computed on CPU as usual.
+    with init_empty_weights(include_buffers=False):
+        model = AutoModelForCausalLM.from_config(
+            model_config, dtype=torch.float32, attn_implementation="sdpa", trust_remote_code=True
+        )
+    model.load_state_dict(load_state_dict_mmap(path), strict=False, assign=True)
+    model.tie_weights()
+
+    missing = [name for name, param in model.named_parameters() if param.is_meta]
+    if missing:
+        raise ValueError(f"Shared weights file {path} is missing parameters: {missing[:5]}")
+    return model.eval()
+
+
+def memory_usage(pid="self"):
+    """
+    Returns the process's resident memory in bytes as {"rss", "pss", "uss"} from /proc.
+    PSS divides shared pages between the processes mapping them; USS counts only private pages.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "uss": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
@@ -0,0 +1,221 @@
+import gc
+import itertools
+import os
+import statistics
+import time
+import tracemalloc
+
+import torch
+
+from shared_weights import memory_usage
+
+SOAK_MODES = ("reload", "cache", "resident", "pool")
+DEFAULT_PARAMS = {"min_new_tokens": 16, "max_new_tokens": 16, "temperature": 0.7, "repetition_penalty": 1.2}
+# metric -> largest growth over the measured part of the run before the soak fails
+DEFAULT_THRESHOLDS = {
+    "rss_mb": 64.0,
+    "worker_rss_mb": 64.0,
+    "heap_mb": 8.0,
+    "open_fds": 8,
+    "device_mb": 64.0,
+    "cycle_slowdown": 0.25,
+}
+
+
+def open_fds(pid="self"):
+    return len(os.listdir(f"/proc/{pid}/fd"))
+
+
+def device_memory_mb():
+    """Memory allocated by torch on all GPUs, or None without CUDA."""
+    if not torch.cuda.is_available():
+        return None
+    return sum(torch.cuda.memory_allocated(i) for i in range(torch.cuda.device_count())) / 2**20
+
+
+def sample(worker_pids=()):
+    """One memory sample of this process (and of the given worker processes, summed)."""
+    record = {"rss_mb": memory_usage()["rss"] / 2**20, "open_fds": open_fds()}
+    if tracemalloc.is_tracing():
+        record["heap_mb"] = tracemalloc.get_traced_memory()[0] / 2**20
+    device = device_memory_mb()
+    if device is not None:
+        record["device_mb"] = device
+    if worker_pids:
+        record["worker_rss_mb"] = sum(memory_usage(pid)["rss"] for pid in worker_pids) / 2**20
+    return record
+
+
+def _release_memory():
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def reload_cycle(models, prompt, params=DEFAULT_PARAMS):
+    """Each cycle loads the next model, generates once and drops it (what stress_test_gpu.py did)."""
+    from backend import generate_text, get_pipeline
+
+    models = itertools.cycle(models)
+
+    def cycle():
+        pipe = get_pipeline(next(models), 0)
+        generate_text(pipe, prompt, **params)
+        del pipe
+        _release_memory()
+
+    return cycle
+
+
+def cache_cycle(models, prompt, params=DEFAULT_PARAMS, max_models=1):
+    """Each cycle generates with the next model through a PipelineCache, so models keep being evicted."""
+    from backend import PipelineCache, generate_text
+
+    cache = PipelineCache(max_models=max_models)
+    models = itertools.cycle(models)
+
+    def cycle():
+        pipe, _ = cache.get(next(models))
+        generate_text(pipe, prompt, **params)
+
+    return cycle
+
+
+def resident_cycle(model, prompt, params=DEFAULT_PARAMS):
+    """Each cycle generates with one model that stays loaded (leaks in the generation path)."""
+    from backend import generate_text, get_pipeline
+
+    pipe = get_pipeline(model, 0)
+
+    def cycle():
+        generate_text(pipe, prompt, **params)
+
+    return cycle
+
+
+def pool_cycle(executor, models, prompt, params=DEFAULT_PARAMS):
+    """Each cycle runs a round (two models) through an executor, e.g. the Slurm worker pool."""
+    from serving import generate_pair
+
+    pairs = itertools.cycle(zip(models, models[1:] + models[:1]))
+
+    def cycle():
+        model_a, model_b = next(pairs)
+        for returncode, _, error, _ in generate_pair(executor, model_a, model_b, prompt, params):
+            if returncode != 0:
+                raise RuntimeError(error)
+
+    return cycle
+
+
+def fit_trend(xs, ys):
+    """Least-squares line through (xs, ys) as (slope, intercept); flat for fewer than two distinct xs."""
+    if len(set(xs)) < 2:
+        return 0.0, ys[0] if ys else 0.0
+    return statistics.linear_regression(xs, ys)
+
+
+def _top_allocators(before, after, limit):
+    stats = after.compare_to(before, "lineno")
+    return [
+        {"where": str(stat.traceback), "size_diff_kb": stat.size_diff / 1024, "count_diff": stat.count_diff}
+        for stat in stats[:limit]
+        if stat.size_diff > 0
+    ]
+
+
+def run_soak(
+    cycle_fn,
+    cycles=None,
+    duration_s=None,
+    sample_every=1,
+    warmup_fraction=0.2,
+    thresholds=None,
+    trace_heap=True,
+    worker_pids_fn=None,
+    top_allocators=10,
+    log_every_s=60.0,
+):
+    """
+    Runs `cycle_fn` for `cycles` cycles or `duration_s` seconds, sampling memory every `sample_every`
+    cycles. After the first `warmup_fraction` of samples (caches filling, lazy imports), a line is fitted
+    to each metric against the cycle number; its growth over the measured cycles is compared with
+    `thresholds`, and so is the fitted growth of the cycle time (as a fraction of its start value).
+    With `trace_heap`, the Python heap is traced and the allocators that grew most are reported.
+    """
+    if cycles is None and duration_s is None:
+        raise ValueError("Give cycles and/or duration_s")
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    worker_pids_fn = worker_pids_fn or (lambda: ())
+    if trace_heap:
+        tracemalloc.start()
+
+    samples, cycle_times = [], []
+    warm_snapshot = None
+    start = last_log = time.monotonic()
+    try:
+        for index in itertools.count():
+            if cycles is not None and index >= cycles:
+                break
+            if duration_s is not None and time.monotonic() - start >= duration_s:
+                break
+            cycle_start = time.perf_counter()
+            cycle_fn()
+            cycle_times.append(time.perf_counter() - cycle_start)
+            if index % sample_every == 0:
+                _release_memory()
+                samples.append({"cycle": index, "elapsed_s": time.monotonic() - start, **sample(worker_pids_fn())})
+                warm = (cycles is not None and index >= cycles * warmup_fraction) or (
+                    duration_s is not None and samples[-1]["elapsed_s"] >= duration_s * warmup_fraction
+                )
+                if trace_heap and warm_snapshot is None and warm:
+                    warm_snapshot = tracemalloc.take_snapshot()
+            if time.monotonic() - last_log >= log_every_s:
+                last_log = time.monotonic()
+                print(f"Soak: {index + 1} cycles, {samples[-1]}")
+        end_snapshot = tracemalloc.take_snapshot() if trace_heap else None
+    finally:
+        if trace_heap:
+            tracemalloc.stop()
+
+    report = {
+        "cycles": len(cycle_times),
+        "duration_s": time.monotonic() - start,
+        "mean_cycle_s": statistics.fmean(cycle_times) if cycle_times else None,
+        "samples": samples,
+        "thresholds": thresholds,
+        "top_allocators": _top_allocators(warm_snapshot, end_snapshot, top_allocators) if warm_snapshot else [],
+    }
+    if not samples:
+        # Ended before its first cycle: nothing to fit, and nothing shown to be leak-free
+        failures = ["no samples: the soak ended before its first cycle"]
+        return {**report, "trends": {}, "failures": failures, "passed": False}
+
+    measured = samples[int(len(samples) * warmup_fraction) :] or samples
+    first, last = measured[0]["cycle"], measured[-1]["cycle"]
+    trends, failures = {}, []
+    for metric in (m for m in thresholds if m in measured[0]):
+        points = [(s["cycle"], s[metric]) for s in measured if metric in s]
+        slope, _ = fit_trend([x for x, _ in points], [y for _, y in points])
+        growth = slope * (last - first)
+        trends[metric] = {"slope_per_cycle": slope, "growth": growth, "start": points[0][1], "end": points[-1][1]}
+        if growth > thresholds[metric]:
+            failures.append(f"{metric} grew by {growth:.2f} over cycles {first}-{last} (threshold {thresholds[metric]})")
+
+    # Throughput degradation: growth of the fitted cycle time relative to its value at the first measured cycle
+    slope, intercept = fit_trend(list(range(first, last + 1)), cycle_times[first : last + 1])
+    start_s = max(intercept + slope * first, 1e-9)
+    slowdown = slope * (last - first) / start_s
+    trends["cycle_slowdown"] = {
+        "slope_per_cycle": slope,
+        "growth": slowdown,
+        "start": start_s,
+        "end": start_s + slope * (last - first),
+    }
+    if slowdown > thresholds["cycle_slowdown"]:
+        failures.append(
+            f"cycle time grew by {slowdown:.0%} over cycles {first}-{last} "
+            f"(threshold {thresholds['cycle_slowdown']:.0%})"
+        )
+
+    return {**report, "trends": trends, "failures": failures, "passed": not failures}
@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_tuning_profiles(tmp_path, monkeypatch):
+    """Tests never pick up tuning profiles stored in the home directory, in-process or in the workers they start."""
+    path = str(tmp_path / "tuning_profiles.json")
+    monkeypatch.setenv("ARENA_TUNING_PROFILES_FILE", path)
+    monkeypatch.setattr("autotune.TUNING_PROFILES_FILE", path)
@@ -0,0 +1,93 @@
+import pytest
+import torch
+
+from autotune import DEFAULTS, PROFILE_VERSION, autotune, load_profile, save_profile, tunable_models
+from backend import get_pipeline, get_tuning_profile
+from config import MODELS_DB
+from tiny_model import build_tiny_model
+
+SEARCH = {"dtypes": ["float32", "bfloat16"], "attn_implementations": ["sdpa", "eager"], "threads": [1]}
+
+
+@pytest.fixture
+def profiles_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "profiles.json")
+    monkeypatch.setattr("autotune.TUNING_PROFILES_FILE", path)
+    return path
+
+
+def test_tunable_models_cover_models_db():
+    models = tunable_models()
+    assert len(models) == len(set(models))
+    assert all(model in models for entry in MODELS_DB.values() for model in entry["multisynt"])
+
+
+def test_profiles_are_keyed_by_model_and_hardware(profiles_file, monkeypatch):
+    save_profile({"model": "a", "settings": {"dtype": "bfloat16"}}, hardware="machine-1")
+    save_profile({"model": "b", "settings": {"dtype": "float32"}}, hardware="machine-1")
+    save_profile({"model": "a", "settings": {"dtype": "float16"}}, hardware="machine-2")
+
+    assert load_profile("a", hardware="machine-1")["settings"] == {"dtype": "bfloat16"}
+    assert load_profile("a", hardware="machine-2")["settings"] == {"dtype": "float16"}
+    assert load_profile("b", hardware="machine-2") is None
+    assert load_profile("a", hardware="machine-3") is None
+    monkeypatch.setattr("autotune.PROFILE_VERSION", PROFILE_VERSION + 1)
+    assert load_profile("a", hardware="machine-1") is None
+
+
+def test_get_pipeline_applies_the_stored_profile(tmp_path, profiles_file, monkeypatch):
+    model_dir = build_tiny_model(str(tmp_path / "tiny"))
+    assert get_tuning_profile(get_pipeline(model_dir, 0)) is None
+
+    settings = {"dtype": "bfloat16", "attn_implementation": "eager", "threads": 1, "batch_size": 4}
+    profile = {"model": model_dir, "settings": settings, "speedup": 1.5, "default_tokens_per_s": 10.0, "tuned_at": ""}
+    save_profile(profile)
+    thread_counts = []
+    monkeypatch.setattr(torch, "set_num_threads", thread_counts.append)
+    for fast_load in (False, True):
+        pipe = get_pipeline(model_dir, 0, fast_load=fast_load)
+        assert pipe.model.dtype == torch.bfloat16
+        assert pipe.model.config._attn_implementation == "eager"
+        assert pipe._batch_size == 4
+        assert get_tuning_profile(pipe)["speedup"] == 1.5
+    # Threads are process-wide: only a process serving just this model applies them
+    assert thread_counts == []
+    get_pipeline(model_dir, 0, apply_threads=True)
+    assert thread_counts == [1]
+    # Explicit settings win over the profile
+    assert get_pipeline(model_dir, 0, settings=DEFAULTS).model.dtype == torch.float32
+
+
+def test_autotune_searches_and_reports_the_speedup(tmp_path, profiles_file):
+    model_dir = build_tiny_model(str(tmp_path / "tiny"))
+    threads = torch.get_num_threads()
+    quick = {"new_tokens": 4, "repeats": 1, **SEARCH}
+    profile = autotune(model_dir, max_memory_gb=64, batch_sizes=(1, 2), min_agreement=0, **quick)
+
+    assert torch.get_num_threads() == threads
+    assert set(profile["settings"]) == set(DEFAULTS)
+    # 4 loads x 1 thread count, then one larger batch
+    assert len(profile["candidates"]) == 5
+    assert all("tokens_per_s" in candidate for candidate in profile["candidates"])
+    # Either a setting beat the defaults clearly, or the defaults were kept
+    assert profile["speedup"] >= 1.05 or {k: profile["settings"][k] for k in ("dtype", "attn_implementation")} == {
+        "dtype": "float32",
+        "attn_implementation": "sdpa",
+    }
+    assert profile["settings"]["batch_size"] in (1, 2)
+    save_profile(profile)
+    assert load_profile(model_dir)["settings"] == profile["settings"]
+
+
+def test_autotune_skips_settings_over_the_memory_limit_or_unfaithful(tmp_path, profiles_file):
+    model_dir = build_tiny_model(str(tmp_path / "tiny"))
+    quick = {"batch_sizes": (1,), "new_tokens": 4, "repeats": 1, **SEARCH}
+    tight = autotune(model_dir, max_memory_gb=1e-9, **quick)
+    assert all(candidate["skipped"] for candidate in tight["candidates"])
+    assert tight["settings"] == DEFAULTS
+    assert tight["speedup"] == 1.0
+
+    # Nothing agrees with float32 on more than 100% of the tokens, not even float32 itself
+    strict = autotune(model_dir, max_memory_gb=64, min_agreement=1.01, **quick)
+    assert all("agrees" in candidate["skipped"] for candidate in strict["candidates"])
+    assert strict["settings"] == DEFAULTS
@@ -1,13 +1,30 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 
 import pytest
 
-from backend import generate_text, get_pipeline
-
-
+from backend import (
+    NEW_TOKEN_BUCKETS,
+    PROMPT_BUCKETS,
+    PipelineCache,
+    bucket_graphs,
+    enable_fast_decode,
+    generate_text,
+    generate_with_metrics,
+    get_bucket,
+    get_load_timings,
+    get_pipeline,
+    reserve_compiled_models,
+)
+from tiny_model import build_tiny_model
+
+
+@patch("backend.AutoTokenizer")
+@patch("backend.AutoModelForCausalLM")
+@patch("backend.AutoConfig")
 @patch("backend.pipeline")
-def test_get_pipeline(mock_pipeline):
-    """Test get_pipeline calls transformers.pipeline correctly."""
+def test_get_pipeline(mock_pipeline, mock_auto_config, mock_auto_model, mock_auto_tokenizer):
+    """Test get_pipeline loads the model phase by phase and wraps it in a transformers pipeline."""
+    torch = pytest.importorskip("torch")
     mock_pipe_instance = MagicMock()
     mock_pipeline.return_value = mock_pipe_instance
 
@@ -16,15 +33,24 @@ def test_get_pipeline(mock_pipeline):
 
     pipe = get_pipeline(model_name, device_id)
 
+    mock_auto_config.from_pretrained.assert_called_once_with(model_name, trust_remote_code=True)
+    mock_auto_model.from_pretrained.assert_called_once_with(
+        model_name,
+        config=mock_auto_config.from_pretrained.return_value,
+        dtype="auto",
+        attn_implementation="sdpa",
+        trust_remote_code=True,
+    )
+    mock_auto_model.from_pretrained.return_value.to.assert_called_once_with(torch.float32)
     mock_pipeline.assert_called_once_with(
         "text-generation",
-        model=model_name,
-        device=device_id,
-        torch_dtype=pytest.importorskip("torch").float32,
-        model_kwargs={"attn_implementation": "eager"},
-        trust_remote_code=True,
+        model=mock_auto_model.from_pretrained.return_value.to.return_value,
+        tokenizer=mock_auto_tokenizer.from_pretrained.return_value,
+        batch_size=1,
     )
     assert pipe == mock_pipe_instance
+    assert mock_pipe_instance.tokenizer.padding_side == "left"
+    assert list(get_load_timings(pipe)) == ["config", "weights", "dtype", "placement", "tokenizer", "pipeline"]
 
 
 def test_generate_text():
@@ -42,10 +68,13 @@ def test_generate_text():
         prompt,
         max_new_tokens=50,
         min_new_tokens=20,
+        max_length=None,
         do_sample=True,
         temperature=0.7,
         top_p=0.9,
         repetition_penalty=1.15,
+        pad_token_id=mock_pipe.tokenizer.pad_token_id,
+        stopping_criteria=ANY,
     )
 
 
@@ -54,7 +83,60 @@ def test_generate_text_error():
     mock_pipe = MagicMock()
     mock_pipe.side_effect = Exception("Model Error")
 
-    output = generate_text(mock_pipe, "Hello")
+    output, metrics = generate_text(mock_pipe, "Hello"), generate_with_metrics(mock_pipe, "Hello")[1]
+
+    assert output == ""
+    assert metrics["stop_reason"] == "error"
+    assert metrics["new_tokens"] == 0
+
+
+def test_get_bucket():
+    """Test lengths are rounded up to a bounded set of compile shapes."""
+    assert get_bucket(1, PROMPT_BUCKETS) == 32
+    assert get_bucket(32, PROMPT_BUCKETS) == 32
+    assert get_bucket(33, PROMPT_BUCKETS) == 64
+    assert get_bucket(112, NEW_TOKEN_BUCKETS) == 128
+    # Beyond the largest bucket we round up to a multiple of it
+    assert get_bucket(513, NEW_TOKEN_BUCKETS) == 1024
+
+
+def test_generate_with_metrics_reports_tokens_and_stop_reason(tmp_path):
+    """Test the metrics record counts tokens and splits prefill from decode."""
+    pipe = get_pipeline(build_tiny_model(str(tmp_path / "tiny")), 0)
+    text, metrics = generate_with_metrics(pipe, "Det var en gång", min_new_tokens=8, max_new_tokens=8)
+
+    assert text.startswith("Det var en gång")
+    assert metrics["new_tokens"] == 8
+    assert metrics["prompt_tokens"] == len(pipe.tokenizer("Det var en gång")["input_ids"])
+    assert metrics["stop_reason"] == "max_new_tokens"
+    assert metrics["prefill_s"] > 0 and metrics["decode_s"] > 0
+
+
+def test_fast_decode_does_not_recompile_in_a_warmed_bucket(tmp_path):
+    """Test requests in a warmed-up bucket reuse the warm-up's graphs, the first one included."""
+    torch = pytest.importorskip("torch")
+    from torch._dynamo.utils import counters
+
+    pipe = enable_fast_decode(get_pipeline(build_tiny_model(str(tmp_path / "tiny")), 0), warmup_buckets=((32, 64),))
+    graphs = counters["stats"]["unique_graphs"]
+
+    for _ in range(2):
+        text, metrics = generate_with_metrics(pipe, "Det var en gång", min_new_tokens=40, max_new_tokens=40)
+        assert metrics["new_tokens"] == 40
+    assert counters["stats"]["unique_graphs"] == graphs
+
+
+def test_recompile_limit_does_not_grow_with_model_loads(monkeypatch):
+    """Test the limit is sized once for the resident models, however often models are loaded and evicted."""
+    torch = pytest.importorskip("torch")
+    dynamo_config = torch._dynamo.config
+    monkeypatch.setattr("backend._DYNAMO_DEFAULT_LIMITS", None)
+    monkeypatch.setattr(dynamo_config, "recompile_limit", 8)
+    monkeypatch.setattr(dynamo_config, "accumulated_recompile_limit", 256)
 
-    assert "Error generating text" in output
-    assert "Model Error" in output
+    for _ in range(3):
+        PipelineCache(max_models=2, fast_decode=True)
+        # What every load with fast decode reserves (see enable_fast_decode)
+        reserve_compiled_models(1)
+    assert dynamo_config.recompile_limit == 8 + 2 * bucket_graphs()
+    assert dynamo_config.accumulated_recompile_limit == 256
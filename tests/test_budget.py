@@ -0,0 +1,84 @@
+import random
+
+from budget import TokenBudget
+from loadgen import FakeExecutor, arrival_times, run_load_test
+
+PARAMS = {"min_new_tokens": 70, "max_new_tokens": 512, "temperature": 0.7, "repetition_penalty": 1.2}
+
+
+def side(queue_wait_s, new_tokens, per_token_s=0.04):
+    metrics = {"queue_wait_s": queue_wait_s, "load_s": 0.0, "prefill_s": 0.5, "decode_s": new_tokens * per_token_s}
+    return 0, "text", "", {**metrics, "new_tokens": new_tokens}
+
+
+def warmed_up(queue_wait_s=0.0, depth=1, per_token_s=0.04):
+    budget = TokenBudget(slo_s=30, min_tokens=50, enabled=True, min_samples=5)
+    for _ in range(5):
+        budget.observe([side(queue_wait_s, 100, per_token_s), side(queue_wait_s, 100, per_token_s)], depth)
+    return budget
+
+
+def test_requested_budget_is_kept_without_pressure():
+    budget = warmed_up()
+    # 0.5 s + 512 tokens * 0.04 s = 21 s fits the 30 s SLO
+    assert budget.allowed_tokens(512, depth=1) == 512
+    assert TokenBudget(slo_s=30, enabled=True).allowed_tokens(512, depth=10) == 512  # no history yet
+
+
+def test_budget_shrinks_with_queue_depth_down_to_the_floor():
+    """Test each round ahead (observed to cost 5 s of waiting) takes 125 tokens off the budget."""
+    budget = warmed_up(queue_wait_s=5.0, depth=2)
+    assert budget.allowed_tokens(512, depth=2) == 512  # 5 + 0.5 + 20.5 s fits
+    assert budget.allowed_tokens(512, depth=3) == 487  # (30 - 10 - 0.5) / 0.04
+    assert budget.allowed_tokens(512, depth=4) == 362
+    assert budget.allowed_tokens(512, depth=20) == 50
+    assert TokenBudget(enabled=False).allowed_tokens(512, depth=20) == 512
+
+
+def test_both_sides_get_the_same_budget_and_it_is_returned():
+    # A slow model: 512 tokens alone would take 51 s
+    budget = warmed_up(per_token_s=0.1)
+    seen = []
+
+    def generate(params):
+        seen.append(params)
+        return [side(0.0, params["max_new_tokens"]), side(0.0, params["max_new_tokens"])]
+
+    results, params = budget.run(PARAMS, generate)
+    assert seen == [params]
+    assert params["max_new_tokens"] == budget.stats()["tokens_allowed"] == 295  # (30 - 0.5) / 0.1
+    assert params["temperature"] == PARAMS["temperature"]
+    assert budget.stats()["limited"] == 1
+
+
+def test_min_new_tokens_never_exceeds_the_budget():
+    budget = warmed_up(per_token_s=1.0)
+    _, params = budget.run({**PARAMS, "min_new_tokens": 100}, lambda params: [side(0, 50), side(0, 50)])
+    assert params["max_new_tokens"] == params["min_new_tokens"] == 50
+
+
+def test_failed_rounds_do_not_update_estimates():
+    budget = TokenBudget(enabled=True)
+    budget.observe([side(0.0, 100), (1, "", "boom", {})], depth=1)
+    assert budget.samples == 0
+
+
+def test_adaptive_budget_meets_slo_more_often_during_a_spike():
+    """Test under overload, adaptive budgets keep more rounds within the SLO than the requested ones."""
+
+    def simulate(budget):
+        rng = random.Random(0)
+        requests = [
+            {"model_a": "a", "model_b": "b", "prompt": "Hej", "params": {**PARAMS, "max_new_tokens": 256}}
+            for _ in range(60)
+        ]
+        executor = FakeExecutor(cold_load_s=0.0, slots=2, jitter=0.0, time_scale=500.0, rng=rng)
+        offsets = arrival_times("poisson", len(requests), rate=0.15, rng=rng)
+        return run_load_test(executor, requests, offsets, time_scale=500.0, budget=budget, slo_s=30)
+
+    fixed = simulate(None)
+    adaptive = simulate(TokenBudget(slo_s=30, min_tokens=50, enabled=True))
+
+    assert adaptive["slo_attainment"] > fixed["slo_attainment"] + 0.2
+    assert adaptive["mean_max_new_tokens"] < 256
+    assert adaptive["budget"]["limited"] > 0
@@ -0,0 +1,80 @@
+import pytest
+
+from cpu_affinity import format_cpulist, parse_cpulist, partition_cores
+from executors import LocalSubprocessExecutor
+from hedging import Hedger
+from serving import build_slurm_cmd, generate_pair
+
+PARAMS = {"min_new_tokens": 70, "max_new_tokens": 112, "temperature": 0.7, "repetition_penalty": 1.2}
+
+
+def test_cpulist_round_trip():
+    """Test cpulist parsing and formatting are inverses."""
+    assert parse_cpulist("0-3,8,10-11") == [0, 1, 2, 3, 8, 10, 11]
+    assert format_cpulist([11, 0, 1, 2, 3, 8, 10]) == "0-3,8,10-11"
+
+
+def test_partition_cores_is_disjoint():
+    """Test cores are split into equal disjoint sets without NUMA info."""
+    a, b = partition_cores(2, cores=range(8), numa_nodes={})
+    assert a == [0, 1, 2, 3]
+    assert b == [4, 5, 6, 7]
+
+
+def test_partition_cores_follows_numa_nodes():
+    """Test each worker stays on its own NUMA node when there are enough nodes."""
+    nodes = {0: [0, 2, 4, 6], 1: [1, 3, 5, 7]}
+    a, b = partition_cores(2, cores=range(8), numa_nodes=nodes)
+    assert a == [0, 2, 4, 6]
+    assert b == [1, 3, 5, 7]
+
+
+def test_partition_cores_needs_enough_cores():
+    with pytest.raises(ValueError):
+        partition_cores(2, cores=[0], numa_nodes={})
+
+
+def test_cpu_executor_pins_slots_to_different_cores(monkeypatch):
+    """Test CPU mode pins Model A and Model B to different cores and skips srun."""
+    launched = []
+    monkeypatch.setattr("executors.partition_cores", lambda n: [[0, 1], [2, 3]])
+    monkeypatch.setattr("executors.run_cmd", lambda cmd, cancel_event=None: launched.append(cmd) or (0, "", ""))
+    executor = LocalSubprocessExecutor(pin_cores=True, numa_bind=False)
+    executor.generate("model-a", "Hej", PARAMS, slot=0)
+    executor.generate("model-b", "Hej", PARAMS, slot=1)
+
+    cmd_a, cmd_b = launched
+    assert "srun" not in cmd_a
+    assert cmd_a[cmd_a.index("--cpu_cores") + 1] == "0-1"
+    assert cmd_b[cmd_b.index("--cpu_cores") + 1] == "2-3"
+
+
+def test_cpu_hedge_runs_on_the_other_slots_cores(monkeypatch):
+    """Test a straggling Model A's hedge is pinned to Model B's cores, not to the straggler's own."""
+    launched = []  # (model, cores) per process
+
+    def run_cmd(cmd, cancel_event=None):
+        launched.append((cmd[cmd.index("--model_name") + 1], cmd[cmd.index("--cpu_cores") + 1]))
+        if launched.count(("model-a", "0-1")) == 1 and launched[-1] == ("model-a", "0-1"):
+            # Model A's first attempt stalls until the hedger gives up on it
+            cancel_event.wait(timeout=5)
+            return -15, "", "terminated"
+        return 0, "", ""
+
+    monkeypatch.setattr("executors.partition_cores", lambda n: [[0, 1], [2, 3]])
+    monkeypatch.setattr("executors.run_cmd", run_cmd)
+    executor = LocalSubprocessExecutor(pin_cores=True, numa_bind=False)
+    hedger = Hedger(percentile=95, max_rate=1.0, min_samples=5, enabled=True)
+    for _ in range(5):
+        hedger.latencies.record("model-a", 0.01)
+    generate_pair(executor, "model-a", "model-b", "Hej", PARAMS, hedger=hedger)
+
+    assert executor.hedge_slot(0) == 1 and executor.hedge_slot(1) == 0
+    assert sorted(launched) == [("model-a", "0-1"), ("model-a", "2-3"), ("model-b", "2-3")]
+    assert LocalSubprocessExecutor(pin_cores=False).hedge_slot(0) == 0
+
+
+def test_build_slurm_cmd():
+    cmd = build_slurm_cmd("model-a", "Hej", PARAMS)
+    assert cmd[:2] == ["srun", "--gpus=1"]
+    assert cmd[cmd.index("--model_name") + 1] == "model-a"
@@ -0,0 +1,187 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from executors import InProcessExecutor, LocalSubprocessExecutor, SlurmExecutor
+from tiny_model import build_tiny_model
+
+FAKE_SLURM_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "fake_slurm")
+PARAMS = {"min_new_tokens": 5, "max_new_tokens": 10, "temperature": 0.7, "repetition_penalty": 1.2}
+
+
+@pytest.fixture(scope="module")
+def tiny_models(tmp_path_factory):
+    root = tmp_path_factory.mktemp("models")
+    return [build_tiny_model(str(root / f"tiny-{seed}"), seed=seed) for seed in (0, 1)]
+
+
+@pytest.fixture
+def fake_slurm(monkeypatch, tmp_path):
+    monkeypatch.setenv("PATH", FAKE_SLURM_DIR + os.pathsep + os.environ["PATH"])
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    monkeypatch.delenv("SLURM_JOB_ID", raising=False)
+
+
+def test_fake_srun_runs_command_as_job(fake_slurm):
+    """Test the fake srun strips srun options and runs the command with Slurm env vars."""
+    out = subprocess.run(
+        ["srun", "--gpus=1", "-n", "1", sys.executable, "-c", "import os; print(os.environ['SLURM_JOB_ID'])"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert out.stdout.strip() == "1"
+
+
+def test_slurm_pool_dispatches_to_warm_workers(fake_slurm, tiny_models):
+    """Test workers start once, keep models resident and repeat requests are served warm."""
+    model_a, model_b = tiny_models
+    executor = SlurmExecutor(num_workers=2, srun_args=["--gpus=1"], python_cmd=[sys.executable])
+    try:
+        returncode, text, _, first = executor.generate(model_a, "Det var en gång", PARAMS)
+        assert returncode == 0
+        assert text.startswith("Det var en gång")
+        assert first["cached"] is False
+        assert first["load_s"] > 0
+
+        _, _, _, metrics = executor.generate(model_a, "Det var en gång", PARAMS)
+        assert metrics["cached"] is True
+        assert metrics["load_s"] == 0
+        assert PARAMS["min_new_tokens"] <= metrics["new_tokens"] <= PARAMS["max_new_tokens"]
+        assert metrics["worker"] == first["worker"]
+        # Prewarming a second model fills the idle worker instead of evicting model A
+        executor.prewarm(model_b, threading.Event())
+        executor.generate(model_b, "Hej", PARAMS)
+
+        stats = executor.stats()
+        assert stats["requests"] == 3
+        assert stats["cold_loads"] == 1
+        assert stats["warm_hits"] == 2
+        assert stats["warm_fraction"] == 2 / 3
+        assert sorted(executor.resident_models().values()) == [[model_a], [model_b]]
+    finally:
+        executor.shutdown()
+
+
+def test_slurm_pool_restarts_dead_worker(fake_slurm, tiny_models):
+    """Test a request that finds its worker dead is retried on the replacement, and prewarming never evicts."""
+    model_a, model_b = tiny_models
+    executor = SlurmExecutor(num_workers=1, srun_args=["--gpus=1"], python_cmd=[sys.executable])
+    try:
+        executor.workers[0].start().process.kill()
+        executor.workers[0].process.wait()
+
+        returncode, _, _, _ = executor.generate(model_a, "Hej", PARAMS)
+        assert returncode == 0
+        assert executor.stats()["worker_restarts"] == 1
+
+        executor.prewarm(model_b, threading.Event())
+        assert executor.resident_models() == {0: [model_a]}
+        assert executor.stats()["prewarm_skips"] == 1
+    finally:
+        executor.shutdown()
+
+
+def test_slurm_pool_starts_workers_lazily_and_drops_cancelled_requests(monkeypatch, tmp_path):
+    """Test a pool can be created without srun, and a request cancelled while queued never runs."""
+    monkeypatch.setenv("PATH", str(tmp_path))
+    executor = SlurmExecutor(num_workers=1, srun_args=[], python_cmd=[sys.executable])
+    try:
+        assert executor.workers[0].process is None
+        returncode, _, error, _ = executor.generate("some-model", "Hej", PARAMS)
+        assert returncode == 1
+        assert "could not be started" in error
+        assert executor.stats()["worker_restarts"] == 0
+
+        executor.workers[0].busy = True
+        cancel_event = threading.Event()
+        threading.Timer(0.3, cancel_event.set).start()
+        returncode, _, error, _ = executor.generate("some-model", "Hej", PARAMS, cancel_event=cancel_event)
+        assert returncode == 1
+        assert "before dispatch" in error
+        assert executor.stats()["cancelled"] == 1
+        assert executor.workers[0].queued == 0
+    finally:
+        executor.shutdown()
+
+
+def test_slurm_pool_rebalances_when_workers_join_and_leave(fake_slurm, tiny_models):
+    """Test models follow their preferred worker on a join and are reloaded elsewhere when theirs leaves."""
+    model_a, model_b = tiny_models
+    executor = SlurmExecutor(num_workers=1, srun_args=[], python_cmd=[sys.executable], max_models=2)
+    try:
+        executor.generate(model_a, "Hej", PARAMS)
+        executor.generate(model_b, "Hej", PARAMS)
+        index = executor.add_worker()
+        moved = [m for m in (model_a, model_b) if executor.router.preference(m)[0] == index]
+        assert executor.resident_models()[index] == moved
+        assert executor.stats()["rebalance_loads"] == len(moved)
+        # Every model is still warm on the worker the router sends it to
+        for model in (model_a, model_b):
+            assert executor.generate(model, "Hej", PARAMS)[3]["cached"] is True
+
+        executor.remove_worker(0)
+        assert list(executor.resident_models()) == [index]
+        assert sorted(executor.resident_models()[index]) == sorted([model_a, model_b])
+        assert executor.generate(model_a, "Hej", PARAMS)[3]["worker"].endswith(f"/{index}")
+        with pytest.raises(ValueError):
+            executor.remove_worker(index)
+    finally:
+        executor.shutdown()
+
+
+def test_in_process_executor_keeps_models_loaded(tiny_models):
+    executor = InProcessExecutor(max_models=1)
+    assert executor.generate(tiny_models[0], "Hej", PARAMS)[0] == 0
+    assert executor.generate(tiny_models[0], "Hej", PARAMS)[0] == 0
+    assert executor.stats()["warm_hits"] == 1
+
+    returncode, _, error, _ = executor.generate("/does/not/exist", "Hej", PARAMS)
+    assert returncode == 1
+    assert "Failed to load" in error
+
+
+def test_in_process_prewarm_never_evicts_or_blocks(monkeypatch):
+    """Test prewarming a third model leaves both resident models loaded, and lookups skip a running load."""
+    loading, release = threading.Event(), threading.Event()
+
+    def get_pipeline(model_name, device_id, **kwargs):
+        if model_name == "slow":
+            loading.set()
+            release.wait(timeout=5)
+        return f"pipe-{model_name}"
+
+    monkeypatch.setattr("backend.get_pipeline", get_pipeline)
+    executor = InProcessExecutor(max_models=2)
+    executor.cache.get("model-a")
+    executor.cache.get("model-b")
+
+    executor.prewarm("model-c", threading.Event())
+    assert executor.cache.resident() == ["model-a", "model-b"]
+    assert executor.stats()["prewarm_skips"] == 1
+
+    # A live round evicts as usual, and a resident model is served while another one loads
+    executor.cache.get("model-a")
+    load = threading.Thread(target=executor.cache.get, args=("slow",))
+    load.start()
+    assert loading.wait(timeout=5)
+    assert executor.cache.get("model-a") == ("pipe-model-a", True)
+    release.set()
+    load.join(timeout=5)
+    assert executor.cache.resident() == ["model-a", "slow"]
+
+
+def test_local_executor_reads_backend_metrics(tiny_models, monkeypatch):
+    """Test a one-shot backend.py run reports its metrics record back through stderr."""
+    monkeypatch.setattr("serving.PYTHON_CMD", [sys.executable])
+    returncode, text, _, metrics = LocalSubprocessExecutor().generate(tiny_models[0], "Hej", PARAMS)
+
+    assert returncode == 0
+    assert text.startswith("Hej")
+    assert metrics["cached"] is False
+    assert metrics["stop_reason"] in ("eos", "max_new_tokens")
+    # Interpreter start-up is accounted as waiting, not as loading or generating
+    assert metrics["queue_wait_s"] > 0
@@ -0,0 +1,66 @@
+import shutil
+
+import pytest
+import torch
+from safetensors.torch import save_file
+from transformers import AutoModelForCausalLM, AutoTokenizer, PretrainedConfig
+
+from backend import get_load_timings, get_pipeline
+from fast_load import FastLoadUnsupported, _model_class, _read_shard, load_model_fast
+from tiny_model import build_tiny_model
+
+
+@pytest.fixture(scope="module")
+def sharded_model(tmp_path_factory):
+    """A bfloat16 checkpoint split into several safetensors shards, like the released models."""
+    root = tmp_path_factory.mktemp("models")
+    source = build_tiny_model(str(root / "tiny"), hidden_size=128, dtype=torch.bfloat16)
+    sharded = str(root / "sharded")
+    AutoModelForCausalLM.from_pretrained(source, dtype=torch.bfloat16).save_pretrained(sharded, max_shard_size="200KB")
+    AutoTokenizer.from_pretrained(source).save_pretrained(sharded)
+    return sharded
+
+
+def test_fast_load_matches_standard_load(sharded_model):
+    """Test meta init + streamed shards give the same float32 model as the standard loader."""
+    standard = get_pipeline(sharded_model, 0)
+    fast = get_pipeline(sharded_model, 0, fast_load=True)
+
+    assert fast.model.dtype == torch.float32
+    input_ids = torch.tensor([[1, 5, 9, 13]])
+    with torch.no_grad():
+        assert torch.equal(standard.model(input_ids).logits, fast.model(input_ids).logits)
+
+
+def test_load_timings_break_down_phases(sharded_model):
+    pipe = get_pipeline(sharded_model, 0, fast_load=True)
+    timings = get_load_timings(pipe)
+
+    assert list(timings)[:6] == ["resolve", "config", "import", "init", "weights", "finalize"]
+    assert all(seconds >= 0 for seconds in timings.values())
+    standard = get_load_timings(get_pipeline(sharded_model, 0))
+    assert list(standard) == ["config", "weights", "dtype", "placement", "tokenizer", "pipeline"]
+
+
+def test_fast_load_needs_safetensors(sharded_model, tmp_path):
+    shutil.copy(f"{sharded_model}/config.json", tmp_path)
+    with pytest.raises(FastLoadUnsupported):
+        load_model_fast(str(tmp_path))
+
+
+def test_unknown_architectures_are_unsupported(tmp_path):
+    with pytest.raises(FastLoadUnsupported):
+        _model_class(PretrainedConfig(), str(tmp_path))
+
+
+def test_read_shard_converts_only_other_dtypes(tmp_path):
+    path = str(tmp_path / "shard.safetensors")
+    save_file({"bf16": torch.ones(2, dtype=torch.bfloat16), "f32": torch.ones(2), "ids": torch.arange(2)}, path)
+    tensors = _read_shard(path, torch.float32, torch.device("cpu"))
+
+    assert {name: t.dtype for name, t in tensors.items()} == {
+        "bf16": torch.float32,
+        "f32": torch.float32,
+        "ids": torch.int64,
+    }
+    assert torch.equal(tensors["bf16"], torch.ones(2))
@@ -0,0 +1,108 @@
+import random
+import threading
+import time
+
+from executors import InProcessExecutor, SlurmExecutor
+from hedging import Hedger, LatencyTracker
+from serving import generate_pair, run_cmd
+
+
+def test_latency_tracker_percentiles_and_histogram():
+    tracker = LatencyTracker()
+    for seconds in [0.5, 1.5, 3, 3, 100]:
+        tracker.record("model", seconds)
+
+    assert tracker.percentile("model", 50) == 3
+    assert tracker.percentile("model", 99) == 100
+    assert tracker.percentile("other", 50) is None
+    histogram = dict(tracker.histogram("model"))
+    assert histogram[1] == 1
+    assert histogram[5] == 4
+    assert histogram[float("inf")] == 5
+
+
+def test_straggler_is_hedged_and_loser_cancelled():
+    """Test a stalled attempt gets a backup, the backup wins and the stalled one is cancelled."""
+    hedger = Hedger(percentile=95, max_rate=1.0, min_samples=5, enabled=True)
+    for _ in range(5):
+        hedger.latencies.record("model", 0.01)
+    calls = []
+
+    def attempt(cancel_event):
+        calls.append(cancel_event)
+        if len(calls) == 1:
+            # Stalls until the hedger gives up on it
+            cancel_event.wait(timeout=5)
+            return -15, "", "terminated"
+        return 0, "backup output", ""
+
+    delay = hedger.hedge_delay("model")
+    assert hedger.run("model", attempt) == (0, "backup output", "")
+    assert calls[0].is_set()
+    assert hedger.stats()["hedge_wins"] == 1
+    assert hedger.stats()["cancelled"] == 1
+    # The round took the stalled attempt's wait plus the backup, not just the backup's own time
+    assert hedger.latencies.percentile("model", 100) >= delay
+
+
+def test_executors_that_cannot_cancel_a_duplicate_are_not_hedged():
+    """Test generate_pair runs a side once, without the hedger, on an executor with no hedge slot."""
+    calls = []
+
+    class Executor:
+        def hedge_slot(self, slot):
+            return None
+
+        def generate(self, model_name, prompt, params, slot=0, cancel_event=None):
+            calls.append(model_name)
+            return 0, "ok", "", {}
+
+    hedger = Hedger(percentile=95, max_rate=1.0, min_samples=0, enabled=True)
+    assert [r[1] for r in generate_pair(Executor(), "a", "b", "Hej", {}, hedger=hedger)] == ["ok", "ok"]
+    assert sorted(calls) == ["a", "b"]
+    assert hedger.stats()["requests"] == 0
+    assert InProcessExecutor.hedge_slot(None, 0) is None and SlurmExecutor.hedge_slot(None, 0) is None
+
+
+def test_no_hedge_without_history():
+    hedger = Hedger(min_samples=20, enabled=True)
+    assert hedger.run("model", lambda cancel_event: (0, "ok", "")) == (0, "ok", "")
+    assert hedger.stats()["hedged"] == 0
+
+
+def test_hedging_cuts_tail_latency_with_bounded_load():
+    """Test p99 of heavy-tailed jobs improves while hedging stays within max_rate."""
+
+    def run_requests(hedger, n=200, seed=0):
+        rng = random.Random(seed)
+
+        def attempt(cancel_event):
+            # 5% of attempts straggle (cold cache, contended node)
+            cancel_event.wait(0.2 if rng.random() < 0.05 else 0.005)
+            return 0, "ok", ""
+
+        latencies = []
+        for _ in range(n):
+            start = time.monotonic()
+            hedger.run("model", attempt)
+            latencies.append(time.monotonic() - start)
+        return sorted(latencies)[int(0.99 * n) - 1]
+
+    baseline = Hedger(enabled=False)
+    hedged = Hedger(percentile=90, max_rate=0.1, min_samples=20, enabled=True)
+    baseline_p99 = run_requests(baseline)
+    hedged_p99 = run_requests(hedged)
+
+    assert hedged_p99 < baseline_p99 / 2
+    assert hedged.stats()["hedge_rate"] <= 0.1
+
+
+def test_run_cmd_terminates_cancelled_process():
+    """Test a cancelled backend process is killed instead of being waited on."""
+    cancel_event = threading.Event()
+    threading.Timer(0.1, cancel_event.set).start()
+    start = time.monotonic()
+    returncode, _, _ = run_cmd(["sleep", "30"], cancel_event)
+
+    assert returncode != 0
+    assert time.monotonic() - start < 5
@@ -0,0 +1,86 @@
+import random
+
+import pandas as pd
+import pytest
+
+from loadgen import (
+    DEFAULT_PARAMS,
+    FakeExecutor,
+    arrival_times,
+    load_replay_requests,
+    repeat_requests,
+    run_load_test,
+)
+
+
+def make_results(n=4):
+    return pd.DataFrame(
+        {
+            "Timestamp": [f"2025-11-28 10:00:{i * 10:02d}" for i in range(n)],
+            "Language": ["Swedish"] * n,
+            "Prompt": [f"Prompt {i}" for i in range(n)],
+            "Model_A_Name": ["multisynt"] * n,
+            "Model_B_Name": ["hplt"] * n,
+        }
+    )
+
+
+def test_replay_requests_use_logged_settings_when_present():
+    results = make_results()
+    results["Max_New_Tokens"] = [64, 64, None, 64]
+    requests = load_replay_requests(results)
+
+    assert [r["prompt"] for r in requests] == ["Prompt 0", "Prompt 1", "Prompt 2", "Prompt 3"]
+    assert requests[0]["params"]["max_new_tokens"] == 64
+    assert requests[2]["params"] == DEFAULT_PARAMS
+
+    # A round whose budget was lowered under load replays what the user asked for
+    results["Requested_Max_New_Tokens"] = [128, 64, None, 64]
+    assert load_replay_requests(results)[0]["params"]["max_new_tokens"] == 128
+
+
+def test_arrival_times():
+    assert arrival_times("constant", 3, rate=2) == [0, 0.5, 1.0]
+
+    poisson = arrival_times("poisson", 2000, rate=4, rng=random.Random(0))
+    assert poisson[-1] / 2000 == pytest.approx(0.25, rel=0.1)
+
+    timestamps = [pd.Timestamp(t) for t in ["2025-01-01 10:00", "2025-01-01 10:01", "2025-01-02 10:00"]]
+    # One minute compressed 60x is 1s; the overnight gap is capped
+    assert arrival_times("historical", 3, timestamps=timestamps, speedup=60, max_gap=5) == [0, 1, 6]
+
+
+def test_repeated_log_keeps_historical_time_moving_forward():
+    requests = repeat_requests(load_replay_requests(make_results(4)), 10)
+
+    assert [r["prompt"] for r in requests[3:6]] == ["Prompt 3", "Prompt 0", "Prompt 1"]
+    offsets = arrival_times("historical", 10, timestamps=[r["timestamp"] for r in requests])
+    # 10s between logged rounds, and between the end of one repetition and the start of the next
+    assert offsets == [10.0 * i for i in range(10)]
+    assert repeat_requests(requests, 2) == requests[:2]
+
+
+def test_overload_builds_a_queue():
+    """Test latency and queue depth grow once arrivals outpace the backend's capacity."""
+    requests = load_replay_requests(make_results()) * 5
+    params = {"base_latency_s": 1.0, "tokens_per_s": 1e9, "cold_load_s": 0, "jitter": 0, "time_scale": 50}
+
+    light = run_load_test(
+        FakeExecutor(slots=2, **params), requests, arrival_times("constant", 20, rate=0.5), time_scale=50
+    )
+    heavy = run_load_test(
+        FakeExecutor(slots=2, **params), requests, arrival_times("constant", 20, rate=4), time_scale=50
+    )
+
+    assert light["rounds"] == heavy["rounds"] == 20
+    assert light["p99_s"] == pytest.approx(1.0, abs=0.3)
+    assert heavy["p99_s"] > 3 * light["p99_s"]
+    assert heavy["max_queue_depth"] > light["max_queue_depth"]
+
+
+def test_backend_errors_are_counted():
+    executor = FakeExecutor(base_latency_s=0, cold_load_s=0, tokens_per_s=1e9, error_rate=1.0)
+    report = run_load_test(executor, load_replay_requests(make_results()), [0, 0, 0, 0])
+
+    assert report["error_rate"] == 1.0
+    assert report["p50_s"] is None
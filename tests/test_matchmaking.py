@@ -0,0 +1,47 @@
+import random
+
+import pandas as pd
+import pytest
+
+from matchmaking import MatchupScheduler
+
+MODELS_DB = {
+    "Swedish": {"multisynt": ["ms/tower", "ms/opus"], "hplt": "hplt/swe"},
+    "Basque": {"multisynt": ["ms/basque"], "hplt": "hplt/eus"},
+}
+
+
+def test_from_results_counts_votes():
+    """Test logged votes feed the posteriors and unknown pairs are ignored."""
+    results = pd.DataFrame(
+        {
+            "Language": ["Swedish", "Swedish", "Swedish", "Norwegian (Bokmål)"],
+            "Model_A_Name": ["ms/tower", "ms/tower", "ms/tower", "ms/nob"],
+            "Winner_Source": ["MultiSynt", "HPLT", "Tie", "HPLT"],
+        }
+    )
+    scheduler = MatchupScheduler.from_results(results, models_db=MODELS_DB)
+    assert scheduler.posteriors[("Swedish", "ms/tower")] == [2.5, 2.5]
+    assert scheduler.stats("Swedish", "ms/tower")["votes"] == 3
+
+
+def test_uncertainty_prefers_unresolved_pair():
+    """Test a clearly resolved pair stops receiving votes while the other is still open."""
+    scheduler = MatchupScheduler(models_db=MODELS_DB, strategy="uncertainty", rng=random.Random(0))
+    for _ in range(40):
+        scheduler.update("Swedish", "ms/tower", "HPLT")
+    assert scheduler.is_resolved("Swedish", "ms/tower")
+
+    picks = {scheduler.choose_multisynt("Swedish") for _ in range(20)}
+    assert picks == {"ms/opus"}
+
+
+@pytest.mark.parametrize("strategy", ["uniform", "uncertainty", "thompson"])
+def test_single_option_language(strategy):
+    scheduler = MatchupScheduler(models_db=MODELS_DB, strategy=strategy)
+    assert scheduler.choose_multisynt("Basque") == "ms/basque"
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        MatchupScheduler(models_db=MODELS_DB, strategy="round-robin")
@@ -0,0 +1,127 @@
+import threading
+import time
+
+from loadgen import FakeExecutor
+from matchup_pool import POOL_PARAM_SETS, MatchupPool
+
+MODELS_DB = {
+    "Swedish": {"multisynt": ["MultiSynt/sv"], "hplt": "HPLT/sv"},
+    "Finnish": {"multisynt": ["MultiSynt/fi"], "hplt": "HPLT/fi"},
+}
+PROMPTS = {"Swedish": ["Det var en gång "], "Finnish": ["Olipa kerran "]}
+PARAMS = POOL_PARAM_SETS[0]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_pool(clock=None, **kwargs):
+    executor = FakeExecutor(base_latency_s=0, cold_load_s=0, tokens_per_s=1e9, jitter=0)
+    return MatchupPool(
+        executor,
+        lambda language: MODELS_DB[language]["multisynt"][0],
+        models_db=MODELS_DB,
+        prompts=PROMPTS,
+        clock=clock or time.monotonic,
+        **{"enabled": True, **kwargs},
+    )
+
+
+def test_pool_fills_every_slot_and_serves_each_pair_once():
+    pool = make_pool(per_prompt=2)
+    while pool.produce_once():
+        pass
+
+    assert pool.stats()["ready_by_language"] == {"Swedish": 2, "Finnish": 2}
+    first = pool.take("Swedish", "Det var en gång ", PARAMS)
+    second = pool.take("Swedish", "Det var en gång ", PARAMS)
+    assert first is not second
+    assert (first["multisynt"], first["hplt"]) == ("MultiSynt/sv", "HPLT/sv")
+    assert first["side_a"][1].startswith("Det var en gång ")
+    assert pool.take("Swedish", "Det var en gång ", PARAMS) is None
+
+    # Other settings or prompts are never pooled
+    assert pool.take("Finnish", "Olipa kerran ", {**PARAMS, "temperature": 1.0}) is None
+    assert pool.take("Finnish", "Hei", PARAMS) is None
+    stats = pool.stats()
+    assert (stats["lookups"], stats["eligible"], stats["hits"]) == (5, 3, 2)
+    assert stats["ready"] == 2
+
+
+def test_stale_pairs_are_not_served():
+    clock = Clock()
+    pool = make_pool(clock=clock, per_prompt=1, max_age_s=60)
+    while pool.produce_once():
+        pass
+
+    clock.now += 61
+    assert pool.take("Swedish", "Det var en gång ", PARAMS) is None
+    assert pool.stats()["expired"] == 2
+    # Expired slots are open again
+    assert pool.produce_once()
+
+
+def test_producer_only_uses_idle_capacity():
+    pool = make_pool(per_prompt=1, idle_grace_s=0.2, poll_s=0.01)
+    with pool.live():
+        pool.start()
+        time.sleep(0.3)
+        assert pool.stats()["produced"] == 0
+
+    deadline = time.monotonic() + 5
+    while pool.stats()["ready"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    pool.shutdown()
+
+    stats = pool.stats()
+    assert stats["produced"] == 2
+    assert 0 < stats["idle_utilization"] <= 1
+
+
+def test_live_round_cancels_production_and_cold_models_are_skipped():
+    """Test a pair in production is dropped when a live round starts, and no model is loaded to make room."""
+    pool = make_pool(per_prompt=1)
+    pool.executor.base_latency_s = 5
+    producer = threading.Thread(target=pool.produce_once)
+    producer.start()
+    time.sleep(0.2)
+    with pool.live():
+        producer.join(timeout=2)
+    assert not producer.is_alive()
+    assert (pool.stats()["cancelled"], pool.stats()["ready"]) == (1, 0)
+
+    pool.executor.fits_without_eviction = lambda model_names: False
+    assert not pool.produce_once()
+    assert (pool.stats()["skipped_cold"], pool.stats()["ready"]) == (1, 0)
+
+
+def test_producer_stops_once_the_app_is_unused():
+    clock = Clock()
+    pool = make_pool(clock=clock, idle_grace_s=5, max_age_s=60)
+    assert not pool.is_idle()
+    clock.now += 5
+    assert pool.is_idle()
+    clock.now += 60
+    assert not pool.is_idle()
+    with pool.live():
+        pass
+    clock.now += 5
+    assert pool.is_idle()
+
+
+def test_production_is_capped_per_refill():
+    """Test the producer starts at most max_per_refill generations per max_age_s, even with slots open."""
+    clock = Clock()
+    pool = make_pool(clock=clock, per_prompt=5, max_age_s=60, max_per_refill=3)
+    while pool.produce_once():
+        pass
+
+    stats = pool.stats()
+    assert (stats["produced"], stats["skipped_budget"], stats["ready"]) == (3, 1, 3)
+    clock.now += 61
+    assert pool.produce_once()
@@ -0,0 +1,95 @@
+import threading
+import time
+import urllib.request
+
+import pytest
+
+import metrics
+import profiling
+from metrics import Registry, observe_generation, start_metrics_server
+from profiling import SlowestProfiles
+
+
+def test_prometheus_text_format():
+    registry = Registry()
+    requests = registry.counter("arena_test_requests_total", "Requests.", ["model"])
+    latency = registry.histogram("arena_test_seconds", "Latency.", ["model"], buckets=(1, 5))
+    registry.add_collector("arena_test_executor", lambda: {"requests": 3, "executor": "fake"})
+
+    requests.inc(model='say "hi"')
+    latency.observe(0.5, model="a")
+    latency.observe(3, model="a")
+    text = registry.render()
+
+    assert "# TYPE arena_test_requests_total counter" in text
+    assert 'arena_test_requests_total{model="say \\"hi\\""} 1' in text
+    assert 'arena_test_seconds_bucket{model="a",le="1"} 1' in text
+    assert 'arena_test_seconds_bucket{model="a",le="5"} 2' in text
+    assert 'arena_test_seconds_bucket{model="a",le="+Inf"} 2' in text
+    assert 'arena_test_seconds_sum{model="a"} 3.5' in text
+    assert "arena_test_executor_requests 3" in text
+    assert "arena_test_executor_executor" not in text
+
+
+def test_observe_generation_records_outcomes():
+    model = "test-observe-model"
+    observe_generation(model, lambda: (0, "x", "", {"cached": False, "load_s": 7.0, "new_tokens": 40, "decode_s": 2.0}))
+    observe_generation(model, lambda: (0, "x", "", {"cached": True, "new_tokens": 40, "decode_s": 2.0}))
+    observe_generation(model, lambda: (1, "", "boom", {}))
+    with pytest.raises(RuntimeError):
+        observe_generation(model, lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+
+    assert metrics.GENERATION_REQUESTS.value(model=model) == 4
+    assert metrics.GENERATION_ERRORS.value(model=model) == 2
+    assert metrics.GENERATIONS_IN_FLIGHT.value(model=model) == 0
+    assert metrics.CACHE_HITS.value(model=model) == 1
+    assert metrics.COLD_LOADS.value(model=model) == 1
+    assert metrics.LOAD_SECONDS.count(model=model) == 1
+    assert metrics.TOKENS_PER_SECOND.count(model=model) == 2
+
+
+def test_metrics_endpoint():
+    registry = Registry()
+    registry.counter("arena_test_total", "Test.").inc()
+    server = start_metrics_server(0, registry, host="127.0.0.1")
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "arena_test_total 1" in response.read().decode()
+    finally:
+        server.shutdown()
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+def test_profiler_keeps_slowest_generations(tmp_path):
+    profiler = SlowestProfiles(keep=2, directory=str(tmp_path), interval_ms=1)
+    for seconds in (0.05, 0.2, 0.1, 0.02):
+        with profiler.profile("model/a"):
+            busy(seconds)
+
+    kept = profiler.profiles()
+    assert [round(SlowestProfiles._duration(p), 1) for p in kept] == [0.2, 0.1]
+    with open(kept[0]) as f:
+        stack, count = f.readline().rsplit(" ", 1)
+    assert "busy (test_metrics.py:" in stack.split(";")[-1]
+    assert int(count) > 0
+
+
+def test_disabled_profiler_never_samples(tmp_path, monkeypatch):
+    """Test the disabled hook is one shared no-op: no sampler, no thread, no allocation per generation, no files."""
+    monkeypatch.setattr(profiling, "StackSampler", lambda *args: pytest.fail("the disabled profiler sampled"))
+    profiler = SlowestProfiles(keep=0, directory=str(tmp_path))
+    threads = threading.active_count()
+
+    for _ in range(1000):
+        with profiler.profile("model"):
+            pass
+    # Every generation gets the same context manager, so the hook allocates nothing per call
+    assert profiler.profile("model/a") is profiler.profile("model/b")
+    assert threading.active_count() == threads
+    assert profiler.profiles() == []
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from perf_suite import BASELINES_FILE, METRICS, compare, hardware_key, load_baseline, run_suite, save_baseline
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"load_s": 1.0, "tokens_per_s": 100.0, "batch_tokens_per_s": 1000.0, "results_parse_s": 0.1}
+    assert compare(dict(baseline), baseline) == []
+
+    slower = {**baseline, "load_s": 2.5, "tokens_per_s": 40.0}
+    regressions = compare(slower, baseline)
+    assert [r.split(":")[0] for r in regressions] == ["load_s", "tokens_per_s"]
+    # Improvements never count as regressions
+    assert compare({**baseline, "load_s": 0.1, "tokens_per_s": 1000.0}, baseline) == []
+    assert compare(slower, baseline, tolerance_scale=10) == []
+
+
+def test_baselines_are_versioned_per_machine(tmp_path, monkeypatch):
+    path = str(tmp_path / "baselines.json")
+    save_baseline({"load_s": 1.0}, path, hardware="machine-a")
+    save_baseline({"load_s": 2.0}, path, hardware="machine-b")
+
+    assert load_baseline(path, hardware="machine-a")["metrics"] == {"load_s": 1.0}
+    assert load_baseline(path, hardware="machine-c") is None
+    monkeypatch.setattr("perf_suite.BASELINE_VERSION", 2)
+    assert load_baseline(path, hardware="machine-a") is None
+
+
+@pytest.mark.skipif(os.environ.get("ARENA_PERF_TESTS") == "0", reason="wall-clock test disabled by ARENA_PERF_TESTS=0")
+def test_no_performance_regression():
+    """
+    Test the CPU hot paths against this machine's committed baseline (record one with `perf_suite.py --update`).
+    Machines without one are skipped, unless ARENA_PERF_TESTS=1 (CI) makes that a failure.
+    """
+    baseline = load_baseline()
+    if baseline is None:
+        message = f"no performance baseline for {hardware_key()!r} in {BASELINES_FILE}"
+        if os.environ.get("ARENA_PERF_TESTS") == "1":
+            pytest.fail(f"{message}; record one with `perf_suite.py --update` and commit it")
+        pytest.skip(message)
+    results = run_suite()
+
+    assert set(results) == set(METRICS)
+    scale = float(os.environ.get("ARENA_PERF_TOLERANCE_SCALE", "1"))
+    regressions = compare(results, baseline["metrics"], scale)
+    assert not regressions, "Performance regressed:\n" + "\n".join(regressions)
@@ -0,0 +1,119 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import huggingface_hub
+import pytest
+
+from prewarm import PrewarmCancelled, Prewarmer, models_for_language, resolve_model_dir
+
+MODELS_DB = {
+    "Swedish": {"multisynt": ["ms/swe-tower", "ms/swe-opus"], "hplt": "hplt/swe"},
+    "Danish": {"multisynt": ["ms/dan-tower"], "hplt": "hplt/dan"},
+}
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_models_for_language():
+    assert models_for_language("Swedish", MODELS_DB) == ["hplt/swe", "ms/swe-tower", "ms/swe-opus"]
+
+
+def test_prewarm_dedup_and_hits():
+    """Test concurrent sessions share one warm job per model and generations count as hits."""
+    calls = []
+    prewarmer = Prewarmer(warm_fn=lambda model, cancel: calls.append(model), models_db=MODELS_DB)
+
+    prewarmer.request("session-1", "Danish")
+    prewarmer.request("session-2", "Danish")
+    wait_for(lambda: prewarmer.stats()["completed"] == 2)
+
+    assert sorted(calls) == ["hplt/dan", "ms/dan-tower"]
+    assert prewarmer.stats()["deduplicated"] == 2
+    assert prewarmer.record_use("hplt/dan") is True
+    assert prewarmer.record_use("hplt/swe") is False
+    assert prewarmer.stats()["hit_rate"] == 0.5
+    prewarmer.shutdown()
+
+
+def test_load_time_saved_is_measured_against_cold_loads():
+    prewarmer = Prewarmer(warm_fn=lambda model, cancel: None, models_db=MODELS_DB)
+    prewarmer.request("session-1", "Danish")
+    wait_for(lambda: prewarmer.stats()["completed"] == 2)
+
+    # No cold load of hplt/dan measured yet: the hit saves nothing we know of
+    prewarmer.record_use("hplt/dan", load_s=2.0)
+    assert prewarmer.stats()["load_time_saved_s"] == 0.0
+    prewarmer.record_use("hplt/swe", load_s=12.0)
+    prewarmer._cold_load_s["hplt/dan"] = 10.0
+    prewarmer.record_use("hplt/dan", load_s=2.0)
+    assert prewarmer.stats()["load_time_saved_s"] == 8.0
+    assert prewarmer._cold_load_s["hplt/swe"] == 12.0
+    prewarmer.shutdown()
+
+
+def test_gone_sessions_are_forgotten():
+    """Test sessions that stop asking are pruned and no longer keep their models' warming alive."""
+    started = threading.Event()
+
+    def slow_warm(model, cancel_event):
+        started.set()
+        while not cancel_event.is_set():
+            time.sleep(0.01)
+        raise PrewarmCancelled(model)
+
+    prewarmer = Prewarmer(warm_fn=slow_warm, max_workers=1, models_db=MODELS_DB, session_ttl=0)
+    prewarmer.request("session-1", "Swedish")
+    started.wait(timeout=5)
+    prewarmer.request("session-2", "Danish")
+
+    assert list(prewarmer._session_models) == ["session-2"]
+    assert prewarmer.stats()["sessions_expired"] == 1
+    assert prewarmer.stats()["cancelled"] == 3
+    prewarmer.shutdown()
+
+
+def test_hub_download_checks_cancel_between_files(monkeypatch):
+    siblings = [SimpleNamespace(rfilename=name) for name in ("config.json", "model.safetensors", "README.md")]
+    monkeypatch.setattr(
+        huggingface_hub.HfApi, "model_info", lambda self, repo_id: SimpleNamespace(siblings=siblings, sha="abc")
+    )
+    downloaded = []
+
+    def download(repo_id, filename, revision):
+        downloaded.append(filename)
+        return f"/cache/snapshots/{revision}/{filename}"
+
+    monkeypatch.setattr(huggingface_hub, "hf_hub_download", download)
+    assert resolve_model_dir("org/model", threading.Event()) == "/cache/snapshots/abc"
+    assert downloaded == ["config.json", "model.safetensors"]
+
+    cancel_event = threading.Event()
+    monkeypatch.setattr(huggingface_hub, "hf_hub_download", lambda *args, **kwargs: cancel_event.set())
+    with pytest.raises(PrewarmCancelled):
+        resolve_model_dir("org/model", cancel_event)
+
+
+def test_prewarm_cancelled_on_language_switch():
+    """Test switching language cancels in-flight warming nobody else needs."""
+    started = threading.Event()
+
+    def slow_warm(model, cancel_event):
+        started.set()
+        while not cancel_event.is_set():
+            time.sleep(0.01)
+        raise PrewarmCancelled(model)
+
+    prewarmer = Prewarmer(warm_fn=slow_warm, max_workers=1, models_db=MODELS_DB)
+    prewarmer.request("session-1", "Swedish")
+    started.wait(timeout=5)
+    prewarmer.request("session-1", "Danish")
+
+    assert prewarmer.stats()["cancelled"] == 3
+    prewarmer.shutdown()
+    assert prewarmer.stats()["completed"] == 0
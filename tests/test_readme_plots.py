@@ -0,0 +1,50 @@
+import csv
+import os
+import sys
+
+import pandas as pd
+
+# Importable by name, so the render worker processes can unpickle its functions
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import generate_readme_plots as plots  # noqa: E402
+
+
+def write_votes(path, rows):
+    pd.DataFrame(
+        rows, columns=["Timestamp", "Language", "Prompt", "Winner_Source"]
+    ).to_csv(path, index=False)
+
+
+def test_aggregates_match_per_plot_queries():
+    df = pd.DataFrame(
+        {
+            "Timestamp": ["2025-11-28 10:00:00", "2025-11-28 11:00:00", "2025-11-29 10:00:00"],
+            "Language": ["Swedish", "Swedish", "Finnish"],
+            "Winner_Source": ["HPLT", "Tie", "MultiSynt"],
+        }
+    )
+    aggregates = plots.compute_aggregates(df)
+
+    assert aggregates["win_rate_by_language"].loc["Swedish"].to_dict() == {"HPLT": 50.0, "MultiSynt": 0.0, "Tie": 50.0}
+    assert aggregates["votes_over_time"].tolist() == [2, 1]
+    assert aggregates["votes_count_by_language"].to_dict() == {"Finnish": 1, "Swedish": 2}
+
+
+def test_only_plots_with_changed_inputs_are_rendered(tmp_path):
+    results, assets = str(tmp_path / "results.csv"), str(tmp_path / "assets")
+    rows = [["2025-11-28 10:00:00", "Swedish", "Hej", "HPLT"], ["2025-11-28 11:00:00", "Finnish", "Moi", "Tie"]]
+    write_votes(results, rows)
+
+    assert sorted(plots.generate_plots(results, assets)) == sorted(plots.PLOTS)
+    assert plots.generate_plots(results, assets) == []
+
+    # A column no plot uses changes: the file is re-read but nothing is rendered
+    write_votes(results, [[*row[:2], row[2] + "!", row[3]] for row in rows])
+    assert plots.generate_plots(results, assets) == []
+
+    # Another Swedish win for HPLT changes the vote counts but not Swedish's 100% HPLT win rate
+    with open(results, "a", newline="") as f:
+        csv.writer(f).writerow(["2025-11-29 12:00:00", "Swedish", "Hej igen", "HPLT"])
+    assert sorted(plots.generate_plots(results, assets)) == ["votes_count_by_language", "votes_over_time"]
+    assert all(os.path.getsize(os.path.join(assets, f"{name}.png")) > 0 for name in plots.PLOTS)
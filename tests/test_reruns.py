@@ -0,0 +1,47 @@
+import inspect
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from serving import generate_pair
+
+rerun_timing = pytest.importorskip("rerun_timing", reason="the rerun harness does not support this Streamlit")
+BOUNDS, RELATIVE_BOUNDS, check = rerun_timing.BOUNDS, rerun_timing.RELATIVE_BOUNDS, rerun_timing.check
+
+RERUN_TIMING = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rerun_timing.py")
+
+
+def test_check_flags_absolute_and_relative_bounds():
+    # Fragment reruns at a fraction of the full reruns
+    timings = {rerun_type: bound / 10 for rerun_type, bound in BOUNDS.items()}
+    timings.update({rerun_type: BOUNDS[full_rerun] / 100 for rerun_type, (full_rerun, _) in RELATIVE_BOUNDS.items()})
+    assert check(timings) == []
+
+    # A widget that fell out of its fragment: still fast, but as slow as the whole page
+    slow = {**timings, "first_load": 0.01, "vote": 0.01}
+    assert [failure.split(":")[0] for failure in check(slow)] == ["vote"]
+    assert [failure.split(":")[0] for failure in check({**timings, "dashboard_open": 2.0})] == ["dashboard_open"]
+    assert check({**timings, "dashboard_open": 2.0}, scale=2) == []
+    assert set(RELATIVE_BOUNDS) <= set(BOUNDS)
+
+
+def test_stub_generate_pair_matches_generate_pair():
+    stub = list(inspect.signature(rerun_timing._stub_generate_pair).parameters)
+    assert stub[:5] == list(inspect.signature(generate_pair).parameters)[:5]
+    assert rerun_timing._stub_generate_pair(None, "a", "b", "Hej", {})[0][1] == "Hej ..."
+
+
+@pytest.mark.skipif(os.environ.get("ARENA_PERF_TESTS") != "1", reason="wall-clock test; set ARENA_PERF_TESTS=1")
+def test_reruns_stay_within_bounds(tmp_path):
+    """Test every rerun type against its bounds, in its own process so the app reads the harness settings."""
+    output = tmp_path / "timings.json"
+    scale = os.environ.get("ARENA_PERF_TOLERANCE_SCALE", "1")
+    command = [sys.executable, RERUN_TIMING, "--repeats", "3", "--bound_scale", scale, "--json", str(output)]
+    process = subprocess.run(command, capture_output=True, text=True, timeout=600)
+
+    assert output.exists(), process.stderr[-2000:]
+    assert set(json.loads(output.read_text())) == set(BOUNDS)
+    assert process.returncode == 0, process.stdout
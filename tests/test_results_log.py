@@ -0,0 +1,125 @@
+import csv
+
+import pandas as pd
+
+from results_log import (
+    SCHEMA_VERSION,
+    SCHEMAS,
+    VOTE_COLUMNS,
+    append_vote,
+    generation_metrics,
+    read_results,
+    schema_version,
+    vote_row,
+)
+
+PARAMS = {"min_new_tokens": 70, "max_new_tokens": 112, "temperature": 0.7, "repetition_penalty": 1.2}
+
+
+def make_vote(i=0):
+    return {
+        "Timestamp": f"2025-11-28 10:00:0{i}",
+        "Language": "Swedish",
+        "Prompt": "Det var en gång",
+        "Model_A_Name": "MultiSynt/a",
+        "Model_B_Name": "HPLT/b",
+        "Output_A": "Det var en gång\\nen katt",
+        "Output_B": "Det var en gång en hund",
+        "Swapped": True,
+        "Winner_Position": "Left",
+        "Winner_Source": "HPLT",
+    }
+
+
+def metrics(decode_s, stop_reason="max_new_tokens"):
+    return {
+        "cached": True,
+        "load_s": 0.0,
+        "queue_wait_s": 0.5,
+        "prefill_s": 0.25,
+        "decode_s": decode_s,
+        "prompt_tokens": 6,
+        "new_tokens": 112,
+        "stop_reason": stop_reason,
+        "worker": "gpu-node-1/0",
+    }
+
+
+def test_old_log_is_migrated_before_appending(tmp_path):
+    """Test a version 1 log keeps its rows unchanged and gains the new columns."""
+    path = str(tmp_path / "results.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(VOTE_COLUMNS)
+        writer.writerow(make_vote(0).values())
+    assert schema_version(path) == 1
+
+    append_vote(vote_row(make_vote(1), PARAMS, metrics(4.0), metrics(6.0, "eos")), path)
+
+    assert schema_version(path) == SCHEMA_VERSION
+    df = read_results(path)
+    assert list(df.columns) == SCHEMAS[SCHEMA_VERSION]
+    assert df["Schema_Version"].tolist() == [1, SCHEMA_VERSION]
+    assert df["Output_A"].tolist() == ["Det var en gång\\nen katt"] * 2
+    assert pd.isna(df.loc[0, "Decode_s_A"])
+    assert df.loc[1, "Max_New_Tokens"] == 112
+    assert df.loc[1, "Stop_Reason_B"] == "eos"
+
+
+def test_version_2_log_gains_pooled_columns(tmp_path):
+    path = str(tmp_path / "results.csv")
+    row = vote_row(make_vote(0), PARAMS, metrics(4.0), metrics(6.0))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(SCHEMAS[2])
+        writer.writerow([2 if column == "Schema_Version" else row[column] for column in SCHEMAS[2]])
+    assert schema_version(path) == 2
+
+    append_vote(vote_row(make_vote(1), PARAMS, {**metrics(4.0), "pooled": True}, metrics(6.0)), path)
+
+    df = read_results(path)
+    assert df["Schema_Version"].tolist() == [2, SCHEMA_VERSION]
+    assert df["Decode_s_B"].tolist() == [6.0, 6.0]
+    assert pd.isna(df.loc[0, "Pooled_A"]) and df.loc[1, "Pooled_A"]
+
+
+def test_version_3_log_gains_requested_budget(tmp_path):
+    """Test old rows were generated with the budget they asked for; new rows record both."""
+    path = str(tmp_path / "results.csv")
+    row = vote_row(make_vote(0), PARAMS, metrics(4.0), metrics(6.0))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(SCHEMAS[3])
+        writer.writerow([3 if column == "Schema_Version" else row[column] for column in SCHEMAS[3]])
+
+    budgeted = {**PARAMS, "max_new_tokens": 64, "requested_max_new_tokens": 112}
+    append_vote(vote_row(make_vote(1), budgeted, metrics(4.0), metrics(6.0)), path)
+
+    df = read_results(path)
+    assert df["Schema_Version"].tolist() == [3, SCHEMA_VERSION]
+    assert df["Max_New_Tokens"].tolist() == [112, 64]
+    assert df["Requested_Max_New_Tokens"].tolist() == [112, 112]
+
+
+def test_read_results_accepts_old_logs(tmp_path):
+    path = str(tmp_path / "results.csv")
+    pd.DataFrame([make_vote()]).to_csv(path, index=False)
+    df = read_results(path)
+
+    assert df.loc[0, "Schema_Version"] == 1
+    assert generation_metrics(df).empty
+
+
+def test_generation_metrics_has_one_row_per_side(tmp_path):
+    path = str(tmp_path / "results.csv")
+    append_vote(vote_row(make_vote(), PARAMS, metrics(4.0), metrics(6.0)), path)
+    generations = generation_metrics(read_results(path)).set_index("side")
+
+    assert generations.loc["A", "model"] == "MultiSynt/a"
+    assert generations.loc["B", "total_s"] == 0.5 + 0.25 + 6.0
+    assert round(generations.loc["A", "ms_per_token"]) == round(4000 / 112)
+    assert not generations["pooled"].any()
+
+    pooled = {**metrics(4.0), "pooled": True}
+    append_vote(vote_row(make_vote(), PARAMS, pooled, pooled), path)
+    assert generation_metrics(read_results(path))["pooled"].tolist() == [False, True, False, True]
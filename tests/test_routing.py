@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from config import MODELS_DB
+from routing import AffinityRouter
+
+MODELS = [model for entry in MODELS_DB.values() for model in [*entry["multisynt"], entry["hplt"]]]
+
+
+def test_preference_is_stable_and_covers_every_worker():
+    router = AffinityRouter(range(4))
+    assert sorted(router.preference(MODELS[0])) == [0, 1, 2, 3]
+    assert AffinityRouter(range(4)).preference(MODELS[0]) == router.preference(MODELS[0])
+
+
+def test_join_and_leave_only_move_the_affected_models():
+    """Test consistent hashing: a new worker only takes models over, a leaving one only gives its own up."""
+    router = AffinityRouter(range(4))
+    before = {model: router.preference(model)[0] for model in MODELS}
+    router.add(4)
+    after = {model: router.preference(model)[0] for model in MODELS}
+    moved = [model for model in MODELS if before[model] != after[model]]
+    assert moved
+    assert all(after[model] == 4 for model in moved)
+    # Roughly a fifth of the models move, not a reshuffle
+    assert len(moved) < len(MODELS) / 2
+
+    router.remove(4)
+    assert {model: router.preference(model)[0] for model in MODELS} == before
+
+
+def test_choose_prefers_warm_then_idle_then_free_slots():
+    router = AffinityRouter(range(3))
+    key = MODELS[0]
+    first, second, third = router.preference(key)
+    idle = dict.fromkeys(range(3), 0)
+
+    assert router.choose(key, idle) == (first, False)
+    assert router.choose(key, idle, resident={third: [key]}) == (third, False)
+    # A cold load goes to an idle worker rather than queueing behind a busy one
+    assert router.choose(key, {**idle, first: 1}) == (second, False)
+    # ... and to one with a free slot rather than evicting another model
+    assert router.choose(key, idle, full=[first]) == (second, False)
+    # A hedge of a request running on the warm worker goes elsewhere
+    assert router.choose(key, {**idle, third: 1}, resident={third: [key]}, avoid=[third]) == (first, False)
+
+
+def test_choose_spills_over_past_the_load_bound():
+    router = AffinityRouter(range(2), load_factor=1.25)
+    key = MODELS[0]
+    warm, other = router.preference(key)
+    resident = {warm: [key]}
+    # ceil(1.25 * 2 / 2) = 2: one request may wait for the warm worker
+    assert router.choose(key, {warm: 1, other: 0}, resident) == (warm, False)
+    # ceil(1.25 * 3 / 2) = 2: a third would exceed its bound and spills over
+    assert router.choose(key, {warm: 2, other: 0}, resident) == (other, True)
+
+
+def test_load_factor_must_leave_headroom():
+    with pytest.raises(ValueError):
+        AffinityRouter(range(2), load_factor=1.0)
+
+
+def simulate_warm_fraction(place, slots, requests=2000):
+    """Fraction of uniformly random requests over MODELS that find their model on the worker `place` picks."""
+    rng = random.Random(0)
+    resident = {worker: [] for worker in range(4)}
+    warm = 0
+    for _ in range(requests):
+        model = rng.choice(MODELS)
+        cache = resident[place(model, resident, rng)]
+        if model in cache:
+            warm += 1
+            cache.remove(model)
+        elif len(cache) == slots:
+            cache.pop(0)
+        cache.append(model)
+    return warm / requests
+
+
+def test_affinity_keeps_most_requests_warm():
+    """Test 4 workers x 10 slots serve nearly every request warm, where random placement serves few."""
+    router = AffinityRouter(range(4))
+
+    def routed(model, resident, rng):
+        full = [worker for worker, cache in resident.items() if len(cache) == 10]
+        return router.choose(model, dict.fromkeys(resident, 0), resident, full)[0]
+
+    assert simulate_warm_fraction(routed, slots=10) > 0.9
+    assert simulate_warm_fraction(lambda model, resident, rng: rng.randrange(4), slots=10) < 0.4
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from config import EXAMPLE_PROMPTS
+from scoring import CharNgramLanguageID, metric_agreement, strip_prompt
+
+
+def test_strip_prompt():
+    """Test only the continuation is scored and failed generations are dropped."""
+    assert strip_prompt("Det var en", "Det var en gång") == "gång"
+    assert strip_prompt("Hej", "Slurm Error: out of memory") == ""
+    assert strip_prompt("Hej", float("nan")) == ""
+
+
+def test_language_id_separates_languages():
+    """Test the char n-gram centroids pick the right language for unseen text."""
+    languages = ["Swedish", "Finnish", "Spanish"]
+    texts = [p for lang in languages for p in EXAMPLE_PROMPTS[lang]]
+    labels = [lang for lang in languages for _ in EXAMPLE_PROMPTS[lang]]
+    language_id = CharNgramLanguageID().fit(texts, labels)
+
+    expected, predicted = language_id.score_expected(
+        ["det var en gång en liten flicka som", "olipa kerran pieni tyttö joka", ""],
+        ["Swedish", "Swedish", "Swedish"],
+    )
+    assert predicted[:2] == ["Swedish", "Finnish"]
+    assert expected[0] > expected[1]
+    assert np.isnan(expected[2])
+
+
+def test_metric_agreement():
+    """Test agreement counts decided votes only and respects metric direction."""
+    scores = pd.DataFrame(
+        {
+            "Winner_Source": ["MultiSynt", "HPLT", "HPLT", "Tie"],
+            "PPL_A": [10.0, 5.0, 30.0, 1.0],
+            "PPL_B": [20.0, 50.0, 10.0, 2.0],
+        }
+    )
+    res = metric_agreement(scores, "PPL", higher_is_better=False)
+    assert res["votes"] == 3
+    assert res["agreement"] == 2 / 3
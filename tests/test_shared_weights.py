@@ -0,0 +1,116 @@
+import fcntl
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+import torch
+from safetensors.torch import load_file
+
+import shared_weights
+from executors import PoolWorker
+from shared_weights import evict, load_state_dict_mmap, materialize, memory_usage, shared_weights_path
+from tiny_model import build_tiny_model
+
+NUM_WORKERS = 3
+PARAMS = {"min_new_tokens": 5, "max_new_tokens": 5, "temperature": 0.7, "repetition_penalty": 1.2}
+
+
+@pytest.fixture(scope="module")
+def models(tmp_path_factory):
+    root = tmp_path_factory.mktemp("models")
+    tiny = build_tiny_model(str(root / "tiny"))
+    # ~44MB of float32 weights, large enough to stand out against per-process noise. Stored as
+    # bfloat16 like released checkpoints, so a normal load upcasts it into a private float32 copy.
+    medium = build_tiny_model(str(root / "medium"), hidden_size=512, num_layers=4, dtype=torch.bfloat16)
+    return tiny, medium
+
+
+def test_mmap_state_dict_matches_safetensors(models, tmp_path):
+    path = materialize(models[0], shared_weights_path(models[0], root=str(tmp_path)))
+    mapped = load_state_dict_mmap(path)
+    loaded = load_file(path)
+
+    assert mapped.keys() == loaded.keys()
+    for name, tensor in loaded.items():
+        assert torch.equal(mapped[name], tensor)
+
+
+def _memory_growth(worker_args, models):
+    """Starts NUM_WORKERS workers and returns each one's (pss, uss) growth from loading the medium model."""
+    tiny, medium = models
+    workers = [PoolWorker(i, [sys.executable, "worker.py", *worker_args]) for i in range(NUM_WORKERS)]
+    try:
+        # Load something small first so lazy imports do not count as model memory
+        for worker in workers:
+            assert worker.call({"op": "load", "model_name": tiny})["ok"]
+        before = [memory_usage(w.process.pid) for w in workers]
+        for worker in workers:
+            assert worker.call({"op": "generate", "model_name": medium, "prompt": "Hej", "params": PARAMS})["ok"]
+        after = [memory_usage(w.process.pid) for w in workers]
+    finally:
+        for worker in workers:
+            worker.stop()
+    return [(a["pss"] - b["pss"], a["uss"] - b["uss"]) for a, b in zip(after, before)]
+
+
+def test_workers_share_one_copy_of_the_weights(models, tmp_path, monkeypatch):
+    """Test node memory grows sublinearly with the number of CPU workers when weights are shared."""
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        pytest.skip("needs /proc/<pid>/smaps_rollup")
+    monkeypatch.setenv("ARENA_SHARED_WEIGHTS_DIR", str(tmp_path))
+
+    private = _memory_growth([], models)
+    shared = _memory_growth(["--shared_weights"], models)
+    weights_bytes = os.path.getsize(shared_weights_path(models[1], root=str(tmp_path)))
+
+    # Private loading costs every worker a full copy of the weights
+    assert sum(pss for pss, _ in private) > 0.9 * NUM_WORKERS * weights_bytes
+    # Shared loading costs the node about one copy in total...
+    assert sum(pss for pss, _ in shared) < 1.5 * weights_bytes
+    # ...and each worker only a small private overhead (activations, KV cache)
+    assert all(uss < 0.25 * weights_bytes for _, uss in shared)
+
+
+def test_stale_versions_and_least_recently_used_files_are_evicted(models, tmp_path):
+    tiny = models[0]
+    path = materialize(tiny, shared_weights_path(tiny, root=str(tmp_path)))
+    size = os.path.getsize(path)
+    stale = path.replace(".safetensors", "") + "-old.safetensors"
+    other_old, other_new = str(tmp_path / "old-0-0.safetensors"), str(tmp_path / "new-0-0.safetensors")
+    for i, extra in enumerate((stale, other_old, other_new)):
+        with open(extra, "wb") as f:
+            f.write(b"\0" * size)
+        os.utime(extra, (i, i))
+    os.utime(other_new)
+
+    # A worker is about to rebuild the least recently used file: its lock stays, every other one goes
+    with open(other_old + ".lock", "w") as held, open(stale + ".lock", "w"):
+        fcntl.flock(held, fcntl.LOCK_EX)
+        # Only two files fit: the stale version goes first, then the least recently used one
+        removed = evict(tiny, path, root=str(tmp_path), max_bytes=2 * size)
+    assert removed == [stale, other_old]
+    kept = os.path.basename(path)
+    expected = [kept, kept + ".lock", "new-0-0.safetensors", "old-0-0.safetensors.lock"]
+    assert sorted(os.listdir(tmp_path)) == sorted(expected)
+
+
+def test_hub_checkpoints_are_versioned_by_revision_without_downloading(monkeypatch, tmp_path):
+    import huggingface_hub
+
+    revision = ["abc123"]
+    monkeypatch.setattr(huggingface_hub.HfApi, "model_info", lambda self, model_name: SimpleNamespace(sha=revision[0]))
+    monkeypatch.setattr(huggingface_hub, "snapshot_download", lambda *args, **kwargs: pytest.fail("downloaded"))
+    first = shared_weights_path("org/model", root=str(tmp_path))
+    revision[0] = "def456"
+    second = shared_weights_path("org/model", root=str(tmp_path))
+
+    assert first != second
+    assert os.path.basename(first).startswith("model-") and first.rsplit("-", 1)[0] == second.rsplit("-", 1)[0]
+
+    # Offline, the commit the cache last resolved
+    monkeypatch.setattr(huggingface_hub.constants, "HF_HUB_OFFLINE", True)
+    monkeypatch.setattr(huggingface_hub.constants, "HF_HUB_CACHE", str(tmp_path / "hub"))
+    os.makedirs(tmp_path / "hub" / "models--org--model" / "refs")
+    (tmp_path / "hub" / "models--org--model" / "refs" / "main").write_text("def456")
+    assert shared_weights_path("org/model", root=str(tmp_path)) == second
@@ -0,0 +1,74 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from serving import generate_pair
+from singleflight import SingleFlight
+
+PARAMS = {"min_new_tokens": 70, "max_new_tokens": 112, "temperature": 0.7, "repetition_penalty": 1.2}
+
+
+def wait_for_coalesced(flight, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while flight.stats()["coalesced"] < count:
+        assert time.monotonic() < deadline, f"timed out waiting for {count} coalesced calls"
+        time.sleep(0.01)
+
+
+def test_concurrent_identical_calls_share_one_job():
+    """Test callers arriving while a job runs get its result instead of running their own."""
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def job():
+        calls.append(1)
+        release.wait(timeout=5)
+        return "sampled output"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flight.do, "key", job) for _ in range(4)]
+        wait_for_coalesced(flight, 3)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert [r[0] for r in results] == ["sampled output"] * 4
+    assert sorted(r[1] for r in results) == [False, True, True, True]
+    assert flight.stats() == {"jobs": 1, "coalesced": 3}
+    assert flight.in_flight() == 0
+
+
+def test_errors_propagate_to_followers_and_are_not_cached():
+    flight = SingleFlight()
+    with pytest.raises(RuntimeError):
+        flight.do("key", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    # The failed call is gone, so the next caller runs fresh
+    assert flight.do("key", lambda: "ok") == ("ok", False)
+
+
+def test_generate_pair_coalesces_identical_rounds():
+    """Test two sessions generating the same round at once launch only two backend jobs."""
+    launched = []
+    release = threading.Event()
+
+    class FakeExecutor:
+        def generate(self, model_name, prompt, params, slot=0, cancel_event=None):
+            launched.append(model_name)
+            release.wait(timeout=5)
+            return 0, f"out {model_name}", "", {"new_tokens": 5}
+
+    flight = SingleFlight()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        rounds = [pool.submit(generate_pair, FakeExecutor(), "ms/a", "hplt/b", "Hej", PARAMS, flight) for _ in range(2)]
+        wait_for_coalesced(flight, 2)
+        release.set()
+        results = [r.result() for r in rounds]
+
+    assert sorted(launched) == ["hplt/b", "ms/a"]
+    assert [r[:3] for r in results[0]] == [r[:3] for r in results[1]] == [(0, "out ms/a", ""), (0, "out hplt/b", "")]
+    # Both rounds get the job's metrics; exactly one round ran each job, the other attached to it
+    assert sorted(r[3]["shared"] for pair in results for r in pair) == [False, False, True, True]
+    assert flight.stats()["coalesced"] == 2
@@ -0,0 +1,46 @@
+import pytest
+
+from soak import cache_cycle, fit_trend, run_soak
+from tiny_model import build_tiny_model
+
+
+def test_fit_trend():
+    assert fit_trend([0, 1, 2, 3], [10, 12, 14, 16]) == pytest.approx((2, 10))
+    assert fit_trend([5], [3.0]) == (0.0, 3.0)
+
+
+def test_soak_without_samples_reports_no_samples():
+    report = run_soak(lambda: None, duration_s=0, trace_heap=False)
+    assert (report["cycles"], report["passed"], report["trends"]) == (0, False, {})
+    assert report["failures"][0].startswith("no samples")
+    assert not run_soak(lambda: None, cycles=0, trace_heap=False)["passed"]
+
+
+def test_soak_detects_heap_and_fd_leaks(tmp_path):
+    leaked = []
+
+    def leaky_cycle():
+        leaked.append(bytearray(1 << 20))
+        leaked.append(open(tmp_path / f"{len(leaked)}.txt", "w"))
+
+    try:
+        report = run_soak(leaky_cycle, cycles=30, thresholds={"rss_mb": 1e6, "cycle_slowdown": 1e6})
+    finally:
+        for item in leaked:
+            if hasattr(item, "close"):
+                item.close()
+
+    assert not report["passed"]
+    assert [failure.split()[0] for failure in report["failures"]] == ["heap_mb", "open_fds"]
+    assert report["trends"]["heap_mb"]["slope_per_cycle"] == pytest.approx(1.0, rel=0.05)
+    assert "test_soak.py" in report["top_allocators"][0]["where"]
+
+
+def test_pipeline_cache_evictions_do_not_leak(tmp_path):
+    """Test loading, generating with and evicting tiny models through the cache returns its memory."""
+    models = [build_tiny_model(str(tmp_path / f"tiny-{seed}"), seed=seed) for seed in range(2)]
+    report = run_soak(cache_cycle(models, "Det var en gång"), cycles=20, thresholds={"cycle_slowdown": 1e6})
+
+    assert report["passed"], report["failures"]
+    assert report["cycles"] == 20
+    assert {"rss_mb", "heap_mb", "open_fds"} <= set(report["trends"])
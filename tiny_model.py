@@ -0,0 +1,60 @@
+import argparse
+import os
+
+import torch
+from tokenizers import ByteLevelBPETokenizer
+from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+from config import EXAMPLE_PROMPTS
+
+DEFAULT_TINY_MODEL_DIR = os.path.join(".cache", "tiny-arena-model")
+
+
+def build_tiny_model(
+    output_dir=DEFAULT_TINY_MODEL_DIR, hidden_size=64, num_layers=2, vocab_size=512, seed=0, dtype=torch.float32
+):
+    """
+    Builds a tiny randomly initialized decoder model with its own tokenizer and saves it to `output_dir`.
+    Nothing is downloaded, so benchmarks and tests can exercise the real get_pipeline path on CPU.
+    `dtype` is the checkpoint's storage dtype (most released checkpoints are bfloat16).
+    Returns the directory, which can be passed to get_pipeline as a model name.
+    """
+    if os.path.exists(os.path.join(output_dir, "config.json")):
+        return output_dir
+
+    # Train a byte-level BPE on the example prompts so every supported language tokenizes sensibly
+    texts = [prompt for prompts in EXAMPLE_PROMPTS.values() for prompt in prompts]
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(texts, vocab_size=vocab_size, min_frequency=1, special_tokens=["<s>", "</s>", "<pad>"])
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=bpe._tokenizer, bos_token="<s>", eos_token="</s>", pad_token="<pad>"
+    )
+
+    model_config = LlamaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 2,
+        num_hidden_layers=num_layers,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+        max_position_embeddings=2048,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.pad_token_id,
+    )
+    torch.manual_seed(seed)
+    model = LlamaForCausalLM(model_config).to(dtype)
+
+    model.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    return output_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a tiny random decoder model for CPU benchmarks.")
+    parser.add_argument("--output_dir", type=str, default=DEFAULT_TINY_MODEL_DIR)
+    parser.add_argument("--hidden_size", type=int, default=64)
+    parser.add_argument("--num_layers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(build_tiny_model(args.output_dir, hidden_size=args.hidden_size, num_layers=args.num_layers))
@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import sys
+
+from backend import PipelineCache, generate_with_metrics, get_load_timings, node_name
+
+# Long-lived generation worker for the executor pool (see executors.py).
+# Protocol: one JSON request per line on stdin, one JSON response per line on stdout.
+#   {"id": 1, "op": "generate", "model_name": ..., "prompt": ..., "params": {...}}
+#   {"id": 2, "op": "load", "model_name": ...}
+# Responses: {"id": 1, "ok": true, "text": ..., "cached": true, "metrics": {...}, "resident": [...]}
+#            {"id": 2, "ok": false, "error": ..., "resident": [...]}
+
+
+def handle(cache, request):
+    pipe, cached = cache.get(request["model_name"])
+    if request.get("op", "generate") == "load":
+        return {"cached": cached}
+    text, metrics = generate_with_metrics(pipe, request["prompt"], **request.get("params", {}))
+    metrics.update(cached=cached, load_s=0.0 if cached else sum(get_load_timings(pipe).values()), worker=node_name())
+    return {"text": text, "cached": cached, "metrics": metrics}
+
+
+def serve(cache, requests, responses):
+    for line in requests:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        try:
+            response = {"id": request.get("id"), "ok": True, **handle(cache, request)}
+        except Exception as e:
+            print(f"Request {request.get('id')} failed: {e}", file=sys.stderr)
+            response = {"id": request.get("id"), "ok": False, "error": str(e)}
+        response["resident"] = cache.resident()
+        responses.write(json.dumps(response) + "\n")
+        responses.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-lived generation worker (JSON lines on stdin/stdout).")
+    parser.add_argument("--max_models", type=int, default=1, help="Models kept loaded at once.")
+    parser.add_argument("--fast_decode", action="store_true")
+    parser.add_argument("--shared_weights", action="store_true", help="Map the node's shared copy of the weights.")
+    parser.add_argument("--fast_load", action="store_true", help="Meta-device init and parallel shard streaming.")
+    parser.add_argument("--cpu_cores", type=str, help="Pin this worker to a cpulist (e.g. '0-7').")
+    args = parser.parse_args()
+
+    if args.cpu_cores:
+        from cpu_affinity import apply_cpu_partition, parse_cpulist
+
+        apply_cpu_partition(parse_cpulist(args.cpu_cores))
+
+    # Keep a private handle on the real stdout for the protocol and send everything else
+    # that libraries print to stdout over to stderr, so it cannot corrupt the response stream.
+    responses = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    print(f"Worker ready (pid {os.getpid()}, SLURM_JOB_ID={os.environ.get('SLURM_JOB_ID')})", file=sys.stderr)
+    cache = PipelineCache(
+        max_models=args.max_models,
+        fast_decode=args.fast_decode,
+        shared_weights=args.shared_weights,
+        fast_load=args.fast_load,
+        # Threads are process-wide: a tuned thread count only fits a worker serving one model
+        apply_threads=args.max_models == 1,
+    )
+    serve(cache, sys.stdin, responses)